@@ -1,5 +1,8 @@
-from django.test import TestCase
+from django.core import mail
+from django.core.cache import caches
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from mailqueue.models import QueuedMessage
 
 from .forms import ContactForm
 
@@ -58,6 +61,10 @@ class ContactViewTests(TestCase):
         response = self.client.post(reverse("contact"), data=valid_data)
         self.assertRedirects(response, "/success/")
 
+        # The message is queued for the mail worker instead of being sent right away
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertIn("John Doe", QueuedMessage.objects.get().body)
+
     def test_form_invalid_submission(self):
         """Test that the form handles invalid input correctly"""
         invalid_data = {
@@ -69,6 +76,47 @@ class ContactViewTests(TestCase):
         self.assertFalse(form.is_valid())
 
 
+@override_settings(RATE_LIMITS={"contact": {"ip": (2, 60), "global": (3, 60)}})
+class ContactRateLimitTests(TestCase):
+
+    def setUp(self):
+        caches["ratelimit"].clear()
+        self.data = {
+            "name": "John Doe",
+            "email": "johndoe@example.com",
+            "message": "Hello, this is a test message.",
+        }
+
+    def test_limited_per_address(self):
+        """Submissions beyond the burst of an address are rejected unvalidated"""
+        for _ in range(2):
+            response = self.client.post(reverse("contact"), data=self.data)
+            self.assertRedirects(response, "/success/")
+        # only the buckets are read, the message is neither validated nor queued
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse("contact"), data=self.data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")  # a token per minute
+        self.assertEqual(QueuedMessage.objects.count(), 2)
+
+        # Other addresses and the form page itself are not affected
+        response = self.client.post(
+            reverse("contact"), data=self.data, REMOTE_ADDR="192.0.2.1"
+        )
+        self.assertRedirects(response, "/success/")
+        self.assertEqual(self.client.get(reverse("contact")).status_code, 200)
+
+    def test_limited_globally(self):
+        """All addresses together are limited as well"""
+        for address in ["192.0.2.1", "192.0.2.2", "192.0.2.3"]:
+            self.client.post(reverse("contact"), data=self.data, REMOTE_ADDR=address)
+        response = self.client.post(
+            reverse("contact"), data=self.data, REMOTE_ADDR="192.0.2.4"
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(QueuedMessage.objects.count(), 3)
+
+
 class SuccessViewTests(TestCase):
 
     def test_success_view_status_code(self):
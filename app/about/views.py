@@ -1,7 +1,9 @@
 from django.conf import settings
-from django.core.mail import send_mail
 from django.shortcuts import render, reverse
+from django.utils.decorators import method_decorator
 from django.views.generic import FormView, TemplateView
+from mailqueue.queue import queue_mail
+from portfolio.ratelimit import rate_limit
 
 from .forms import ContactForm
 
@@ -20,6 +22,8 @@ class SuccessView(
     template_name = "about/success.html"
 
 
+# submissions beyond settings.RATE_LIMITS["contact"] get a 429 before validation
+@method_decorator(rate_limit("contact"), name="dispatch")
 class ContactView(FormView):  # contact form
     form_class = ContactForm
     template_name = "about/contact.html"
@@ -41,7 +45,7 @@ class ContactView(FormView):  # contact form
 
             {message}
             """
-        send_mail(
+        queue_mail(  # delivered by the mail queue worker, not within the request
             subject="Received contact form submission",
             message=full_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -3,7 +3,8 @@ from django.contrib import admin
 
 
 class CategoryAdmin(admin.ModelAdmin):
-    pass
+    list_display = ("name", "slug", "post_count")
+    prepopulated_fields = {"slug": ("name",)}
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "blog"
+
+    def ready(self):
+        from search import engine, suggestions
+
+        # connect the signal receivers of the app
+        from . import signals  # noqa: F401
+
+        # index posts for the search form, title matches weigh more than body matches
+        engine.register(self.get_model("Post"), {"title": 3.0, "body": 1.0})
+        # suggest titles and terms while typing into the search forms
+        suggestions.register(
+            self.get_model("Post"), "title", "blog_detail", fields=["title", "body"]
+        )
+        suggestions.register(
+            self.get_model("Category"), "name", "blog_category", url_field="slug"
+        )
@@ -0,0 +1,105 @@
+"""RSS and Atom feeds of the latest posts, of all posts and per category
+
+The feeds are cached per URL and state of the listed posts, and answer polling
+clients sending ``If-None-Match`` or ``If-Modified-Since`` with 304 responses.
+"""
+
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from portfolio.conditional import condition_on_queryset
+from portfolio.pagecache import cache_listing_page
+
+from .models import Category, Post
+
+FEED_SIZE = 20  # number of the latest posts in a feed
+# the bodies are pre-rendered, so the raw body is never loaded
+FEED_FIELDS = ["title", "created_on", "last_modified", "body_html"]
+
+
+def _latest(posts):
+    """Return the latest posts of a queryset with the fields rendered in feeds"""
+    return (
+        posts.only(*FEED_FIELDS)
+        .prefetch_related("categories")
+        .order_by("-created_on", "pk")[:FEED_SIZE]
+    )
+
+
+class LatestPostsFeed(Feed):
+    title = "Alexander Shanmugam: Blog"
+    description = "The latest blog posts of Alexander Shanmugam"
+
+    def link(self):
+        return reverse("blog_index")
+
+    def items(self):
+        return _latest(Post.objects.all())
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.body_html
+
+    def item_link(self, item):
+        return reverse("blog_detail", kwargs={"pk": item.pk})
+
+    def item_pubdate(self, item):
+        return item.created_on
+
+    def item_updateddate(self, item):
+        return item.last_modified
+
+    def item_categories(self, item):
+        return [category.name for category in item.categories.all()]
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class CategoryFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Category, slug=slug)
+
+    def title(self, category):
+        return f"Alexander Shanmugam: {category.name}"
+
+    def description(self, category):
+        return f"The latest blog posts of Alexander Shanmugam in {category.name}"
+
+    def link(self, category):
+        return reverse("blog_category", kwargs={"slug": category.slug})
+
+    def items(self, category):
+        return _latest(category.posts.all())
+
+
+class CategoryAtomFeed(CategoryFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, category):
+        return self.description(category)
+
+
+def _cached(feed, get_queryset):
+    """Return the view of a feed with validators and cached responses"""
+    return condition_on_queryset(get_queryset)(cache_listing_page(get_queryset)(feed))
+
+
+def _posts(request):
+    return Post.objects.all()
+
+
+# renaming or deleting a category marks its posts as modified
+def _category_posts(request, slug):
+    return Post.objects.filter(categories__slug=slug)
+
+
+posts_rss = _cached(LatestPostsFeed(), _posts)
+posts_atom = _cached(LatestPostsAtomFeed(), _posts)
+category_rss = _cached(CategoryFeed(), _category_posts)
+category_atom = _cached(CategoryAtomFeed(), _category_posts)
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:02
+
+from django.db import migrations
+from django.db.models import Count
+from django.utils.text import slugify
+
+
+def populate_slugs_and_post_counts(apps, schema_editor):
+    Category = apps.get_model('blog', 'Category')
+    slugs = set()
+    for category in Category.objects.annotate(count=Count('posts')).order_by('pk'):
+        slug = base = slugify(category.name) or 'category'
+        suffix = 2
+        while slug in slugs:
+            slug = f'{base}-{suffix}'
+            suffix += 1
+        slugs.add(slug)
+        category.slug = slug
+        category.post_count = category.count
+        category.save(update_fields=['slug', 'post_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_category_post_count_category_slug'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_slugs_and_post_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:10
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+
+
+def render(text):
+    # the plain renderer of portfolio.markup at the time of this migration, frozen
+    # so that the migration does not depend on the current code and settings;
+    # manage.py render_bodies renders the bodies with the configured renderer
+    return linebreaks(text, autoescape=True)
+
+
+def render_bodies(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    for post in Post.objects.only('pk', 'body').iterator():
+        Post.objects.filter(pk=post.pk).update(body_html=render(post.body))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_alter_category_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='body_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_bodies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_on', 'id'], name='post_created_on_id_idx'),
+        ),
+    ]
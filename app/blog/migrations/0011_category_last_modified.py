@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_post_created_on_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='last_modified',
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False
+            ),
+        ),
+    ]
@@ -1,8 +1,16 @@
 from django.db import models
+from django.utils import timezone
+from django.utils.text import slugify
 
 
 class Category(models.Model):
     name = models.CharField(max_length=30)
+    slug = models.SlugField(max_length=40, unique=True)
+    # number of posts in the category, maintained by the signal receivers
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    # the version of the cached sidebar, also bumped when the post count changes;
+    # not auto_now, so that fixtures without it can be loaded
+    last_modified = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         verbose_name_plural = "categories"
@@ -10,14 +18,62 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if not self.slug:  # derive a unique slug from the name
+            self.slug = base = slugify(self.name) or "category"
+            suffix = 2
+            while Category.objects.filter(slug=self.slug).exclude(pk=self.pk).exists():
+                self.slug = f"{base}-{suffix}"
+                suffix += 1
+        self.last_modified = timezone.now()  # like auto_now, see the field
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # the count is updated by queries, the one in memory may be outdated
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "post_count"
+            ]
+        elif kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "last_modified"}
+        super().save(*args, **kwargs)
+
+
+# the columns of a post rendered by the listings and search results, which never
+# display the body
+LISTING_FIELDS = [
+    "title",
+    "created_on",
+    "image",
+    "image_width",
+    "image_height",
+    "image_derivatives",
+    "excerpt",
+]
+
 
 class Post(models.Model):
     title = models.CharField(max_length=255)
     body = models.TextField()
+    # body rendered by portfolio.markup, updated whenever the object is saved
+    body_html = models.TextField(blank=True, editable=False)
+    # plain text preview of the body displayed in the listings
+    excerpt = models.CharField(max_length=300, blank=True, editable=False)
     created_on = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
     categories = models.ManyToManyField("Category", related_name="posts")
     image = models.ImageField(upload_to="post_images/", null=True, blank=True)
+    # dimensions of the image, filled in when its derivatives are generated
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # storage names of the derivatives written for the image, so that rendering it
+    # does not ask the storage which exist
+    image_derivatives = models.JSONField(default=list, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # the order of the listings, so that keyset pages are range scans
+            models.Index(fields=["-created_on", "id"], name="post_created_on_id_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,56 @@
+"""The categories listed in the sidebar of the blog pages
+
+The list is the same on every page, so it is cached together with its rendered
+fragment in ``blog/index.html``. Both are cached under a version, the number of
+categories and their latest ``last_modified``, which is bumped whenever the name
+or the post count of a category changes. The version is read with one cheap
+query per request, so that every server process renders the new sidebar as soon
+as the categories have changed, whichever process changed them.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Category
+
+CACHE_KEY = "blog:sidebar:categories"
+
+
+async def version():
+    """Return the version of the categories, part of the keys of the cached sidebar"""
+    state = await Category.objects.aaggregate(
+        count=Count("pk"), latest=Max("last_modified")
+    )
+    latest = state["latest"].timestamp() if state["latest"] else 0
+    return f"{state['count']}-{latest}"
+
+
+async def categories(current=None):
+    """Return the categories listed in the sidebar with their number of posts
+
+    Parameters
+    ----------
+    :param current:
+        the version() of the categories, looked up if not given
+    :return:
+        the categories with posts, ordered by name
+    """
+    current = current or await version()
+    key = f"{CACHE_KEY}:{current}"
+    result = await cache.aget(key)
+    if result is None:
+        result = [
+            category
+            async for category in Category.objects.filter(post_count__gt=0).order_by(
+                "name"
+            )
+        ]
+        await cache.aset(key, result, settings.FRAGMENT_CACHE_TIMEOUT)
+    return result
+
+
+async def context():
+    """Return the template context of the sidebar, the categories and their version"""
+    current = await version()
+    return {"categories": await categories(current), "sidebar_version": current}
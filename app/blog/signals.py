@@ -0,0 +1,103 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+from portfolio import images, markup, pagecache
+
+from .models import Category, Post
+
+
+@receiver(pre_save, sender=Post)
+def render_post_body(sender, instance, **kwargs):
+    # render the body and its excerpt once instead of on every request, also for
+    # loaded fixtures
+    markup.render_body(instance)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def evict_post_page(sender, instance, **kwargs):
+    # evict the cached page of a post when it is edited or deleted
+    pagecache.invalidate(Post, [instance.pk])
+
+
+@receiver(post_save, sender=Post)
+def generate_post_image_derivatives(sender, instance, raw=False, **kwargs):
+    # create the resized and WebP versions of an uploaded image in the background
+    if not raw:
+        images.schedule_derivatives(instance)
+
+
+def categories_changed(pks):
+    """Mark posts whose displayed categories have changed as modified"""
+    pks = list(pks)
+    # bump last_modified, which the validators of conditional requests are based on
+    Post.objects.filter(pk__in=pks).update(last_modified=timezone.now())
+    pagecache.invalidate(Post, pks)
+
+
+def refresh_post_counts(pks):
+    """Recount the posts of some categories from the join table"""
+    counts = (
+        Post.categories.through.objects.filter(category=OuterRef("pk"))
+        .values("category")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    # a single UPDATE, which does not send the post_save signal of the categories
+    Category.objects.filter(pk__in=list(pks)).update(
+        # the counts are listed in the sidebar, which is cached by last_modified
+        post_count=Coalesce(Subquery(counts), 0),
+        last_modified=timezone.now(),
+    )
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_categories(sender, instance, **kwargs):
+    # the rows of the join table are deleted without sending m2m_changed
+    instance._category_pks = list(instance.categories.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def recount_deleted_post_categories(sender, instance, **kwargs):
+    # the categories of a deleted post have one post less
+    refresh_post_counts(getattr(instance, "_category_pks", []))
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    # all posts displaying a renamed or deleted category have changed
+    categories_changed(instance.posts.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def posts_recategorized(sender, instance, action, reverse, pk_set, **kwargs):
+    # posts whose list of categories has changed
+    if not reverse:  # the categories of a post were changed
+        if action in ("post_add", "post_remove", "post_clear"):
+            categories_changed([instance.pk])
+    elif action in ("post_add", "post_remove"):  # the posts of a category were changed
+        categories_changed(pk_set)
+    elif action == "pre_clear":  # the posts are unknown once they have been cleared
+        categories_changed(instance.posts.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def recount_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    # keep the denormalized post counts of the categories up to date
+    if reverse:  # the posts of a category were changed
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_post_counts([instance.pk])
+    elif action == "pre_clear":  # the categories are unknown once they are cleared
+        instance._category_pks = list(instance.categories.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        refresh_post_counts(pk_set)
+    elif action == "post_clear":
+        refresh_post_counts(instance.__dict__.pop("_category_pks", []))
@@ -1,7 +1,13 @@
-from django.test import TestCase
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from portfolio import pagecache
+from portfolio.testing import max_queries
+from search import engine
 
+from . import views
 from .models import Category, Post
 
 
@@ -86,6 +92,13 @@ class BlogIndexViewTests(TestCase):
         # Check that no posts are returned for this query
         self.assertEqual(len(response.context["posts"]), 0)
 
+    def test_blog_index_view_excerpts(self):
+        # The listing shows the stored excerpt without loading the bodies
+        response = self.client.get(reverse("blog_index"))
+        self.assertContains(response, "<p>This is the body of the first test post.</p>")
+        for post in response.context["posts"]:
+            self.assertTrue({"body", "body_html"} <= post.get_deferred_fields())
+
 
 class BlogCategoryViewTests(TestCase):
 
@@ -111,8 +124,8 @@ class BlogCategoryViewTests(TestCase):
         self.post3.categories.set([self.category2])
 
     def test_blog_category_view_status_code(self):
-        # Reverse the URL for the blog_category view (use category name 'Tech')
-        url = reverse("blog_category", kwargs={"category": "Tech"})
+        # Reverse the URL for the blog_category view (use category slug 'tech')
+        url = reverse("blog_category", kwargs={"slug": "tech"})
 
         # Simulate a GET request to this URL
         response = self.client.get(url)
@@ -121,8 +134,8 @@ class BlogCategoryViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
 
     def test_blog_category_view_template_used(self):
-        # Reverse the URL for the blog_category view (use category name 'Tech')
-        url = reverse("blog_category", kwargs={"category": "Tech"})
+        # Reverse the URL for the blog_category view (use category slug 'tech')
+        url = reverse("blog_category", kwargs={"slug": "tech"})
 
         # Simulate a GET request
         response = self.client.get(url)
@@ -131,14 +144,14 @@ class BlogCategoryViewTests(TestCase):
         self.assertTemplateUsed(response, "blog/category.html")
 
     def test_blog_category_view_context_data(self):
-        # Reverse the URL for the blog_category view (use category name 'Tech')
-        url = reverse("blog_category", kwargs={"category": "Tech"})
+        # Reverse the URL for the blog_category view (use category slug 'tech')
+        url = reverse("blog_category", kwargs={"slug": "tech"})
 
         # Simulate a GET request
         response = self.client.get(url)
 
         # Check that the category passed in the context is correct
-        self.assertEqual(response.context["category"], "Tech")
+        self.assertEqual(response.context["category"], self.category1)
 
         # Check that the posts in the context are filtered by category
         self.assertIn(self.post1, response.context["posts"])
@@ -146,8 +159,9 @@ class BlogCategoryViewTests(TestCase):
         self.assertNotIn(self.post3, response.context["posts"])
 
     def test_blog_category_view_no_posts(self):
-        # Reverse the URL for a category that has no posts (e.g., 'Health')
-        url = reverse("blog_category", kwargs={"category": "Health"})
+        # Create a category that has no posts (e.g., 'Health')
+        Category.objects.create(name="Health")
+        url = reverse("blog_category", kwargs={"slug": "health"})
 
         # Simulate a GET request
         response = self.client.get(url)
@@ -158,6 +172,168 @@ class BlogCategoryViewTests(TestCase):
         # Check that the context contains an empty list of posts
         self.assertEqual(len(response.context["posts"]), 0)
 
+    def test_blog_category_view_unknown_slug(self):
+        # A category that does not exist is not found
+        response = self.client.get(reverse("blog_category", kwargs={"slug": "health"}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_blog_category_view_exact_match(self):
+        # 'Data' does not match the posts of 'Big Data'
+        data = Category.objects.create(name="Data")
+        big_data = Category.objects.create(name="Big Data")
+        self.post1.categories.add(big_data)
+        self.post3.categories.add(data)
+
+        response = self.client.get(reverse("blog_category", kwargs={"slug": "data"}))
+        self.assertEqual(list(response.context["posts"]), [self.post3])
+
+    def test_blog_category_view_post_counts(self):
+        # The sidebar and the title show the number of posts of the categories
+        response = self.client.get(reverse("blog_category", kwargs={"slug": "tech"}))
+        self.assertEqual(
+            list(response.context["categories"]), [self.category2, self.category1]
+        )
+        self.assertContains(response, "Tech</a> (2)")
+        self.assertContains(response, "Lifestyle</a> (1)")
+        self.assertContains(response, "2 posts")
+
+    def test_blog_category_view_sidebar_cached(self):
+        # The sidebar is rendered once and renewed when a category changes
+        url = reverse("blog_index")
+        self.client.get(url)
+        # the validator, the posts, their categories and the sidebar version
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+        self.category1.name = "Technology"
+        self.category1.save()
+        self.assertContains(self.client.get(url), "Technology</a> (2)")
+        self.post3.categories.remove(self.category2)
+        self.assertNotContains(self.client.get(url), "Lifestyle</a>")
+
+        # Changes by another server process, which evicts nothing in this one
+        Category.objects.filter(pk=self.category1.pk).update(
+            name="Tech", last_modified=timezone.now()
+        )
+        self.assertContains(self.client.get(url), "Tech</a> (2)")
+
+
+@override_settings(PAGE_SIZE=2)
+class BlogPaginationTests(TestCase):
+
+    def setUp(self):
+        # Create five posts, the newest one first in the listing
+        self.posts = [
+            Post.objects.create(title=f"Paged Post {i}", body="Paged body")
+            for i in range(5)
+        ][::-1]
+
+    def test_pages_follow_cursors(self):
+        # Follow the next cursors from the first to the last page
+        url = reverse("blog_index")
+        response = self.client.get(url)
+        self.assertEqual(response.context["posts"], self.posts[0:2])
+        self.assertFalse(response.context["page"].has_previous)
+
+        response = self.client.get(
+            url, {"cursor": response.context["page"].next_cursor}
+        )
+        self.assertEqual(response.context["posts"], self.posts[2:4])
+
+        response = self.client.get(
+            url, {"cursor": response.context["page"].next_cursor}
+        )
+        self.assertEqual(response.context["posts"], self.posts[4:5])
+        self.assertFalse(response.context["page"].has_next)
+
+        # Walk back to the second page using the previous cursor
+        previous_cursor = response.context["page"].previous_cursor
+        response = self.client.get(url, {"cursor": previous_cursor})
+        self.assertEqual(response.context["posts"], self.posts[2:4])
+
+    def test_pages_keep_search_query(self):
+        # Search results are paginated as well and the links keep the query
+        url = reverse("blog_index")
+        response = self.client.get(url, {"query": "paged"})
+        self.assertEqual(len(response.context["posts"]), 2)
+        self.assertContains(response, "query=paged&amp;cursor=")
+
+        response = self.client.get(
+            url, {"query": "paged", "cursor": response.context["page"].next_cursor}
+        )
+        self.assertEqual(len(response.context["posts"]), 2)
+        self.assertTrue(response.context["page"].has_previous)
+
+    def test_invalid_cursor(self):
+        # A tampered cursor results in a 404 instead of a server error
+        response = self.client.get(reverse("blog_index"), {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(PAGE_SIZE=50)
+class BlogQueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Generate 200 posts in 20 categories, each post linked to three of them
+        categories = Category.objects.bulk_create(
+            [Category(name=f"Category {i}", slug=f"category-{i}") for i in range(20)]
+        )
+        posts = Post.objects.bulk_create(
+            [
+                Post(title=f"Generated Post {i}", body="Generated body")
+                for i in range(200)
+            ]
+        )
+        Post.categories.through.objects.bulk_create(
+            [
+                Post.categories.through(post=post, category=categories[(i + j) % 20])
+                for i, post in enumerate(posts)
+                for j in range(3)
+            ]
+        )
+        engine.index_objects(Post, posts)  # bulk_create does not update the index
+
+    def test_index_queries(self):
+        # The validators, the posts, their categories and the sidebar with its
+        # version take a constant number of queries
+        with max_queries(5):
+            response = self.client.get(reverse("blog_index"))
+        self.assertEqual(len(response.context["posts"]), 50)
+
+    def test_index_search_queries(self):
+        # Searching adds the index lookup but no query per result
+        with max_queries(5):
+            response = self.client.get(reverse("blog_index"), {"query": "generated"})
+        self.assertEqual(len(response.context["posts"]), 50)
+
+    def test_category_queries(self):
+        # The category and the sidebar with its version add a query each
+        with max_queries(6):
+            response = self.client.get(
+                reverse("blog_category", kwargs={"slug": "category-1"})
+            )
+        self.assertTrue(response.context["posts"])
+
+    def test_detail_queries(self):
+        # A cache miss looks up last_modified, the post, its categories and its
+        # related posts
+        cache.clear()
+        url = reverse("blog_detail", kwargs={"pk": Post.objects.first().pk})
+        with max_queries(4):
+            self.client.get(url)
+
+        # A cache hit only looks up last_modified
+        with max_queries(1):
+            self.client.get(url)
+
+    def test_budget_exceeded(self):
+        # A loop querying the categories of every post exceeds the budget
+        with self.assertRaises(AssertionError):
+            with max_queries(2):
+                for post in Post.objects.all()[:10]:
+                    list(post.categories.all())
+
 
 class BlogDetailViewTests(TestCase):
     def setUp(self):
@@ -196,6 +372,175 @@ class BlogDetailViewTests(TestCase):
         # Check that the correct context is passed to the template
         self.assertEqual(response.context["post"], self.post)
 
+    def test_blog_detail_view_renders_stored_body(self):
+        # The body is rendered when the post is saved, not by the template
+        self.post.body = "First <paragraph>\n\nSecond"
+        self.post.save()
+        self.assertEqual(
+            self.post.body_html, "<p>First &lt;paragraph&gt;</p>\n\n<p>Second</p>"
+        )
+        Post.objects.filter(pk=self.post.pk).update(body_html="<p>Stored</p>")
+        response = self.client.get(reverse("blog_detail", kwargs={"pk": self.post.pk}))
+        self.assertContains(response, "<p>Stored</p>", html=True)
+
+
+class BlogDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Tech")
+        self.post = Post.objects.create(title="Cached Post", body="Cached body")
+        self.post.categories.set([self.category])
+        self.url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+
+    def test_second_request_is_cached(self):
+        # The first request renders the page, the second one is served from the cache
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertContains(response, "Cached body")
+        self.assertEqual(pagecache.stats(Post), {"hits": 1, "misses": 1})
+
+    def test_post_save_evicts(self):
+        # Editing the post renders the page again
+        self.client.get(self.url)
+        self.post.body = "Edited body"
+        self.post.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, "Edited body")
+
+    def test_category_save_evicts(self):
+        # Renaming a category evicts the pages of its posts
+        self.client.get(self.url)
+        self.category.name = "Technology"
+        self.category.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, "Technology")
+
+    def test_category_delete_evicts(self):
+        # Deleting a category evicts the pages of its posts
+        self.client.get(self.url)
+        self.category.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertNotContains(response, "Tech")
+
+    def test_m2m_change_evicts(self):
+        # Changing the categories from either side evicts the page
+        self.client.get(self.url)
+        self.post.categories.add(Category.objects.create(name="Lifestyle"))
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "MISS")
+
+        self.category.posts.clear()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertNotContains(response, ">Tech<")
+
+    def test_missing_post(self):
+        # An unknown primary key results in a 404
+        response = self.client.get(reverse("blog_detail", kwargs={"pk": 0}))
+        self.assertEqual(response.status_code, 404)
+
+
+class BlogConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Tech")
+        self.post = Post.objects.create(title="Post", body="Body")
+        self.post.categories.set([self.category])
+
+    def test_detail_not_modified(self):
+        # A request with the ETag of the page gets a 304 without rendering
+        url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertTemplateNotUsed(response, "blog/detail.html")
+
+        # The Last-Modified date is honoured as well
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, headers={"if-modified-since": last_modified})
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_category_rename(self):
+        # Renaming a category of the post changes the ETag of its page
+        url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+        etag = self.client.get(url)["ETag"]
+        self.category.name = "Technology"
+        self.category.save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_listing_not_modified(self):
+        # The listing is not modified until a post is added or deleted
+        url = reverse("blog_index")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(
+            self.client.get(url, headers={"if-none-match": etag}).status_code, 304
+        )
+
+        other = Post.objects.create(title="Other", body="Body")
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        other.delete()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_category_listing_validators(self):
+        # Category pages only depend on the posts within the category
+        url = reverse("blog_category", kwargs={"slug": "tech"})
+        etag = self.client.get(url)["ETag"]
+        Post.objects.create(title="Uncategorized", body="Body")
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        # but a post added to another category changes the counts in the sidebar
+        Post.objects.create(title="Other", body="Body").categories.add(
+            Category.objects.create(name="Lifestyle")
+        )
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+
+class BlogAsyncViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Tech")
+        self.post = Post.objects.create(title="Async Post", body="Async body")
+        self.post.categories.set([self.category])
+
+    def test_views_are_async(self):
+        # The read views run on the event loop when served through ASGI
+        for view in (views.blog_index, views.blog_category, views.blog_detail):
+            self.assertTrue(iscoroutinefunction(view), view)
+
+    async def test_async_requests(self):
+        # No synchronous query is issued from the event loop
+        for url in (
+            reverse("blog_index"),
+            reverse("blog_index") + "?query=async",
+            reverse("blog_category", kwargs={"slug": "tech"}),
+            reverse("blog_detail", kwargs={"pk": self.post.pk}),
+        ):
+            response = await self.async_client.get(url)
+            self.assertContains(response, "Async Post")
+
+    async def test_async_conditional_get(self):
+        # The validators are fetched with the async ORM before the view is called
+        url = reverse("blog_detail", kwargs={"pk": self.post.pk})
+        response = await self.async_client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        response = await self.async_client.get(
+            url, headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+        response = await self.async_client.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+
 
 class CategoryModelTests(TestCase):
 
@@ -214,6 +559,38 @@ class CategoryModelTests(TestCase):
         # Ensure the string representation is correct
         self.assertEqual(str(category), "Tech")
 
+    def test_category_slug(self):
+        # Slugs are derived from the name and kept unique
+        self.assertEqual(Category.objects.create(name="Big Data").slug, "big-data")
+        self.assertEqual(Category.objects.create(name="Big  Data").slug, "big-data-2")
+
+    def test_category_post_count(self):
+        # The number of posts follows changes from either side of the relation
+        tech = Category.objects.create(name="Tech")
+        post = Post.objects.create(title="Post", body="Body")
+        other = Post.objects.create(title="Other", body="Body")
+        post.categories.add(tech)
+        tech.posts.add(other)
+        tech.refresh_from_db()
+        self.assertEqual(tech.post_count, 2)
+
+        post.categories.clear()
+        tech.refresh_from_db()
+        self.assertEqual(tech.post_count, 1)
+
+        other.delete()
+        tech.refresh_from_db()
+        self.assertEqual(tech.post_count, 0)
+
+    def test_category_save_keeps_post_count(self):
+        # Saving a category whose count in memory is outdated keeps the stored one
+        tech = Category.objects.create(name="Tech")
+        Post.objects.create(title="Post", body="Body").categories.add(tech)
+        tech.name = "Technology"
+        tech.save()
+        tech.refresh_from_db()
+        self.assertEqual((tech.name, tech.post_count), ("Technology", 1))
+
 
 class PostModelTests(TestCase):
 
@@ -266,3 +643,71 @@ class PostModelTests(TestCase):
 
         # Ensure the post is created with an image
         self.assertEqual(post_with_image.image, "post_images/sample_image.jpg")
+
+
+class FeedTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Tech")
+        self.post = Post.objects.create(title="Feed Post", body="Feed <body>")
+        self.post.categories.add(self.category)
+        self.other = Post.objects.create(title="Other Post", body="Other body")
+
+    def test_feeds(self):
+        # All posts are listed in RSS and Atom with their rendered bodies
+        response = self.client.get(reverse("blog_feed"))
+        self.assertEqual(response["Content-Type"], "application/rss+xml; charset=utf-8")
+        self.assertContains(response, "<title>Feed Post</title>")
+        self.assertContains(response, "&lt;p&gt;Feed &amp;lt;body&amp;gt;&lt;/p&gt;")
+        self.assertContains(response, "<category>Tech</category>")
+        self.assertContains(response, "<title>Other Post</title>")
+        response = self.client.get(reverse("blog_atom_feed"))
+        self.assertEqual(
+            response["Content-Type"], "application/atom+xml; charset=utf-8"
+        )
+
+    def test_category_feeds(self):
+        # A category feed only lists the posts of the category
+        for name in ("blog_category_feed", "blog_category_atom_feed"):
+            response = self.client.get(reverse(name, kwargs={"slug": "tech"}))
+            self.assertContains(response, "Feed Post")
+            self.assertNotContains(response, "Other Post")
+            response = self.client.get(reverse(name, kwargs={"slug": "missing"}))
+            self.assertEqual(response.status_code, 404)
+
+    def test_conditional_requests(self):
+        # Polling clients get a 304 response until a post changes
+        url = reverse("blog_feed")
+        response = self.client.get(url)
+        self.assertEqual(
+            self.client.get(
+                url, headers={"if-none-match": response["ETag"]}
+            ).status_code,
+            304,
+        )
+        self.assertEqual(
+            self.client.get(
+                url, headers={"if-modified-since": response["Last-Modified"]}
+            ).status_code,
+            304,
+        )
+        self.post.title = "Edited Post"
+        self.post.save()
+        response = self.client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertContains(response, "Edited Post")
+
+    def test_cached(self):
+        # The feed is rendered once, later requests only look up the validators
+        url = reverse("blog_category_feed", kwargs={"slug": "tech"})
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        # renaming the category marks its posts as modified
+        self.category.name = "Technology"
+        self.category.save()
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, "Technology")
@@ -1,9 +1,17 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 urlpatterns = [
     path("", views.blog_index, name="blog_index"),
     path("post/<int:pk>/", views.blog_detail, name="blog_detail"),
-    path("category/<category>/", views.blog_category, name="blog_category"),
+    path("category/<slug:slug>/", views.blog_category, name="blog_category"),
+    path("feed/", feeds.posts_rss, name="blog_feed"),
+    path("feed/atom/", feeds.posts_atom, name="blog_atom_feed"),
+    path("category/<slug:slug>/feed/", feeds.category_rss, name="blog_category_feed"),
+    path(
+        "category/<slug:slug>/feed/atom/",
+        feeds.category_atom,
+        name="blog_category_atom_feed",
+    ),
 ]
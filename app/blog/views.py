@@ -1,11 +1,19 @@
 # from django.http import HttpResponse
-from blog.models import Post
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from blog.models import LISTING_FIELDS, Category, Post
+from django.shortcuts import aget_object_or_404, render
+from portfolio.conditional import condition_on_object, condition_on_queryset
+from portfolio.pagecache import cache_detail_page
+from portfolio.pagination import apaginate, apaginate_ranked
+from related.models import Neighbour
+from search.engine import rank
+from search.forms import SearchForm
 
-from .forms import SearchForm
+from . import sidebar
 
 
-def blog_index(request):
+@condition_on_queryset(lambda request: Post.objects.all())
+async def blog_index(request):
     """The index view of the 'blog'-page
 
     Parameters
@@ -15,47 +23,62 @@ def blog_index(request):
     :return:
         the rendered content
     """
-    posts = Post.objects.all().order_by("-created_on")  # get all Post objects
+    # get all Post objects, fetching the categories of a page in one query
+    posts = Post.objects.only(*LISTING_FIELDS).prefetch_related("categories")
     form = SearchForm(request.GET)  # create SearchForm object
-    if form.is_valid():  # update the context if a valid form has been submitted
-        query = form.cleaned_data["query"]
-        if query:
-            # Filter posts based on the query in title and body
-            posts = posts.filter(title__icontains=query) | posts.filter(
-                body__icontains=query
-            )
+    cursor = request.GET.get("cursor")  # position of the requested page
+    query = form.cleaned_data["query"] if form.is_valid() else ""
+    if query:
+        # Rank the posts matching the query in title and body via the search index
+        hits = await sync_to_async(rank)(Post, query)
+        page = await apaginate_ranked(posts, hits, cursor)
+    else:
+        page = await apaginate(posts, cursor)  # newest posts first
 
     context = {
         "form": form,
-        "posts": posts,
+        "posts": page.object_list,
+        "page": page,
+        **await sidebar.context(),
     }
     return render(request, "blog/index.html", context)
 
 
-def blog_category(request, category):
+# the sidebar displays all categories, so category pages depend on every categorized
+# post; with one row per post and category, moving a post changes the count as well
+@condition_on_queryset(
+    lambda request, slug: Post.objects.filter(categories__isnull=False)
+)
+async def blog_category(request, slug):
     """The view displaying a list of all posts within one selected category
 
     Parameters
     ----------
     :param request:
         the incoming HTML request
-    :param category:
-        the selected category to be displayed
+    :param slug:
+        the slug of the selected category to be displayed
     :return:
         the rendered content
     """
-    posts = Post.objects.filter(categories__name__contains=category).order_by(
-        "-created_on"
-    )  # select all posts within the selected category
+    # exact lookup of the category via its unique slug
+    category = await aget_object_or_404(Category, slug=slug)
+    # select all posts within the selected category
+    posts = category.posts.only(*LISTING_FIELDS).prefetch_related("categories")
+    page = await apaginate(posts, request.GET.get("cursor"))  # newest posts first
 
     context = {  # update the context
         "category": category,
-        "posts": posts,
+        "posts": page.object_list,
+        "page": page,
+        **await sidebar.context(),
     }
     return render(request, "blog/category.html", context)
 
 
-def blog_detail(request, pk):
+@condition_on_object(Post)
+@cache_detail_page(Post)
+async def blog_detail(request, pk):
     """The detail view, displaying the details of a specific post
 
     Parameters
@@ -67,8 +90,16 @@ def blog_detail(request, pk):
     :return:
         the rendered content
     """
-    post = Post.objects.get(pk=pk)
+    post = await Post.objects.prefetch_related("categories").aget(pk=pk)
+    # precomputed by related.similarity, read through the (post, rank) index
+    neighbours = (
+        Neighbour.objects.filter(post=pk)
+        .select_related("related")
+        .only("related__title", "related__created_on")
+        .order_by("rank")
+    )
     context = {
         "post": post,
+        "related_posts": [neighbour.related async for neighbour in neighbours],
     }
     return render(request, "blog/detail.html", context)
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from mailqueue.models import QueuedMessage
+
+
+class QueuedMessageAdmin(admin.ModelAdmin):
+    list_display = ["subject", "status", "attempts", "created_on", "sent_on"]
+    list_filter = ["status"]
+
+
+admin.site.register(QueuedMessage, QueuedMessageAdmin)
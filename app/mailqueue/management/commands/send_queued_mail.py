@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from mailqueue.queue import send_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver the queued e-mails, once or continuously as a background worker"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="keep polling for new messages"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.MAIL_QUEUE_POLL_INTERVAL,
+            help="seconds to wait when the queue is empty",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            sent, failed = send_pending()
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} messages, {failed} failed")
+            if not options["loop"]:
+                break
+            if not sent and not failed:  # drain full batches without waiting
+                try:
+                    time.sleep(options["interval"])
+                except KeyboardInterrupt:
+                    break
@@ -0,0 +1,117 @@
+"""Persistent outbound mail queue
+
+Requests only store their messages with ``queue_mail``. The ``send_queued_mail``
+worker delivers the due messages in batches, reusing one connection to the mail
+server per batch, and retries failed deliveries with exponential backoff.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import QueuedMessage
+
+logger = logging.getLogger(__name__)
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """Store an e-mail for delivery by the worker, a drop-in for send_mail
+
+    Parameters
+    ----------
+    :param subject:
+        the subject of the e-mail
+    :param message:
+        the plain text body of the e-mail
+    :param from_email:
+        the sender address
+    :param recipient_list:
+        the list of recipient addresses
+    :return:
+        the QueuedMessage
+    """
+    return QueuedMessage.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email,
+        recipients="\n".join(recipient_list),
+    )
+
+
+def retry_delay(attempts):
+    """Return the delay before the next attempt, doubling with every failure"""
+    delay = settings.MAIL_QUEUE_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.MAIL_QUEUE_MAX_RETRY_DELAY))
+
+
+def send_pending(batch_size=None):
+    """Deliver a batch of due messages over a single connection
+
+    The batch is locked, so that several workers never send the same message.
+
+    Parameters
+    ----------
+    :param batch_size:
+        the maximum number of messages, defaults to settings.MAIL_QUEUE_BATCH_SIZE
+    :return:
+        a tuple of the numbers of sent and failed messages
+    """
+    batch_size = batch_size or settings.MAIL_QUEUE_BATCH_SIZE
+    sent = failed = 0
+    with transaction.atomic():
+        messages = list(
+            QueuedMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=QueuedMessage.PENDING, next_attempt__lte=timezone.now())
+            .order_by("next_attempt")[:batch_size]
+        )
+        if not messages:
+            return sent, failed
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as error:  # the whole batch has to wait for the server
+            logger.warning("Opening the mail connection failed: %s", error)
+            for message in messages:
+                _failed(message, error)
+            return sent, len(messages)
+
+        try:
+            for message in messages:
+                email = EmailMessage(
+                    subject=message.subject,
+                    body=message.body,
+                    from_email=message.from_email,
+                    to=message.recipients.splitlines(),
+                    connection=connection,
+                )
+                try:
+                    email.send()
+                except Exception as error:
+                    logger.warning("Sending message %s failed: %s", message.pk, error)
+                    _failed(message, error)
+                    failed += 1
+                else:
+                    message.status = QueuedMessage.SENT
+                    message.attempts += 1
+                    message.sent_on = timezone.now()
+                    message.save(update_fields=["status", "attempts", "sent_on"])
+                    sent += 1
+        finally:
+            connection.close()
+    return sent, failed
+
+
+def _failed(message, error):
+    """Schedule the next attempt of a message or give up on it"""
+    message.attempts += 1
+    message.last_error = str(error)
+    if message.attempts >= settings.MAIL_QUEUE_MAX_ATTEMPTS:
+        message.status = QueuedMessage.FAILED
+    else:
+        message.next_attempt = timezone.now() + retry_delay(message.attempts)
+    message.save(update_fields=["attempts", "last_error", "status", "next_attempt"])
@@ -0,0 +1,77 @@
+import io
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import QueuedMessage
+from .queue import queue_mail, send_pending
+
+
+class CountingBackend(BaseEmailBackend):
+    """Mail backend recording how often it connects and failing on request"""
+
+    opened = 0
+    fail = False
+
+    def open(self):
+        CountingBackend.opened += 1
+
+    def send_messages(self, messages):
+        if CountingBackend.fail:
+            raise ConnectionError("Mail server unavailable")
+        mail.outbox.extend(messages)
+        return len(messages)
+
+
+@override_settings(EMAIL_BACKEND="mailqueue.tests.CountingBackend")
+class SendPendingTests(TestCase):
+
+    def setUp(self):
+        CountingBackend.opened = 0
+        CountingBackend.fail = False
+
+    def queue(self, count):
+        for i in range(count):
+            queue_mail(f"Subject {i}", "Body", "from@example.com", ["to@example.com"])
+
+    def test_batch_reuses_connection(self):
+        # A batch of messages is delivered over a single connection
+        self.queue(3)
+        self.assertEqual(send_pending(), (3, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ["to@example.com"])
+        self.assertFalse(QueuedMessage.objects.filter(status="pending").exists())
+
+    def test_batch_size(self):
+        # Only batch_size messages are sent at once
+        self.queue(3)
+        self.assertEqual(send_pending(batch_size=2), (2, 0))
+        self.assertEqual(send_pending(batch_size=2), (1, 0))
+
+    @override_settings(MAIL_QUEUE_RETRY_DELAY=60, MAIL_QUEUE_MAX_ATTEMPTS=2)
+    def test_retry_with_backoff(self):
+        # A failed message is retried later and given up after the last attempt
+        self.queue(1)
+        CountingBackend.fail = True
+        self.assertEqual(send_pending(), (0, 1))
+        message = QueuedMessage.objects.get()
+        self.assertEqual(message.status, QueuedMessage.PENDING)
+        self.assertGreater(message.next_attempt, timezone.now())
+        self.assertIn("unavailable", message.last_error)
+
+        # The message is not due yet
+        self.assertEqual(send_pending(), (0, 0))
+
+        QueuedMessage.objects.update(next_attempt=timezone.now())
+        self.assertEqual(send_pending(), (0, 1))
+        self.assertEqual(QueuedMessage.objects.get().status, QueuedMessage.FAILED)
+
+    def test_command(self):
+        # The worker command delivers the queue once without --loop
+        self.queue(2)
+        call_command("send_queued_mail", stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 2)
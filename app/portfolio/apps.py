@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class PortfolioConfig(AppConfig):
+    name = "portfolio"
+
+    def ready(self):
+        # connect the receivers measuring and tracing the queries of every database
+        # connection
+        from . import metrics, profiling  # noqa: F401
@@ -10,7 +10,11 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from portfolio import warmup
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "portfolio.settings")
 
 application = get_asgi_application()
+
+# compile the URL patterns and parse the templates before the first request
+warmup.warm_process()
@@ -0,0 +1,391 @@
+"""Synthetic content and load generation for the benchmark commands
+
+Requests are sent to the WSGI and ASGI applications in process, without a server
+and without network overhead, so that the numbers reflect the application stack.
+"""
+
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from blog.models import Category, Post
+from blog.signals import refresh_post_counts
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.urls import reverse
+from django.utils.http import urlencode
+from PIL import Image, ImageDraw
+from portfolio import export, images, markup
+from projects.models import Project
+from search import engine
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+HOST = "localhost"
+MIN_REGRESSION = 1.0  # milliseconds
+QUERIES = ["benchmark post", "project number 1", "number"]
+# pages not requested by visitors: the metrics are only served to the scrapers'
+# addresses, and the success page only follows a submitted form
+EXCLUDED = {"metrics", "success"}
+
+
+def percentiles(samples):
+    """Return the mean, p50, p95 and p99 of a list of durations in milliseconds"""
+    if len(samples) < 2:
+        cuts = samples * 99
+    else:
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "mean": statistics.mean(samples),
+        "p50": cuts[49],
+        "p95": cuts[94],
+        "p99": cuts[98],
+    }
+
+
+def peak_memory():
+    """Return the peak resident memory of the process in MiB, or None if unknown"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def wsgi_get(application, path):
+    """Request a path from a WSGI application, returning the status code"""
+    path, _, query_string = path.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query_string,
+        "SERVER_NAME": HOST,
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": HOST,
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.url_scheme": "http",
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "wsgi.version": (1, 0),
+    }
+    status = []
+    body = application(environ, lambda line, headers: status.append(line))
+    try:
+        for _ in body:  # consume the body like a server would
+            pass
+    finally:
+        body.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_get(application, path):
+    """Request a path from an ASGI application, returning the status code"""
+    path, _, query_string = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string.encode(),
+        "root_path": "",
+        "headers": [(b"host", HOST.encode())],
+        "client": ("127.0.0.1", 0),
+        "server": (HOST, 80),
+    }
+    requested = False
+    status = []
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Future()  # the client never disconnects
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def run_wsgi(application, paths, concurrency):
+    """Serve requests from a pool of threads, like a threaded WSGI server
+
+    Parameters
+    ----------
+    :param application:
+        the WSGI application
+    :param paths:
+        the paths to be requested
+    :param concurrency:
+        the number of threads
+    :return:
+        the list of the durations in milliseconds and the numbers of queries of
+        the requests
+    """
+
+    def timed(path):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        # connections are per thread, so only the queries of this request count
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            status = wsgi_get(application, path)
+            duration = (time.perf_counter() - start) * 1000
+        if status != 200:
+            raise ValueError(f"{path} responded with {status}")
+        return duration, queries
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        return list(executor.map(timed, paths))
+
+
+async def run_asgi(application, paths, concurrency):
+    """Serve requests as concurrent tasks on one event loop
+
+    Parameters
+    ----------
+    :param application:
+        the ASGI application
+    :param paths:
+        the paths to be requested
+    :param concurrency:
+        the maximum number of requests in flight
+    :return:
+        the list of the durations in milliseconds and the numbers of queries of
+        the requests, which are None as the queries run in the threads of
+        sync_to_async
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(path):
+        async with semaphore:
+            start = time.perf_counter()
+            status = await asgi_get(application, path)
+            if status != 200:
+                raise ValueError(f"{path} responded with {status}")
+            return (time.perf_counter() - start) * 1000, None
+
+    return await asyncio.gather(*(timed(path) for path in paths))
+
+
+def _generate_image(rng, name):
+    """Store a JPEG image with random shapes, returning its storage name"""
+    image = Image.new("RGB", (1200, 800), tuple(rng.choices(range(256), k=3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(20):
+        x, y = rng.randrange(1200), rng.randrange(800)
+        draw.ellipse(
+            (x, y, x + rng.randrange(50, 400), y + rng.randrange(50, 400)),
+            fill=tuple(rng.choices(range(256), k=3)),
+        )
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def _rendered(objects):
+    """Return posts or projects with their bodies rendered like on save"""
+    objects = list(objects)
+    for instance in objects:
+        markup.render_body(instance)
+    return objects
+
+
+def generate_content(rng, posts, projects, categories=10, links=2, image_count=0):
+    """Create posts in categories, projects and images in bulk
+
+    bulk_create does not send signals, so the rendered bodies, the search index, the
+    post counts of the categories and the image derivatives are maintained here.
+
+    Parameters
+    ----------
+    :param rng:
+        the random.Random instance the content is derived from
+    :param posts:
+        the number of posts
+    :param projects:
+        the number of projects
+    :param categories:
+        the number of categories
+    :param links:
+        the number of categories of every post
+    :param image_count:
+        the number of distinct images, shared by the posts and projects
+    """
+    names = [
+        _generate_image(rng, f"post_images/benchmark-{i}.jpg")
+        for i in range(image_count)
+    ]
+    categories = Category.objects.bulk_create(
+        [
+            Category(name=f"Category {i}", slug=f"category-{i}")
+            for i in range(categories)
+        ]
+    )
+    posts = Post.objects.bulk_create(
+        _rendered(
+            Post(
+                title=f"Post {i}",
+                body=f"Benchmark post number {i}",
+                image=rng.choice(names) if names else "",
+            )
+            for i in range(posts)
+        )
+    )
+    Post.categories.through.objects.bulk_create(
+        [
+            Post.categories.through(post=post, category=category)
+            for post in posts
+            for category in rng.sample(categories, min(links, len(categories)))
+        ]
+    )
+    refresh_post_counts(category.pk for category in categories)
+    projects = Project.objects.bulk_create(
+        _rendered(
+            Project(
+                title=f"Project {i}",
+                body=f"Benchmark project number {i}",
+                image=rng.choice(names) if names else "",
+            )
+            for i in range(projects)
+        )
+    )
+    engine.index_objects(Post, posts, replace=False)
+    engine.index_objects(Project, projects, replace=False)
+
+    for name in names:  # the derivatives are shared by all users of an image
+        for model in (Post, Project):
+            instance = model.objects.filter(image=name).first()
+            if instance is not None:
+                images.generate_derivatives(instance)
+                model.objects.filter(image=name).update(
+                    image_width=instance.image_width,
+                    image_height=instance.image_height,
+                    image_derivatives=instance.image_derivatives,
+                )
+
+
+def search_paths(queries=QUERIES):
+    """Return the paths of searches and of their suggestions, by a pseudo-route
+
+    The suggestions are requested for the first half of every query, as if it was
+    being typed.
+    """
+    paths = {
+        f"{reverse(name)}?query=<query>": [
+            f"{reverse(name)}?{urlencode({'query': query})}" for query in queries
+        ]
+        for name in ("blog_index", "project_index")
+    }
+    autocomplete = reverse("search_autocomplete")
+    paths[f"{autocomplete}?q=<prefix>"] = [
+        f"{autocomplete}?{urlencode({'q': query[: max(2, len(query) // 2)]})}"
+        for query in queries
+    ]
+    return paths
+
+
+def request_paths(rng, count, samples=20, extra=None):
+    """Return paths to request, covering every route of the URLconf equally
+
+    Parameters
+    ----------
+    :param rng:
+        the random.Random instance the paths are chosen with
+    :param count:
+        the number of paths
+    :param samples:
+        the number of different pages requested per route, e.g. of posts
+    :param extra:
+        a dictionary of additional paths by label, e.g. of search queries
+    :return:
+        the list of (route, path) tuples
+    """
+    routes = export.routes(excluded=EXCLUDED)
+    routes.update(extra or {})
+    sampled = {
+        route: rng.sample(paths, min(samples, len(paths)))
+        for route, paths in routes.items()
+        if paths
+    }
+    return [
+        (route, rng.choice(sampled[route]))
+        for route in rng.choices(sorted(sampled), k=count)
+    ]
+
+
+def report(results):
+    """Summarize the latencies and queries of measured requests per route
+
+    Parameters
+    ----------
+    :param results:
+        the (route, duration in milliseconds, number of queries) tuples
+    :return:
+        a dictionary of the requests, latency percentiles and mean and maximum
+        number of queries per route
+    """
+    by_route = {}
+    for route, duration, queries in results:
+        by_route.setdefault(route, []).append((duration, queries))
+    summary = {}
+    for route, measurements in sorted(by_route.items()):
+        durations = [duration for duration, _ in measurements]
+        queries = [count for _, count in measurements]
+        summary[route] = {
+            "requests": len(measurements),
+            **percentiles(durations),
+            "queries": statistics.mean(queries),
+            "max_queries": max(queries),
+        }
+    return summary
+
+
+def regressions(routes, baseline, tolerance, minimum=MIN_REGRESSION):
+    """Compare the report of a run against the one of a baseline
+
+    Parameters
+    ----------
+    :param routes:
+        the report of the run, as returned by report()
+    :param baseline:
+        the report of the baseline
+    :param tolerance:
+        the relative increase of the p95 latency accepted, e.g. 0.25
+    :param minimum:
+        the increase in milliseconds below which latencies are considered noise
+    :return:
+        the list of messages describing the regressions
+    """
+    messages = []
+    for route, stats in routes.items():
+        if route not in baseline:
+            continue
+        before = baseline[route]
+        if stats["p95"] > max(before["p95"] * (1 + tolerance), before["p95"] + minimum):
+            messages.append(
+                f"{route}: p95 {stats['p95']:.2f} ms, was {before['p95']:.2f} ms"
+            )
+        if stats["max_queries"] > before["max_queries"]:
+            messages.append(
+                f"{route}: {stats['max_queries']} queries, was {before['max_queries']}"
+            )
+    return messages
@@ -0,0 +1,177 @@
+"""ETag and Last-Modified validators for the content views
+
+Both validators of a view are derived from the same cheap query, which is run
+once per request: the ``last_modified`` of the displayed object for detail views,
+and the latest ``last_modified`` together with the number of rows for listings,
+so that deleting a row changes the ETag as well.
+
+For async views, the query is run with the async ORM API before the validators,
+which then only read the memoized value.
+"""
+
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+
+def _memoize(request, key, compute):
+    """Return the value of compute(), computed at most once per request"""
+    memo = request.__dict__.setdefault("_validators", {})
+    if key not in memo:
+        memo[key] = compute()
+    return memo[key]
+
+
+async def _amemoize(request, key, compute):
+    """Return the value of await compute(), computed at most once per request"""
+    memo = request.__dict__.setdefault("_validators", {})
+    if key not in memo:
+        memo[key] = await compute()
+    return memo[key]
+
+
+def object_last_modified(request, model, pk):
+    """Return the last_modified of an object or None if it does not exist
+
+    Parameters
+    ----------
+    :param request:
+        the incoming HTML request, used to look the value up only once
+    :param model:
+        the model of the object, with a ``last_modified`` field
+    :param pk:
+        the primary key of the object
+    :return:
+        the datetime of the last modification
+    """
+    return _memoize(
+        request,
+        (model, pk),
+        lambda: model.objects.filter(pk=pk)
+        .values_list("last_modified", flat=True)
+        .first(),
+    )
+
+
+async def aobject_last_modified(request, model, pk):
+    """Async version of object_last_modified()"""
+    return await _amemoize(
+        request,
+        (model, pk),
+        lambda: model.objects.filter(pk=pk)
+        .values_list("last_modified", flat=True)
+        .afirst(),
+    )
+
+
+def queryset_last_modified(request, get_queryset, *args, **kwargs):
+    """Return the latest last_modified and the number of rows of a listing
+
+    Parameters
+    ----------
+    :param request:
+        the incoming HTML request, used to look the values up only once
+    :param get_queryset:
+        a callable taking the request and the arguments of the view and returning
+        the queryset of all rows the listing may display
+    :return:
+        a dictionary with the "latest" datetime, None if there are no rows, and
+        the "count" of the rows
+    """
+    return _memoize(
+        request,
+        "listing",
+        lambda: get_queryset(request, *args, **kwargs).aggregate(
+            latest=Max("last_modified"), count=Count("pk")
+        ),
+    )
+
+
+async def aqueryset_last_modified(request, get_queryset, *args, **kwargs):
+    """Async version of queryset_last_modified()"""
+    return await _amemoize(
+        request,
+        "listing",
+        lambda: get_queryset(request, *args, **kwargs).aaggregate(
+            latest=Max("last_modified"), count=Count("pk")
+        ),
+    )
+
+
+def _with_validators(decorator, prefetch):
+    """Apply condition() to a view, fetching the validators first if it is async"""
+
+    def wrap(view):
+        conditional = decorator(view)
+        if not iscoroutinefunction(view):
+            return conditional
+
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            await prefetch(request, *args, **kwargs)
+            return await conditional(request, *args, **kwargs)
+
+        return wrapper
+
+    return wrap
+
+
+def condition_on_object(model):
+    """Decorator adding validators to a sync or async detail view taking ``pk``
+
+    Parameters
+    ----------
+    :param model:
+        the model displayed by the view, with a ``last_modified`` field
+    :return:
+        the decorator
+    """
+
+    def last_modified(request, pk, *args, **kwargs):
+        return object_last_modified(request, model, pk)
+
+    def etag(request, pk, *args, **kwargs):
+        latest = object_last_modified(request, model, pk)
+        if latest is None:
+            return None
+        return f'"{model._meta.label_lower}-{pk}-{latest.timestamp()}"'
+
+    async def prefetch(request, pk, *args, **kwargs):
+        await aobject_last_modified(request, model, pk)
+
+    return _with_validators(
+        condition(etag_func=etag, last_modified_func=last_modified), prefetch
+    )
+
+
+def condition_on_queryset(get_queryset):
+    """Decorator adding validators to a sync or async listing view
+
+    Parameters
+    ----------
+    :param get_queryset:
+        a callable taking the arguments of the view and returning the queryset of
+        all rows the listing may display, with a ``last_modified`` field
+    :return:
+        the decorator
+    """
+
+    def aggregate(request, *args, **kwargs):
+        return queryset_last_modified(request, get_queryset, *args, **kwargs)
+
+    def last_modified(request, *args, **kwargs):
+        return aggregate(request, *args, **kwargs)["latest"]
+
+    def etag(request, *args, **kwargs):
+        result = aggregate(request, *args, **kwargs)
+        latest = result["latest"].timestamp() if result["latest"] else 0
+        return f'"{result["count"]}-{latest}"'
+
+    async def prefetch(request, *args, **kwargs):
+        await aqueryset_last_modified(request, get_queryset, *args, **kwargs)
+
+    return _with_validators(
+        condition(etag_func=etag, last_modified_func=last_modified), prefetch
+    )
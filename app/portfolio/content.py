@@ -0,0 +1,328 @@
+"""Streaming import and export of the content as JSON Lines
+
+Every line of a dump is a JSON object holding one category, post or project, with
+its model label under ``"model"``. Categories come first, so that the posts can
+refer to them by their slugs in ``"categories"``. Objects are identified by a
+natural key instead of their primary key, the slug of a category and the title
+and creation time of a post or project, so a dump can be imported into any
+database and importing it again only updates what has changed.
+
+Both directions work in batches of a fixed size, so the memory used does not
+depend on the size of the dump. The import writes every batch with a few bulk
+queries and maintains what the signal receivers do on save: the rendered bodies,
+the post counts of the categories, the search index and the cached pages. The
+related posts are updated once at the end, for the posts modified since the import
+started, which are read from the database instead of being collected.
+"""
+
+import datetime
+import json
+from collections import defaultdict
+
+from blog.models import Category, Post
+from blog.signals import categories_changed, refresh_post_counts
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from projects.models import Project
+from related import similarity
+from search import engine
+
+from . import markup, pagecache
+
+BATCH_SIZE = 500
+# the natural key and the other exported fields of every model, in dump order
+SPECS = {
+    Category: (("slug",), ("name",)),
+    Post: (("title", "created_on"), ("body", "image", "image_width", "image_height")),
+    Project: (
+        ("title", "created_on"),
+        ("body", "image", "image_width", "image_height"),
+    ),
+}
+# the fields maintained by the import of posts and projects besides the exported ones
+DERIVED_FIELDS = ["body_html", "excerpt", "last_modified"]
+
+
+def _empty_stats():
+    return {
+        model._meta.label_lower: {"created": 0, "updated": 0, "unchanged": 0}
+        for model in SPECS
+    }
+
+
+def _value(instance, name):
+    """Return the value of a field as it is written to a dump"""
+    field = instance._meta.get_field(name)
+    value = field.value_from_object(instance)
+    if value is None or isinstance(value, int):
+        return value
+    return field.value_to_string(instance)  # e.g. ISO 8601 dates and file names
+
+
+def serialize(instance):
+    """Return the record of a category, post or project
+
+    Parameters
+    ----------
+    :param instance:
+        the object, posts with their categories prefetched
+    :return:
+        a dictionary of JSON types with the model label, the natural key and the
+        exported fields
+    """
+    key_fields, value_fields = SPECS[type(instance)]
+    record = {"model": instance._meta.label_lower}
+    for name in key_fields + value_fields:
+        record[name] = _value(instance, name)
+    if isinstance(instance, Post):
+        record["categories"] = sorted(
+            category.slug for category in instance.categories.all()
+        )
+    return record
+
+
+def export_content(file, batch_size=BATCH_SIZE):
+    """Write all categories, posts and projects to a file as JSON Lines
+
+    Parameters
+    ----------
+    :param file:
+        the text file the lines are written to
+    :param batch_size:
+        the number of objects loaded per query
+    :return:
+        the number of exported objects per model label
+    """
+    counts = {}
+    for model, (key_fields, value_fields) in SPECS.items():
+        objects = model.objects.only(*key_fields, *value_fields).order_by("pk")
+        if model is Post:
+            objects = objects.prefetch_related(
+                Prefetch("categories", queryset=Category.objects.only("slug"))
+            )
+        count = 0
+        for instance in objects.iterator(chunk_size=batch_size):
+            file.write(json.dumps(serialize(instance)) + "\n")
+            count += 1
+        counts[model._meta.label_lower] = count
+    return counts
+
+
+def import_content(lines, batch_size=BATCH_SIZE):
+    """Create or update the objects of a JSON Lines dump
+
+    Objects are matched by their natural key. Existing objects are only written
+    when a field or, for posts, the set of categories differs from the dump, and
+    objects missing from the dump are kept. Every batch is written in a
+    transaction of its own.
+
+    Parameters
+    ----------
+    :param lines:
+        an iterable of lines, e.g. an open file
+    :param batch_size:
+        the number of objects written per batch
+    :return:
+        the number of "created", "updated" and "unchanged" objects per model label
+    :raise ValueError:
+        if a line is not a valid record, or a post refers to an unknown category
+    """
+    models = {model._meta.label_lower: model for model in SPECS}
+    stats = _empty_stats()
+    start = timezone.now()  # the created and updated posts are modified after it
+    model, batch = None, []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            label = record.pop("model")
+        except (ValueError, AttributeError, KeyError):
+            raise ValueError(f"line {number}: not a JSON object with a model label")
+        if label not in models:
+            raise ValueError(f"line {number}: unknown model {label!r}")
+        if models[label] is not model or len(batch) == batch_size:
+            _import_batch(model, batch, stats)
+            model, batch = models[label], []
+        batch.append((number, record))
+    _import_batch(model, batch, stats)
+    if stats["blog.post"]["created"] or stats["blog.post"]["updated"]:
+        similarity.update_since(start)
+    return stats
+
+
+def _parse(model, number, record):
+    """Return the natural key and the field values of a record"""
+    key_fields, value_fields = SPECS[model]
+    values = {}
+    try:
+        for name in key_fields + value_fields:
+            field = model._meta.get_field(name)
+            if name in key_fields:
+                value = field.to_python(record[name])
+            else:  # missing fields take their default value
+                value = field.to_python(record.get(name, field.get_default()))
+            if isinstance(value, datetime.datetime) and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            values[name] = value
+    except KeyError as error:
+        raise ValueError(f"line {number}: missing field {error}")
+    except ValidationError as error:
+        raise ValueError(f"line {number}: {name}: {' '.join(error.messages)}")
+    return tuple(values[name] for name in key_fields), values
+
+
+def _import_batch(model, batch, stats):
+    if not batch:
+        return
+    key_fields, value_fields = SPECS[model]
+    rows = {}  # the last record of a natural key wins
+    for number, record in batch:
+        key, values = _parse(model, number, record)
+        rows[key] = (number, values, record.get("categories"))
+
+    with transaction.atomic():
+        existing = {}
+        lookup = {f"{key_fields[0]}__in": {key[0] for key in rows}}
+        for instance in model.objects.filter(**lookup).only(*key_fields, *value_fields):
+            key = tuple(getattr(instance, name) for name in key_fields)
+            existing.setdefault(key, instance)
+
+        now = timezone.now()
+        created, updated, links = [], [], []
+        for key, (number, values, slugs) in rows.items():
+            instance = existing.get(key)
+            if instance is None:
+                instance = model(**values)
+                created.append(instance)
+            elif any(
+                getattr(instance, name) != value for name, value in values.items()
+            ):
+                for name, value in values.items():
+                    setattr(instance, name, value)
+                updated.append(instance)
+            if slugs is not None:
+                links.append((number, instance, slugs))
+        relinked, touched = _diff_links(links, existing.values())
+        changed = set(map(id, updated))
+        updated += [instance for instance in relinked if id(instance) not in changed]
+
+        derived = ["last_modified"] if model is Category else DERIVED_FIELDS
+        for instance in created + updated:
+            if model is not Category:
+                markup.render_body(instance)  # normally done by a pre_save receiver
+            instance.last_modified = now  # bulk_update does not set auto_now
+        _create(model, created, key_fields + value_fields)
+        if updated:
+            model.objects.bulk_update(updated, [*value_fields, *derived])
+        _write_links(links, relinked, created)
+
+        # what the signal receivers would do for every saved object
+        if touched:
+            refresh_post_counts(touched)
+        if model in engine.registered_models() and created + updated:
+            engine.index_objects(model, created, replace=False)
+            engine.index_objects(model, updated, replace=True)
+        if model is Category:
+            if updated:  # posts displaying a renamed category have changed
+                categories_changed(
+                    Post.objects.filter(categories__in=updated)
+                    .values_list("pk", flat=True)
+                    .distinct()
+                )
+        else:
+            pagecache.invalidate(model, [instance.pk for instance in updated])
+
+    label = model._meta.label_lower
+    stats[label]["created"] += len(created)
+    stats[label]["updated"] += len(updated)
+    stats[label]["unchanged"] += len(rows) - len(created) - len(updated)
+
+
+def _create(model, instances, fields):
+    """Insert new objects in bulk, keeping the values of auto_now_add fields"""
+    if not instances:
+        return
+    values = [
+        {name: getattr(instance, name) for name in fields} for instance in instances
+    ]
+    model.objects.bulk_create(instances)
+    if not connection.features.can_return_rows_from_bulk_insert:  # e.g. MySQL
+        _select_created(model, instances)
+    # bulk_create overwrites e.g. created_on with the current time
+    auto_fields = [
+        field.name
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now_add", False) and field.name in fields
+    ]
+    if auto_fields:
+        for instance, instance_values in zip(instances, values):
+            for name in auto_fields:
+                setattr(instance, name, instance_values[name])
+        model.objects.bulk_update(instances, auto_fields)
+
+
+def _select_created(model, instances):
+    """Set the primary keys of inserted objects, read by their natural keys
+
+    The keys are the values as inserted, i.e. with the creation time set by
+    bulk_create, which the rows inserted by other writers in between do not have.
+    """
+    key_fields = SPECS[model][0]
+    created = defaultdict(list)
+    for instance in instances:
+        created[tuple(getattr(instance, name) for name in key_fields)].append(instance)
+    lookup = {f"{key_fields[0]}__in": {key[0] for key in created}}
+    rows = model.objects.filter(**lookup).order_by("pk").values_list("pk", *key_fields)
+    for pk, *key in rows:
+        same = created.get(tuple(key))
+        if same:  # in the order of insertion, if the key is not unique
+            same.pop(0).pk = pk
+
+
+def _diff_links(links, existing):
+    """Return the existing posts whose categories differ and the affected categories
+
+    The slugs of the records are replaced by the primary keys of the categories,
+    in place.
+    """
+    if not links:
+        return [], set()
+    slugs = {slug for _, _, post_slugs in links for slug in post_slugs}
+    pks = dict(Category.objects.filter(slug__in=slugs).values_list("slug", "pk"))
+    current = defaultdict(set)
+    for post_id, category_id in Post.categories.through.objects.filter(
+        post__in=[instance.pk for instance in existing]
+    ).values_list("post_id", "category_id"):
+        current[post_id].add(category_id)
+
+    relinked, touched = [], set()
+    for index, (number, instance, post_slugs) in enumerate(links):
+        unknown = [slug for slug in post_slugs if slug not in pks]
+        if unknown:
+            raise ValueError(f"line {number}: unknown category {unknown[0]!r}")
+        wanted = {pks[slug] for slug in post_slugs}
+        links[index] = (number, instance, wanted)
+        if instance.pk is None:  # a new post
+            touched |= wanted
+        elif wanted != current[instance.pk]:
+            relinked.append(instance)
+            touched |= wanted ^ current[instance.pk]
+    return relinked, touched
+
+
+def _write_links(links, relinked, created):
+    """Replace the categories of changed posts and add those of new posts"""
+    through = Post.categories.through
+    through.objects.filter(post__in=relinked).delete()
+    written = set(map(id, relinked + created))
+    through.objects.bulk_create(
+        [
+            through(post_id=instance.pk, category_id=category_pk)
+            for _, instance, category_pks in links
+            if id(instance) in written
+            for category_pk in category_pks
+        ]
+    )
@@ -0,0 +1,11 @@
+from django.conf import settings
+
+
+def fragment_cache(request):
+    """Add the timeout of the {% cache %} fragments to the context of templates"""
+    return {"FRAGMENT_CACHE_TIMEOUT": settings.FRAGMENT_CACHE_TIMEOUT}
+
+
+def static_export(request):
+    """Add whether the page is rendered by portfolio.export to the context"""
+    return {"STATIC_EXPORT": settings.STATIC_EXPORT}
@@ -0,0 +1,10 @@
+"""MySQL backend of mysqlclient with a pool of connections"""
+
+from django.db.backends.mysql import base
+from portfolio.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def check_connection(self, connection):
+        connection.ping()  # a round trip without parsing a statement
@@ -0,0 +1,8 @@
+"""SQLite backend with a pool of connections, e.g. as a stand-in for benchmarks"""
+
+from django.db.backends.sqlite3 import base
+from portfolio.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
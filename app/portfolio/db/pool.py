@@ -0,0 +1,183 @@
+"""Pool of database connections shared by all threads of a process
+
+Django opens a connection per thread and closes it at the end of every request
+when CONN_MAX_AGE is 0. Under ASGI, the requests are not even handled by the same
+threads, so persistent connections cannot be reused either. The pooled backends
+in ``portfolio.db.backends`` hand closed connections to a pool instead, from which
+the next request of any thread takes them after a health check.
+
+The pool is configured in the ``OPTIONS`` of a database::
+
+    "OPTIONS": {"pool": {"size": 10, "max_idle": 300}}
+
+``size`` is the number of idle connections kept open, ``max_idle`` the number of
+seconds after which an idle connection is closed. Without the option, connections
+are not pooled.
+"""
+
+import threading
+import time
+from collections import deque
+
+from django.utils.asyncio import async_unsafe
+
+DEFAULT_SIZE = 10
+DEFAULT_MAX_IDLE = 300
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _discard(connection):
+    try:
+        connection.close()
+    except Exception:  # the connection is already broken
+        pass
+
+
+class ConnectionPool:
+    """Idle connections to one database, the most recently used one first"""
+
+    def __init__(self):
+        self._idle = deque()  # (connection, time of the release) tuples
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._idle)
+
+    def acquire(self, check, max_idle=DEFAULT_MAX_IDLE):
+        """Return a healthy idle connection, or None if there is none
+
+        Parameters
+        ----------
+        :param check:
+            a function raising an exception if a connection is not usable
+        :param max_idle:
+            the number of seconds after which idle connections are closed
+        :return:
+            the connection or None
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, released = self._idle.pop()
+            if time.monotonic() - released > max_idle:
+                _discard(connection)
+                continue
+            try:
+                check(connection)
+            except Exception:  # e.g. closed by the server, open a new one instead
+                _discard(connection)
+                continue
+            return connection
+
+    def release(self, connection, reset, size=DEFAULT_SIZE, max_idle=DEFAULT_MAX_IDLE):
+        """Return a connection to the pool, or close it if the pool is full
+
+        Parameters
+        ----------
+        :param connection:
+            the connection which is no longer used
+        :param reset:
+            a function discarding the session state of the connection
+        :param size:
+            the maximum number of idle connections
+        :param max_idle:
+            the number of seconds after which idle connections are closed
+        """
+        try:
+            reset(connection)
+        except Exception:
+            _discard(connection)
+            return
+
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            # the least recently used connections are at the left end
+            while self._idle and now - self._idle[0][1] > max_idle:
+                expired.append(self._idle.popleft()[0])
+            if len(self._idle) < size:
+                self._idle.append((connection, now))
+                connection = None
+        for idle in expired:
+            _discard(idle)
+        if connection is not None:
+            _discard(connection)
+
+    def clear(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            _discard(connection)
+
+
+def get_pool(conn_params):
+    """Return the pool of the connections opened with the given parameters"""
+    key = repr(sorted(conn_params.items()))
+    with _pools_lock:
+        return _pools.setdefault(key, ConnectionPool())
+
+
+def clear_pools():
+    """Close the idle connections of all pools, e.g. before forking"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.clear()
+
+
+class PooledDatabaseWrapperMixin:
+    """Mixin for a DatabaseWrapper taking and returning connections from a pool"""
+
+    def pool_options(self):
+        """Return the pool options of the database, or None if it is not pooled"""
+        options = self.settings_dict["OPTIONS"].get("pool")
+        if options is None:
+            return None
+        return {
+            "size": options.get("size", DEFAULT_SIZE),
+            "max_idle": options.get("max_idle", DEFAULT_MAX_IDLE),
+        }
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop("pool", None)  # not a parameter of the database driver
+        return conn_params
+
+    def check_connection(self, connection):
+        """Raise an exception if a pooled connection is not usable"""
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+
+    def reset_connection(self, connection):
+        """Discard the session state of a connection returned to the pool"""
+        connection.rollback()
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        options = self.pool_options()
+        if options is not None:
+            self._pool = get_pool(conn_params)
+            connection = self._pool.acquire(self.check_connection, options["max_idle"])
+            if connection is not None:
+                return connection
+        return super().get_new_connection(conn_params)
+
+    def _close(self):
+        options = self.pool_options()
+        if self.connection is None or options is None or self.in_atomic_block:
+            # a connection closed within a transaction is still referenced
+            return super()._close()
+        with self.wrap_database_errors:
+            self._pool.release(
+                self.connection,
+                self.reset_connection,
+                options["size"],
+                options["max_idle"],
+            )
@@ -0,0 +1,213 @@
+"""Export of the site as static files
+
+Every page routed by ``portfolio.urls`` is rendered through the regular views and
+written as ``<path>/index.html`` into an output directory, together with the
+static and media files, so that a plain file server can serve the site.
+
+Listings are rendered on a single page, because a file server cannot serve the
+cursors in the query strings of the pagination links. The pages are rendered with
+``STATIC_EXPORT``, which leaves out the link to the search, and with a cache of
+their own, so that no page or fragment cached with the link is exported.
+
+A manifest in the output directory remembers the ETag of every exported page.
+The ETags of the content views are derived from the ``last_modified`` values of
+the Post, Project and Category rows they display, so incremental exports request
+the pages with ``If-None-Match`` and only pages whose rows have changed since the
+last export are rendered again.
+"""
+
+import json
+import os
+import re
+import shutil
+
+from blog.models import Category, Post
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from projects.models import Project
+
+MANIFEST = "manifest.json"
+# large enough to render every listing on a single page
+SINGLE_PAGE = 10**9
+# the cache of the rendered pages and fragments, not shared with the server
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "export",
+    }
+}
+# pages which need a server to process the submitted form or report its state
+EXCLUDED = {"contact", "success", "metrics", "search", "search_autocomplete"}
+# the keyword arguments of all pages of the URL patterns with parameters
+PARAMETERS = {
+    "blog_detail": lambda: [
+        {"pk": pk} for pk in Post.objects.values_list("pk", flat=True)
+    ],
+    "blog_category": lambda: [
+        {"slug": slug} for slug in Category.objects.values_list("slug", flat=True)
+    ],
+    "blog_category_feed": lambda: PARAMETERS["blog_category"](),
+    "blog_category_atom_feed": lambda: PARAMETERS["blog_category"](),
+    "project_detail": lambda: [
+        {"pk": pk} for pk in Project.objects.values_list("pk", flat=True)
+    ],
+}
+PARAMETER_RE = re.compile(r"<(?:\w+:)?(\w+)>")
+
+
+def _routes(patterns, prefix=""):
+    """Yield the name and the route of all URL patterns of a URLconf"""
+    for pattern in patterns:
+        route = str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace == "admin":
+                continue
+            yield from _routes(pattern.url_patterns, prefix + route)
+        elif isinstance(pattern, URLPattern) and not route.startswith("^"):
+            yield pattern.name, prefix + route
+
+
+def routes(excluded=EXCLUDED):
+    """Return the paths of the pages of all URL patterns, by their route
+
+    Parameters
+    ----------
+    :param excluded:
+        the names of the URL patterns to be skipped
+    :return:
+        a dictionary mapping routes like "/blog/post/<int:pk>/" to lists of paths
+    """
+    paths = {}
+    for name, route in _routes(get_resolver().url_patterns):
+        if name in excluded:
+            continue
+        if not PARAMETER_RE.search(route):
+            paths[f"/{route}"] = [f"/{route}"]
+        elif name in PARAMETERS:
+            paths[f"/{route}"] = [
+                "/" + PARAMETER_RE.sub(lambda m: str(kwargs[m.group(1)]), route)
+                for kwargs in PARAMETERS[name]()
+            ]
+    return paths
+
+
+def pages():
+    """Return the sorted absolute paths of all pages to be exported, like /blog/"""
+    return sorted({path for paths in routes().values() for path in paths})
+
+
+def _page_file(output, path):
+    return os.path.join(output, *path.strip("/").split("/"), "index.html")
+
+
+def _write(filename, content):
+    """Write a file unless it already has the content, return whether it was written"""
+    if os.path.exists(filename):
+        with open(filename, "rb") as existing:
+            if existing.read() == content:
+                return False
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "wb") as file:
+        file.write(content)
+    return True
+
+
+def _copy(source, target):
+    """Copy a file unless the target has the same size and modification time"""
+    if os.path.exists(target):
+        source_stat, target_stat = os.stat(source), os.stat(target)
+        if (source_stat.st_size, int(source_stat.st_mtime)) == (
+            target_stat.st_size,
+            int(target_stat.st_mtime),
+        ):
+            return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copy2(source, target)
+    return True
+
+
+def _files(root):
+    """Yield the path relative to root and the file name of all files below root"""
+    for directory, _, files in os.walk(root):
+        for name in files:
+            filename = os.path.join(directory, name)
+            yield os.path.relpath(filename, root), filename
+
+
+def _static_files():
+    """Yield the URL path and the file name of all static files"""
+    if settings.STATIC_ROOT and os.path.isdir(settings.STATIC_ROOT):
+        # the fingerprinted and compressed files of collectstatic
+        for path, filename in _files(settings.STATIC_ROOT):
+            if not path.startswith("admin/"):  # the admin is not exported
+                yield path, filename
+        return
+    for finder in finders.get_finders():
+        for path, storage in finder.list(["admin/*"]):
+            prefix = getattr(storage, "prefix", None)
+            yield os.path.join(prefix, path) if prefix else path, storage.path(path)
+
+
+def export(output, full=False, host="localhost"):
+    """Export the site into a directory
+
+    Parameters
+    ----------
+    :param output:
+        the output directory, created if it does not exist
+    :param full:
+        whether all pages have to be rendered, regardless of the manifest
+    :param host:
+        the host name the pages are requested with
+    :return:
+        a dictionary with the numbers of "rendered", "unchanged" and "removed"
+        pages and the number of "copied" static and media files
+    """
+    manifest_file = os.path.join(output, MANIFEST)
+    manifest = {}
+    if not full and os.path.exists(manifest_file):
+        with open(manifest_file) as file:
+            manifest = json.load(file)
+
+    stats = {"rendered": 0, "unchanged": 0, "removed": 0, "copied": 0}
+    exported = {}
+    client = Client(SERVER_NAME=host)
+    with override_settings(
+        PAGE_SIZE=SINGLE_PAGE, ALLOWED_HOSTS=[host], STATIC_EXPORT=True, CACHES=CACHES
+    ):
+        for path in pages():
+            filename = _page_file(output, path)
+            headers = {}
+            if manifest.get(path) and os.path.exists(filename):
+                headers["if-none-match"] = manifest[path]
+            response = client.get(path, headers=headers)
+            if response.status_code == 304:
+                stats["unchanged"] += 1
+            elif response.status_code == 200:
+                _write(filename, response.content)
+                stats["rendered"] += 1
+            else:
+                raise ValueError(f"{path} responded with {response.status_code}")
+            exported[path] = response.get("ETag")
+
+    for path in manifest.keys() - exported.keys():  # the objects have been deleted
+        filename = _page_file(output, path)
+        if os.path.exists(filename):
+            os.remove(filename)
+            stats["removed"] += 1
+
+    for url, files in (
+        (settings.STATIC_URL, _static_files()),
+        (settings.MEDIA_URL, _files(settings.MEDIA_ROOT)),
+    ):
+        directory = os.path.join(output, *url.strip("/").split("/"))
+        for path, filename in files:
+            stats["copied"] += _copy(filename, os.path.join(directory, path))
+
+    os.makedirs(output, exist_ok=True)
+    with open(manifest_file, "w") as file:
+        json.dump(exported, file, indent=2, sort_keys=True)
+    return stats
@@ -0,0 +1,226 @@
+"""Resized and WebP derivatives of the images of posts and projects
+
+For every width in ``settings.IMAGE_DERIVATIVE_WIDTHS`` smaller than the original
+image, a resized copy in the original format and a WebP copy are stored next to
+the media files under ``derivatives/``. A WebP copy in the original size is
+stored as well. The dimensions of the original and the names of the derivatives
+are saved on the object, so that templates can render ``width``, ``height`` and
+``srcset`` without opening the file or asking the storage which copies exist.
+"""
+
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+DERIVATIVES_DIR = "derivatives"
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 80, "method": 6},
+}
+
+logger = logging.getLogger(__name__)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-derivatives")
+
+
+def derivative_name(name, width, extension=None):
+    """Return the storage name of the derivative of an image in a given width
+
+    Parameters
+    ----------
+    :param name:
+        the storage name of the original image, e.g. "post_images/avatar.png"
+    :param width:
+        the width of the derivative in pixels
+    :param extension:
+        the file extension of the derivative, defaults to the one of the original
+    :return:
+        the storage name of the derivative
+    """
+    root, original_extension = posixpath.splitext(name)
+    extension = extension or original_extension.lstrip(".")
+    return posixpath.join(DERIVATIVES_DIR, f"{root}-{width}w.{extension}")
+
+
+def derivative_widths(width):
+    """Return the widths of the resized derivatives of an image"""
+    return [target for target in settings.IMAGE_DERIVATIVE_WIDTHS if target < width]
+
+
+def _names(name, width):
+    """Return the storage names of all derivatives of an image"""
+    names = [derivative_name(name, width, "webp")]
+    for target in derivative_widths(width):
+        names.append(derivative_name(name, target))
+        names.append(derivative_name(name, target, "webp"))
+    return names
+
+
+def _complete(instance):
+    """Return whether all derivatives of the image of an object exist
+
+    Only the stored dimensions and the storage are looked at, not the image. A new
+    upload gets a new name, whose derivatives are missing.
+    """
+    field_file = instance.image
+    width = instance.image_width
+    if not width:  # not generated yet
+        return False
+    names = _names(field_file.name, width)
+    return all(field_file.storage.exists(name) for name in names)
+
+
+def _save(storage, name, image, image_format, force):
+    if storage.exists(name):
+        if not force:
+            return False
+        storage.delete(name)
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **SAVE_OPTIONS.get(image_format, {}))
+    storage.save(name, ContentFile(buffer.getvalue()))
+    return True
+
+
+def generate_derivatives(instance, force=False):
+    """Create the missing derivatives of the image of an object
+
+    Parameters
+    ----------
+    :param instance:
+        a post or project with an ``image``, ``image_width`` and ``image_height``
+    :param force:
+        whether existing derivatives have to be replaced
+    :return:
+        the number of files written
+    """
+    field_file = instance.image
+    if not force and _complete(instance):
+        # e.g. the post has been saved with the same image again
+        _record(instance, instance.image_width, instance.image_height)
+        return 0
+    storage = field_file.storage
+    written = 0
+    with field_file.open("rb"), Image.open(field_file) as original:
+        original.load()
+        image_format = original.format
+        width, height = original.size
+        webp = (
+            original if original.mode in ("RGB", "RGBA") else original.convert("RGBA")
+        )
+        for target in derivative_widths(width):
+            resized = webp.resize(
+                (target, round(height * target / width)), Image.Resampling.LANCZOS
+            )
+            written += _save(
+                storage,
+                derivative_name(field_file.name, target),
+                resized,
+                image_format,
+                force,
+            )
+            written += _save(
+                storage,
+                derivative_name(field_file.name, target, "webp"),
+                resized,
+                "WEBP",
+                force,
+            )
+        written += _save(
+            storage,
+            derivative_name(field_file.name, width, "webp"),
+            webp,
+            "WEBP",
+            force,
+        )
+
+    _record(instance, width, height)
+    return written
+
+
+def _record(instance, width, height):
+    """Save the dimensions of the image of an object and the names of its copies"""
+    names = _names(instance.image.name, width)
+    stored = (instance.image_width, instance.image_height, instance.image_derivatives)
+    if stored != (width, height, names):
+        # bypass save() and its signals, but bump last_modified for cached pages
+        type(instance).objects.filter(pk=instance.pk).update(
+            image_width=width,
+            image_height=height,
+            image_derivatives=names,
+            last_modified=timezone.now(),
+        )
+        instance.image_width, instance.image_height = width, height
+        instance.image_derivatives = names
+
+
+def _generate_in_background(model, pk):
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is not None and instance.image:
+            generate_derivatives(instance)
+    except Exception:  # nobody waits for the result, so make failures visible
+        logger.exception("Generating image derivatives of %s %s failed", model, pk)
+    finally:
+        connections.close_all()  # connections are per thread
+
+
+def schedule_derivatives(instance):
+    """Generate the derivatives of the image of an object after the commit
+
+    The work is done by a background thread unless
+    ``settings.IMAGE_DERIVATIVES_ASYNC`` is disabled.
+
+    Parameters
+    ----------
+    :param instance:
+        a saved post or project
+    """
+    if not instance.image:
+        return
+    model, pk = type(instance), instance.pk
+    if settings.IMAGE_DERIVATIVES_ASYNC:
+        transaction.on_commit(
+            lambda: _executor.submit(_generate_in_background, model, pk)
+        )
+    else:
+        transaction.on_commit(lambda: generate_derivatives(instance))
+
+
+def sources(instance):
+    """Return the srcset candidates of the generated derivatives of an image
+
+    Only the derivatives recorded on the object are offered, without asking the
+    storage, so those of a replaced image or of a width added to the settings are
+    left out until they are generated.
+
+    Parameters
+    ----------
+    :param instance:
+        a post or project whose image has dimensions
+    :return:
+        a tuple of two lists of (url, width) tuples, the first in the original
+        format including the original image, the second in WebP
+    """
+    field_file = instance.image
+    storage = field_file.storage
+    generated = set(instance.image_derivatives)
+    original, webp = [], []
+    for target in derivative_widths(instance.image_width):
+        for candidates, extension in ((original, None), (webp, "webp")):
+            name = derivative_name(field_file.name, target, extension)
+            if name in generated:
+                candidates.append((storage.url(name), target))
+    original.append((field_file.url, instance.image_width))
+    name = derivative_name(field_file.name, instance.image_width, "webp")
+    if name in generated:
+        webp.append((storage.url(name), instance.image_width))
+    return original, webp
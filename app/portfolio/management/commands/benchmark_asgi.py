@@ -0,0 +1,67 @@
+import asyncio
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from portfolio.benchmark import (
+    generate_content,
+    percentiles,
+    request_paths,
+    run_asgi,
+    run_wsgi,
+    search_paths,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the read views served through portfolio.wsgi "
+        "and portfolio.asgi under concurrent load, in a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000)
+        parser.add_argument("--projects", type=int, default=100)
+        parser.add_argument("--requests", type=int, default=2_000)
+        parser.add_argument(
+            "--concurrency", type=int, default=32, help="requests in flight at once"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            generate_content(self.random, options["posts"], options["projects"])
+            paths = [
+                path
+                for _, path in request_paths(
+                    self.random, options["requests"], extra=search_paths()
+                )
+            ]
+            concurrency = options["concurrency"]
+            # imported here, so that they use the settings of the test database
+            from portfolio.asgi import application as asgi_application
+            from portfolio.wsgi import application as wsgi_application
+
+            for name, run in (
+                ("WSGI", lambda: run_wsgi(wsgi_application, paths, concurrency)),
+                (
+                    "ASGI",
+                    lambda: asyncio.run(run_asgi(asgi_application, paths, concurrency)),
+                ),
+            ):
+                run()  # warm up the caches and connections
+                start = time.perf_counter()
+                durations = [duration for duration, _ in run()]
+                elapsed = time.perf_counter() - start
+                stats = percentiles(durations)
+                self.stdout.write(
+                    f"{name}: {len(durations) / elapsed:7.0f} requests/s, "
+                    f"mean {stats['mean']:6.2f} ms, p50 {stats['p50']:6.2f} ms, "
+                    f"p95 {stats['p95']:6.2f} ms"
+                )
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from portfolio.benchmark import (
+    generate_content,
+    percentiles,
+    request_paths,
+    run_asgi,
+    run_wsgi,
+    search_paths,
+)
+from portfolio.db.pool import PooledDatabaseWrapperMixin, clear_pools
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the read views with and without the connection "
+        "pool of portfolio.db.backends, in a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000)
+        parser.add_argument("--projects", type=int, default=100)
+        parser.add_argument("--requests", type=int, default=2_000)
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="requests in flight at once"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if not isinstance(connection, PooledDatabaseWrapperMixin):
+            raise CommandError(
+                "The ENGINE of the default database is not a pooled backend of "
+                "portfolio.db.backends, e.g. portfolio.db.backends.sqlite3"
+            )
+        settings_dict = connection.settings_dict
+        pool = settings_dict["OPTIONS"].get("pool") or {}
+        self.random = random.Random(options["seed"])
+
+        directory = None
+        if connection.vendor == "sqlite":  # in-memory databases are never closed
+            directory = tempfile.mkdtemp()
+            settings_dict["TEST"]["NAME"] = os.path.join(directory, "benchmark.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            generate_content(self.random, options["posts"], options["projects"])
+            paths = [
+                path
+                for _, path in request_paths(
+                    self.random, options["requests"], extra=search_paths()
+                )
+            ]
+            concurrency = options["concurrency"]
+            # imported here, so that they use the settings of the test database
+            from portfolio.asgi import application as asgi_application
+            from portfolio.wsgi import application as wsgi_application
+
+            for pooled in (False, True):
+                # the settings are shared by the connections of all threads
+                settings_dict["OPTIONS"].pop("pool", None)
+                if pooled:
+                    settings_dict["OPTIONS"]["pool"] = {**pool, "size": concurrency}
+                for name, run in (
+                    ("WSGI", lambda: run_wsgi(wsgi_application, paths, concurrency)),
+                    (
+                        "ASGI",
+                        lambda: asyncio.run(
+                            run_asgi(asgi_application, paths, concurrency)
+                        ),
+                    ),
+                ):
+                    run()  # warm up the caches
+                    start = time.perf_counter()
+                    durations = [duration for duration, _ in run()]
+                    elapsed = time.perf_counter() - start
+                    stats = percentiles(durations)
+                    self.stdout.write(
+                        f"{name} {'with' if pooled else 'without'} pool: "
+                        f"{len(durations) / elapsed:7.0f} requests/s, "
+                        f"mean {stats['mean']:6.2f} ms, p50 {stats['p50']:6.2f} ms, "
+                        f"p95 {stats['p95']:6.2f} ms"
+                    )
+        finally:
+            settings_dict["OPTIONS"].pop("pool", None)
+            if pool:
+                settings_dict["OPTIONS"]["pool"] = pool
+            connections.close_all()
+            clear_pools()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if directory:
+                os.rmdir(directory)
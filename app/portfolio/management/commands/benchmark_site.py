@@ -0,0 +1,149 @@
+import json
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+from portfolio.benchmark import (
+    generate_content,
+    peak_memory,
+    regressions,
+    report,
+    request_paths,
+    run_wsgi,
+    search_paths,
+)
+
+PARAMETERS = ["posts", "categories", "projects", "links", "images", "samples", "seed"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every page of the site under concurrent load in a throwaway test "
+        "database filled with synthetic content, reporting the latency and queries "
+        "per route, optionally against a saved baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1_000)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--projects", type=int, default=100)
+        parser.add_argument("--links", type=int, default=2, help="categories per post")
+        parser.add_argument(
+            "--images", type=int, default=5, help="distinct images of the content"
+        )
+        parser.add_argument("--requests", type=int, default=2_000)
+        parser.add_argument(
+            "--concurrency", type=int, default=8, help="requests in flight at once"
+        )
+        parser.add_argument(
+            "--samples", type=int, default=20, help="pages requested per route"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--save-baseline", metavar="PATH", help="write the report to a JSON file"
+        )
+        parser.add_argument(
+            "--baseline", metavar="PATH", help="compare against a saved report"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="accepted relative increase of the p95 latency, default 0.25",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"]) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read the baseline: {error}")
+        parameters = {name: options[name] for name in PARAMETERS}
+        self.random = random.Random(options["seed"])
+
+        media_root = tempfile.mkdtemp()
+        old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                routes, elapsed = self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(media_root)
+
+        self.write_report(routes, options["requests"] / elapsed)
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as file:
+                json.dump({"parameters": parameters, "routes": routes}, file, indent=2)
+            self.stdout.write(f"Baseline saved to {options['save_baseline']}")
+        if baseline is not None:
+            self.compare(routes, parameters, baseline, options["tolerance"])
+
+    def run(self, options):
+        """Generate the content and request the pages, returning the report"""
+        start = time.perf_counter()
+        generate_content(
+            self.random,
+            options["posts"],
+            options["projects"],
+            options["categories"],
+            options["links"],
+            options["images"],
+        )
+        self.stdout.write(f"Content generated in {time.perf_counter() - start:.1f} s")
+
+        requests = request_paths(
+            self.random, options["requests"], options["samples"], search_paths()
+        )
+        paths = [path for _, path in requests]
+        # imported here, so that it uses the settings of the test database
+        from portfolio.wsgi import application
+
+        run_wsgi(application, paths, options["concurrency"])  # warm up the caches
+        start = time.perf_counter()
+        results = run_wsgi(application, paths, options["concurrency"])
+        elapsed = time.perf_counter() - start
+        return (
+            report(
+                (route, duration, queries)
+                for (route, _), (duration, queries) in zip(requests, results)
+            ),
+            elapsed,
+        )
+
+    def write_report(self, routes, throughput):
+        width = max(len(route) for route in routes)
+        self.stdout.write(
+            f"{'route':<{width}} {'requests':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+            f"{'queries':>7} {'max':>4}"
+        )
+        for route, stats in routes.items():
+            self.stdout.write(
+                f"{route:<{width}} {stats['requests']:8} {stats['p50']:8.2f} "
+                f"{stats['p95']:8.2f} {stats['p99']:8.2f} {stats['queries']:7.1f} "
+                f"{stats['max_queries']:4}"
+            )
+        memory = peak_memory()
+        self.stdout.write(
+            f"{throughput:.0f} requests/s, latencies in ms, peak memory "
+            + (f"{memory:.0f} MiB" if memory is not None else "unknown")
+        )
+
+    def compare(self, routes, parameters, baseline, tolerance):
+        if baseline.get("parameters") != parameters:
+            self.stderr.write(
+                "The baseline was measured with other parameters: "
+                f"{baseline.get('parameters')}"
+            )
+        messages = regressions(routes, baseline.get("routes", {}), tolerance)
+        if messages:
+            for message in messages:
+                self.stderr.write(message)
+            raise CommandError(f"{len(messages)} regression(s) against the baseline")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -0,0 +1,36 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from portfolio import content
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream all categories, posts and projects to a JSON Lines file, which "
+        "import_content loads into any database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='the file written to, "-" for stdout')
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=content.BATCH_SIZE,
+            help="objects loaded per query",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options["path"] == "-":
+            counts = content.export_content(sys.stdout, options["batch_size"])
+            report = self.stderr  # keep stdout a valid dump
+        else:
+            with open(options["path"], "w", encoding="utf-8") as file:
+                counts = content.export_content(file, options["batch_size"])
+            report = self.stdout
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        for label, count in counts.items():
+            report.write(f"{label}: {count} exported")
+        report.write(f"{total} objects in {elapsed:.1f} s, {total / elapsed:.0f}/s")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from portfolio import export
+
+
+class Command(BaseCommand):
+    help = "Export the rendered pages, static and media files for a plain file server"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="the directory the site is exported to")
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="render all pages instead of only the changed ones",
+        )
+        parser.add_argument(
+            "--host",
+            default="localhost",
+            help="the host name the pages are requested with",
+        )
+
+    def handle(self, *args, **options):
+        stats = export.export(options["output"], options["full"], options["host"])
+        self.stdout.write(
+            f"{stats['rendered']} pages rendered, {stats['unchanged']} unchanged, "
+            f"{stats['removed']} removed, {stats['copied']} files copied"
+        )
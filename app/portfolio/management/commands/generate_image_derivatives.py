@@ -0,0 +1,28 @@
+from blog.models import Post
+from django.core.management.base import BaseCommand
+from portfolio import images
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = "Generate the missing resized and WebP copies of all post and project images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", help="replace existing derivatives"
+        )
+
+    def handle(self, *args, **options):
+        for model in (Post, Project):
+            objects = written = 0
+            for instance in model.objects.exclude(image="").exclude(image=None):
+                try:
+                    written += images.generate_derivatives(instance, options["force"])
+                except (FileNotFoundError, OSError) as error:
+                    self.stderr.write(f"Skipped {instance.image.name}: {error}")
+                    continue
+                objects += 1
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: wrote {written} files "
+                f"for {objects} images"
+            )
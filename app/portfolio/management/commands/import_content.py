@@ -0,0 +1,42 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from portfolio import content
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update categories, posts and projects from a JSON Lines file "
+        "written by export_content, in batches of bulk queries"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='the file read, "-" for stdin')
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=content.BATCH_SIZE,
+            help="objects written per batch",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            if options["path"] == "-":
+                stats = content.import_content(sys.stdin, options["batch_size"])
+            else:
+                with open(options["path"], encoding="utf-8") as file:
+                    stats = content.import_content(file, options["batch_size"])
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Cannot import {options['path']}: {error}")
+        elapsed = time.perf_counter() - start
+        total = sum(sum(counts.values()) for counts in stats.values())
+        for label, counts in stats.items():
+            self.stdout.write(
+                f"{label}: {counts['created']} created, {counts['updated']} updated, "
+                f"{counts['unchanged']} unchanged"
+            )
+        self.stdout.write(
+            f"{total} objects in {elapsed:.1f} s, {total / elapsed:.0f}/s"
+        )
@@ -0,0 +1,18 @@
+from blog.models import Post
+from django.core.management.base import BaseCommand
+from portfolio import pagecache
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = "Report the hit and miss counters of the cached post and project pages"
+
+    def handle(self, *args, **options):
+        for model in (Post, Project):
+            counters = pagecache.stats(model)
+            requests = counters["hits"] + counters["misses"]
+            ratio = counters["hits"] / requests if requests else 0
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: {counters['hits']} hits, "
+                f"{counters['misses']} misses ({ratio:.0%} hit ratio)"
+            )
@@ -0,0 +1,75 @@
+import io
+import os
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import Resolver404, resolve
+from django.utils.http import urlencode
+from portfolio import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile a request of any page in process and store the pstats, flame graph "
+        "and SQL trace, or print a token for profiling the page on a server"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="the path of the page, e.g. /blog/")
+        parser.add_argument(
+            "--token",
+            action="store_true",
+            help="print a URL with a token for profiling the path on a server",
+        )
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="request the page once before, e.g. to profile a cached page",
+        )
+        parser.add_argument("--output", help="the directory the results are stored in")
+        parser.add_argument(
+            "--sort", default="cumulative", help="the order of the pstats report"
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20, help="the functions of the report"
+        )
+        parser.add_argument("--host", default="localhost")
+
+    def handle(self, *args, **options):
+        path, _, query_string = options["path"].partition("?")
+        try:
+            resolve(path)
+        except Resolver404:
+            raise CommandError(f"{path} is not routed by {resolve.__module__}")
+        if options["token"]:
+            parameters = urlencode(
+                {"profile": 1, "profile_token": profiling.make_token(path)}
+            )
+            separator = "&" if query_string else "?"
+            self.stdout.write(f"{options['path']}{separator}{parameters}")
+            return
+
+        client = Client(SERVER_NAME=options["host"])
+        for connection in connections.all():
+            profiling.trace_queries(connection)
+        with override_settings(ALLOWED_HOSTS=[options["host"]], PROFILING_ENABLED=True):
+            if options["warm"]:
+                client.get(options["path"])
+            with profiling.profile() as result:
+                response = client.get(options["path"])
+        directory = result.save(path, options["output"])
+
+        report = io.StringIO()
+        stats = pstats.Stats(result.profiler, stream=report)
+        stats.sort_stats(options["sort"]).print_stats(options["limit"])
+        self.stdout.write(report.getvalue())
+        self.stdout.write(
+            f"{response.status_code} in {result.seconds * 1000:.1f} ms, "
+            f"{len(result.queries)} queries, "
+            f"{sum(result.sampler.stacks.values())} samples"
+        )
+        for name in sorted(os.listdir(directory)):
+            self.stdout.write(os.path.join(directory, name))
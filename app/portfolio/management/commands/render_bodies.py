@@ -0,0 +1,18 @@
+from blog.models import Post
+from django.core.management.base import BaseCommand
+from portfolio import markup
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the bodies of all posts and projects again, e.g. after changing "
+        "settings.BODY_MARKUP"
+    )
+
+    def handle(self, *args, **options):
+        for model in (Post, Project):
+            changed = markup.render_all(model)
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: rendered {changed} changed bodies"
+            )
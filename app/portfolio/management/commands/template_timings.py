@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from portfolio import export, templatetiming
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every page of the site and report how long the rendering of "
+        "each template took"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="requests of every page"
+        )
+        parser.add_argument(
+            "--samples", type=int, default=10, help="pages requested per route"
+        )
+        parser.add_argument("--host", default="localhost")
+
+    def handle(self, *args, **options):
+        client = Client(SERVER_NAME=options["host"])
+        paths = [
+            path
+            for paths in export.routes(excluded=()).values()
+            for path in paths[: options["samples"]]
+        ]
+        templatetiming.reset()
+        with override_settings(TEMPLATE_TIMING=True, ALLOWED_HOSTS=[options["host"]]):
+            for _ in range(options["repeat"]):
+                for path in paths:
+                    client.get(path)
+
+        timings = templatetiming.timings()
+        width = max((len(name) for name in timings), default=8)
+        self.stdout.write(
+            f"{'template':<{width}} {'renders':>7} {'total':>9} {'mean':>7} {'max':>7}"
+        )
+        for name, timing in timings.items():
+            self.stdout.write(
+                f"{name:<{width}} {timing['renders']:7} {timing['total']:9.1f} "
+                f"{timing['mean']:7.2f} {timing['max']:7.2f}"
+            )
+        self.stdout.write(
+            f"{len(paths)} pages requested {options['repeat']} times, durations in ms"
+        )
@@ -0,0 +1,141 @@
+"""Rendering of the bodies of posts and projects to HTML
+
+The HTML is rendered once when an object is saved and stored in its ``body_html``
+field, instead of running the ``linebreaks`` filter on every request. A plain text
+preview for the listings is stored in its ``excerpt`` field.
+``settings.BODY_MARKUP`` selects the renderer:
+
+- ``"plain"``: paragraphs and line breaks like the ``linebreaks`` filter, with all
+  HTML escaped
+- ``"markdown"``: Markdown, sanitized by an allowlist of tags and attributes, which
+  needs the optional Markdown and nh3 packages
+
+After changing the renderer, ``manage.py render_bodies`` renders all objects again.
+"""
+
+import html
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.html import linebreaks, strip_tags
+from django.utils.text import Truncator
+from portfolio import pagecache
+
+try:
+    import markdown
+    import nh3
+except ImportError:  # only needed for the Markdown renderer
+    markdown = nh3 = None
+
+EXCERPT_WORDS = 30
+EXCERPT_LENGTH = 300  # the max_length of the excerpt fields
+MARKDOWN_EXTENSIONS = ["extra", "sane_lists"]
+ALLOWED_TAGS = set(
+    "a abbr blockquote br code dd del dl dt em h1 h2 h3 h4 h5 h6 hr img li ol p pre "
+    "strong sup table tbody td th thead tr ul".split()
+)
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title"},
+    "abbr": {"title"},
+    "img": {"alt", "src", "title"},
+    "li": {"id"},
+    "sup": {"id"},
+    "td": {"align"},
+    "th": {"align"},
+}
+
+
+def render_plain(text):
+    """Return the text as escaped paragraphs, like the linebreaks filter"""
+    return linebreaks(text, autoescape=True)
+
+
+def render_markdown(text):
+    """Return the Markdown text as HTML without scripts, styles or event handlers"""
+    if markdown is None:
+        raise ImproperlyConfigured(
+            'BODY_MARKUP = "markdown" requires the Markdown and nh3 packages'
+        )
+    rendered = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+    return nh3.clean(rendered, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+
+
+RENDERERS = {"plain": render_plain, "markdown": render_markdown}
+
+
+def render(text):
+    """Render the body of a post or project with the configured renderer
+
+    Parameters
+    ----------
+    :param text:
+        the body as entered in the admin
+    :return:
+        the sanitized HTML
+    """
+    try:
+        renderer = RENDERERS[settings.BODY_MARKUP]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"BODY_MARKUP must be one of {', '.join(RENDERERS)}, "
+            f"not {settings.BODY_MARKUP!r}"
+        )
+    return renderer(text)
+
+
+def excerpt(body_html):
+    """Return the beginning of a rendered body as plain text
+
+    Parameters
+    ----------
+    :param body_html:
+        the body as rendered by render()
+    :return:
+        the first words of the text, at most EXCERPT_LENGTH characters long
+    """
+    text = " ".join(html.unescape(strip_tags(body_html)).split())
+    return Truncator(Truncator(text).words(EXCERPT_WORDS)).chars(EXCERPT_LENGTH)
+
+
+def render_body(instance):
+    """Set the rendered body and the excerpt of a post or project"""
+    instance.body_html = render(instance.body)
+    instance.excerpt = excerpt(instance.body_html)
+
+
+def render_all(model, batch_size=500):
+    """Render the bodies of all objects of a model again
+
+    Objects whose HTML changes are marked as modified, so that cached pages and
+    conditional requests are invalidated.
+
+    Parameters
+    ----------
+    :param model:
+        the model with a ``body``, ``body_html`` and ``excerpt`` field, e.g. Post
+    :param batch_size:
+        the number of objects updated per query
+    :return:
+        the number of objects whose HTML has changed
+    """
+    now = timezone.now()
+    changed = []
+    count = 0
+    objects = model.objects.only("pk", "body", "body_html", "excerpt").order_by("pk")
+    for instance in objects.iterator(chunk_size=batch_size):
+        rendered = (instance.body_html, instance.excerpt)
+        render_body(instance)
+        if (instance.body_html, instance.excerpt) != rendered:
+            instance.last_modified = now
+            changed.append(instance)
+        if len(changed) == batch_size:
+            count += _update(model, changed)
+            changed = []
+    return count + _update(model, changed)
+
+
+def _update(model, instances):
+    model.objects.bulk_update(instances, ["body_html", "excerpt", "last_modified"])
+    pagecache.invalidate(model, [instance.pk for instance in instances])
+    return len(instances)
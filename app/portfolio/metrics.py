@@ -0,0 +1,407 @@
+"""Per-view performance metrics in the Prometheus text format
+
+``MetricsMiddleware`` records for every response, labelled with the name of the
+resolved URL pattern:
+
+- the latency, as a histogram
+- the number of database queries and their total duration
+- the duration of the template rendering
+- the size of the body, as a histogram
+
+The numbers are aggregated in the memory of the process under a lock, so that a
+request only updates a few counters. With ``settings.METRICS_DIR`` set, every
+process also writes its totals to a file in that directory, at most once per
+``METRICS_FLUSH_INTERVAL``, and ``/metrics`` sums up the files of all worker
+processes. Without it, ``/metrics`` reports the process serving the request.
+
+Other parts of the site count their events with ``increment()``, e.g. the
+requests rejected by ``portfolio.ratelimit``, which are reported as counters.
+"""
+
+import atexit
+import bisect
+import contextvars
+import copy
+import json
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+SIZE_BUCKETS = [1024, 4096, 16384, 65536, 262144, 1048576]
+UNRESOLVED = "<unresolved>"  # requests not matching any URL pattern
+
+_views = {}  # view name -> totals, see _empty()
+_counters = {}  # counter name -> {labels: count}, see increment()
+_descriptions = {}  # counter name -> help text
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_flushed = 0.0  # time.monotonic() of the last flush
+# the queries and template rendering of the request being measured
+_current = contextvars.ContextVar("metrics_request", default=None)
+
+
+class _Request:
+    __slots__ = ("queries", "query_seconds", "template_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+def _empty():
+    return {
+        "latency": [0] * (len(LATENCY_BUCKETS) + 1),  # the last bucket is +Inf
+        "latency_sum": 0.0,
+        "size": [0] * (len(SIZE_BUCKETS) + 1),
+        "size_sum": 0,
+        "statuses": {},
+        "queries": 0,
+        "query_seconds": 0.0,
+        "template_seconds": 0.0,
+    }
+
+
+def _measure_query(execute, sql, params, many, context):
+    measured = _current.get()
+    if measured is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        measured.queries += 1
+        measured.query_seconds += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    # measure the queries of every connection, in whichever thread it is used
+    if _measure_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_measure_query)
+
+
+def record_template(seconds):
+    """Add the duration of a template rendering to the request being measured"""
+    measured = _current.get()
+    if measured is not None:
+        measured.template_seconds += seconds
+
+
+def record(view, status, seconds, size, queries=0, query_seconds=0.0, template=0.0):
+    """Add a response to the totals of its view
+
+    Parameters
+    ----------
+    :param view:
+        the name of the URL pattern, e.g. "blog_index"
+    :param status:
+        the status code of the response
+    :param seconds:
+        the time taken to produce the response
+    :param size:
+        the length of the body in bytes, or None if unknown
+    :param queries:
+        the number of database queries
+    :param query_seconds:
+        the time spent in the database queries
+    :param template:
+        the time spent rendering templates
+    """
+    with _lock:
+        totals = _views.get(view)
+        if totals is None:
+            totals = _views[view] = _empty()
+        totals["latency"][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        totals["latency_sum"] += seconds
+        if size is not None:
+            totals["size"][bisect.bisect_left(SIZE_BUCKETS, size)] += 1
+            totals["size_sum"] += size
+        statuses = totals["statuses"]
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        totals["queries"] += queries
+        totals["query_seconds"] += query_seconds
+        totals["template_seconds"] += template
+    if settings.METRICS_DIR and (
+        time.monotonic() - _flushed >= settings.METRICS_FLUSH_INTERVAL
+    ):
+        flush()
+
+
+def describe(name, description):
+    """Register the help text of a counter of increment()"""
+    _descriptions[name] = description
+
+
+def increment(name, amount=1, **labels):
+    """Add to a counter, e.g. ``increment("events_total", kind="rejected")``
+
+    Parameters
+    ----------
+    :param name:
+        the name of the counter in the exposition
+    :param amount:
+        the number added to the counter
+    :param labels:
+        the labels of the counted event, each value a string
+    """
+    series = ",".join(
+        f'{key}="{_label(value)}"' for key, value in sorted(labels.items())
+    )
+    with _lock:
+        counter = _counters.setdefault(name, {})
+        counter[series] = counter.get(series, 0) + amount
+
+
+def snapshot():
+    """Return a copy of the totals of this process"""
+    with _lock:
+        return copy.deepcopy(_views)
+
+
+def counters():
+    """Return a copy of the counters of this process"""
+    with _lock:
+        return copy.deepcopy(_counters)
+
+
+def reset():
+    """Discard the totals and counters of this process"""
+    with _lock:
+        _views.clear()
+        _counters.clear()
+
+
+def _path(pid):
+    return os.path.join(settings.METRICS_DIR, f"{pid}.json")
+
+
+def flush():
+    """Write the totals of this process to its file in METRICS_DIR
+
+    Concurrent calls return immediately instead of waiting for the running one.
+    """
+    global _flushed
+    if not settings.METRICS_DIR or not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _flushed = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = _path(os.getpid())
+        with open(f"{path}.tmp", "w") as file:
+            json.dump({"views": snapshot(), "counters": counters()}, file)
+        os.replace(f"{path}.tmp", path)  # readers never see a partial file
+    finally:
+        _flush_lock.release()
+
+
+def clear_files():
+    """Remove the files of previous processes, e.g. before the servers start"""
+    if settings.METRICS_DIR and os.path.isdir(settings.METRICS_DIR):
+        for name in os.listdir(settings.METRICS_DIR):
+            if name.endswith(".json"):
+                os.remove(os.path.join(settings.METRICS_DIR, name))
+
+
+def _merge(target, source):
+    for view, totals in source.items():
+        merged = target.setdefault(view, _empty())
+        for name, value in totals.items():
+            if name == "statuses":
+                for status, count in value.items():
+                    merged[name][status] = merged[name].get(status, 0) + count
+            elif isinstance(value, list):
+                merged[name] = [a + b for a, b in zip(merged[name], value)]
+            else:
+                merged[name] += value
+
+
+def _other_processes():
+    """Yield the numbers written to METRICS_DIR by the other processes"""
+    if not settings.METRICS_DIR or not os.path.isdir(settings.METRICS_DIR):
+        return
+    own = os.path.basename(_path(os.getpid()))
+    for name in os.listdir(settings.METRICS_DIR):
+        if name.endswith(".json") and name != own:  # its memory is more recent
+            try:
+                with open(os.path.join(settings.METRICS_DIR, name)) as file:
+                    yield json.load(file)
+            except (OSError, ValueError):  # removed in between
+                continue
+
+
+def collect():
+    """Return the totals of all processes, or of this one without METRICS_DIR"""
+    totals = snapshot()
+    for numbers in _other_processes():
+        _merge(totals, numbers["views"])
+    return totals
+
+
+def collect_counters():
+    """Return the counters of all processes, or of this one without METRICS_DIR"""
+    totals = counters()
+    for numbers in _other_processes():
+        for name, counter in numbers["counters"].items():
+            merged = totals.setdefault(name, {})
+            for series, count in counter.items():
+                merged[series] = merged.get(series, 0) + count
+    return totals
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram(lines, name, view, buckets, counts, total):
+    cumulative = 0
+    for bound, count in zip([*buckets, "+Inf"], counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_sum{{view="{view}"}} {total}')
+    lines.append(f'{name}_count{{view="{view}"}} {cumulative}')
+
+
+def exposition(totals, counts=None):
+    """Return the totals and counters in the Prometheus text exposition format"""
+    views = sorted(totals.items())
+    lines = [
+        "# HELP django_http_request_duration_seconds Latency of the responses",
+        "# TYPE django_http_request_duration_seconds histogram",
+    ]
+    for view, stats in views:
+        _histogram(
+            lines,
+            "django_http_request_duration_seconds",
+            _label(view),
+            LATENCY_BUCKETS,
+            stats["latency"],
+            stats["latency_sum"],
+        )
+    lines += [
+        "# HELP django_http_response_size_bytes Size of the response bodies",
+        "# TYPE django_http_response_size_bytes histogram",
+    ]
+    for view, stats in views:
+        _histogram(
+            lines,
+            "django_http_response_size_bytes",
+            _label(view),
+            SIZE_BUCKETS,
+            stats["size"],
+            stats["size_sum"],
+        )
+    lines += [
+        "# HELP django_http_responses_total Responses by status code",
+        "# TYPE django_http_responses_total counter",
+    ]
+    for view, stats in views:
+        for status, count in sorted(stats["statuses"].items()):
+            lines.append(
+                f'django_http_responses_total{{view="{_label(view)}",'
+                f'status="{status}"}} {count}'
+            )
+    for name, key, description in (
+        ("django_db_queries_total", "queries", "Database queries"),
+        (
+            "django_db_query_duration_seconds_total",
+            "query_seconds",
+            "Time spent in database queries",
+        ),
+        (
+            "django_template_render_duration_seconds_total",
+            "template_seconds",
+            "Time spent rendering templates",
+        ),
+    ):
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+        for view, stats in views:
+            lines.append(f'{name}{{view="{_label(view)}"}} {stats[key]}')
+    for name, counter in sorted((counts or {}).items()):
+        lines += [
+            f"# HELP {name} {_descriptions.get(name, name)}",
+            f"# TYPE {name} counter",
+        ]
+        for series, count in sorted(counter.items()):
+            lines.append(f"{name}{{{series}}} {count}" if series else f"{name} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def view(request):
+    """Serve the metrics to the addresses in METRICS_ALLOWED_IPS"""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        exposition(collect(), collect_counters()), content_type=CONTENT_TYPE
+    )
+
+
+class MetricsMiddleware:
+    """Record the latency, queries, template time and size of every response"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        measured = _Request()
+        token = _current.set(measured)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - start, measured)
+        return response
+
+    async def __acall__(self, request):
+        # the context, and with it the measured request, is copied into the
+        # threads of sync_to_async
+        measured = _Request()
+        token = _current.set(measured)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        # flushing writes a small file at most once per METRICS_FLUSH_INTERVAL
+        self.record(request, response, time.perf_counter() - start, measured)
+        return response
+
+    def record(self, request, response, seconds, measured):
+        match = request.resolver_match
+        if response.streaming:
+            length = response.get("Content-Length")
+            size = int(length) if length and length.isdigit() else None
+        else:
+            size = len(response.content)
+        record(
+            match.view_name if match else UNRESOLVED,
+            response.status_code,
+            seconds,
+            size,
+            measured.queries,
+            measured.query_seconds,
+            measured.template_seconds,
+        )
+
+
+@atexit.register
+def _flush_at_exit():
+    # keep the numbers of the last requests, but no files of e.g. manage.py runs
+    if _views or _counters:
+        flush()
@@ -0,0 +1,121 @@
+"""Serving of the collected static files
+
+Files with a hashed name never change, so they are cached by browsers for a year
+without revalidation. Their pre-compressed siblings are chosen according to the
+``Accept-Encoding`` header of the request.
+"""
+
+import mimetypes
+import os
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MAX_AGE = 60 * 60  # files without hash, e.g. referenced by a hard-coded URL
+# the compressed siblings written by collectstatic, in the order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+REFUSED_RE = re.compile(r"q=0(\.0*)?$")
+
+
+def accepted_encodings(header):
+    """Return the content codings accepted by the Accept-Encoding header
+
+    Parameters
+    ----------
+    :param header:
+        the value of the header, e.g. "gzip, deflate, br;q=0.5"
+    :return:
+        the set of the accepted codings in lower case
+    """
+    encodings = set()
+    for part in header.split(","):
+        coding, _, parameters = part.partition(";")
+        if coding.strip() and not REFUSED_RE.match(parameters.replace(" ", "")):
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+class StaticFilesMiddleware:
+    """Serve the files collected in STATIC_ROOT before any other processing"""
+
+    sync_capable = True
+    async_capable = True  # avoid a thread switch per request under ASGI
+
+    def __init__(self, get_response):
+        if not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = settings.STATIC_URL
+        # the names of the fingerprinted files in the manifest of collectstatic
+        self.hashed = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve_static(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        # the files are small and mostly served by the browser cache, so they are
+        # opened on the event loop
+        response = self.serve_static(request)
+        return response if response is not None else await self.get_response(request)
+
+    def serve_static(self, request):
+        """Return the response for a request of a static file, or None"""
+        path = request.path_info
+        if request.method in ("GET", "HEAD") and path.startswith(self.prefix):
+            return self.serve(request, path.removeprefix(self.prefix))
+        return None
+
+    def serve(self, request, name):
+        """Return the response for a collected file, or None if there is none"""
+        try:
+            filename = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(filename):
+            return None
+
+        immutable = name in self.hashed
+        stat = os.stat(filename)
+        if not immutable and not was_modified_since(
+            request.headers.get("if-modified-since"), stat.st_mtime
+        ):
+            return HttpResponseNotModified()
+
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = None
+        for coding, extension in ENCODINGS:
+            if coding in accepted and os.path.isfile(filename + extension):
+                encoding, filename = coding, filename + extension
+                break
+
+        response = FileResponse(
+            open(filename, "rb"),
+            content_type=content_type,
+            filename=os.path.basename(name),  # not the name of a compressed sibling
+        )
+        if encoding:
+            response["Content-Encoding"] = encoding
+        patch_vary_headers(response, ["Accept-Encoding"])
+        if immutable:
+            patch_cache_control(
+                response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+            )
+        else:
+            response["Last-Modified"] = http_date(stat.st_mtime)
+            patch_cache_control(response, public=True, max_age=MAX_AGE)
+        return response
@@ -0,0 +1,223 @@
+"""Cache of fully rendered detail pages and listings
+
+Responses are cached per model, primary key and ``last_modified`` of the object.
+A pointer per primary key remembers the current entry, so that signal handlers
+can evict the page of an object without knowing its ``last_modified``, e.g. when
+a category shown on the page of a post has been renamed. Listings like the feeds
+are cached per URL, latest ``last_modified`` and number of rows.
+"""
+
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from portfolio.conditional import (
+    aobject_last_modified,
+    aqueryset_last_modified,
+    object_last_modified,
+    queryset_last_modified,
+)
+
+KEY_PREFIX = "pagecache"
+
+
+def _pointer(model, pk):
+    return f"{KEY_PREFIX}:{model._meta.label_lower}:{pk}"
+
+
+def _key(model, pk, last_modified):
+    return f"{_pointer(model, pk)}:{last_modified.timestamp()}"
+
+
+def _count(model, event):
+    key = f"{KEY_PREFIX}:stats:{model._meta.label_lower}:{event}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted in between, start counting again
+        cache.set(key, 1, timeout=None)
+
+
+async def _acount(model, event):
+    key = f"{KEY_PREFIX}:stats:{model._meta.label_lower}:{event}"
+    await cache.aadd(key, 0, timeout=None)
+    try:
+        await cache.aincr(key)
+    except ValueError:  # evicted in between, start counting again
+        await cache.aset(key, 1, timeout=None)
+
+
+def stats(model):
+    """Return the hit and miss counters of the cached pages of a model
+
+    Parameters
+    ----------
+    :param model:
+        the model whose detail pages are cached
+    :return:
+        a dictionary with the number of "hits" and "misses"
+    """
+    prefix = f"{KEY_PREFIX}:stats:{model._meta.label_lower}"
+    counters = cache.get_many([f"{prefix}:hits", f"{prefix}:misses"])
+    return {
+        "hits": counters.get(f"{prefix}:hits", 0),
+        "misses": counters.get(f"{prefix}:misses", 0),
+    }
+
+
+def invalidate(model, pks):
+    """Evict the cached detail pages of some objects
+
+    Parameters
+    ----------
+    :param model:
+        the model of the objects
+    :param pks:
+        the primary keys of the objects whose pages have to be evicted
+    """
+    pointers = [_pointer(model, pk) for pk in pks]
+    keys = cache.get_many(pointers).values()
+    cache.delete_many([*pointers, *keys])
+
+
+def cache_detail_page(model):
+    """Decorator caching the responses of a sync or async detail view taking ``pk``
+
+    Only a cheap query for ``last_modified`` hits the database when the page is
+    cached. Cache hits and misses are counted and marked in the ``X-Cache`` header.
+
+    Parameters
+    ----------
+    :param model:
+        the model displayed by the view, with a ``last_modified`` field
+    :return:
+        the decorator
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, pk, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, pk, *args, **kwargs)
+
+            last_modified = object_last_modified(request, model, pk)
+            if last_modified is None:
+                raise Http404(f"No {model._meta.verbose_name} matches the given query.")
+
+            key = _key(model, pk, last_modified)
+            response = cache.get(key)
+            if response is not None:
+                _count(model, "hits")
+                response["X-Cache"] = "HIT"
+                return response
+
+            _count(model, "misses")
+            response = view(request, pk, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set_many(
+                    {key: response, _pointer(model, pk): key},
+                    timeout=settings.PAGE_CACHE_TIMEOUT,
+                )
+            response["X-Cache"] = "MISS"
+            return response
+
+        @wraps(view)
+        async def async_wrapper(request, pk, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await view(request, pk, *args, **kwargs)
+
+            last_modified = await aobject_last_modified(request, model, pk)
+            if last_modified is None:
+                raise Http404(f"No {model._meta.verbose_name} matches the given query.")
+
+            key = _key(model, pk, last_modified)
+            response = await cache.aget(key)
+            if response is not None:
+                await _acount(model, "hits")
+                response["X-Cache"] = "HIT"
+                return response
+
+            await _acount(model, "misses")
+            response = await view(request, pk, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset_many(
+                    {key: response, _pointer(model, pk): key},
+                    timeout=settings.PAGE_CACHE_TIMEOUT,
+                )
+            response["X-Cache"] = "MISS"
+            return response
+
+        return async_wrapper if iscoroutinefunction(view) else wrapper
+
+    return decorator
+
+
+def _listing_key(request, validators):
+    latest = validators["latest"].timestamp() if validators["latest"] else 0
+    return (
+        # feeds contain absolute URLs, so the host and scheme are part of the key
+        f"{KEY_PREFIX}:listing:{request.build_absolute_uri()}:"
+        f"{validators['count']}:{latest}"
+    )
+
+
+def cache_listing_page(get_queryset):
+    """Decorator caching the responses of a sync or async view listing a queryset
+
+    The responses are cached per URL and the validators of the queryset, i.e. the
+    latest ``last_modified`` and the number of rows, so that they are rendered
+    again once a row has changed, without explicit eviction.
+
+    Parameters
+    ----------
+    :param get_queryset:
+        a callable taking the arguments of the view and returning the queryset of
+        all rows the page may display, with a ``last_modified`` field
+    :return:
+        the decorator
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            validators = queryset_last_modified(request, get_queryset, *args, **kwargs)
+            key = _listing_key(request, validators)
+            response = cache.get(key)
+            if response is not None:
+                response["X-Cache"] = "HIT"
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response, timeout=settings.PAGE_CACHE_TIMEOUT)
+            response["X-Cache"] = "MISS"
+            return response
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await view(request, *args, **kwargs)
+
+            validators = await aqueryset_last_modified(
+                request, get_queryset, *args, **kwargs
+            )
+            key = _listing_key(request, validators)
+            response = await cache.aget(key)
+            if response is not None:
+                response["X-Cache"] = "HIT"
+                return response
+
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response, timeout=settings.PAGE_CACHE_TIMEOUT)
+            response["X-Cache"] = "MISS"
+            return response
+
+        return async_wrapper if iscoroutinefunction(view) else wrapper
+
+    return decorator
@@ -0,0 +1,240 @@
+"""Keyset pagination for the listing pages
+
+Instead of an OFFSET, every page remembers the sort key of its first and last row
+in an opaque, signed cursor. The next page then starts with an indexed range
+condition on that key, so deep pages cost as much as the first one.
+
+Listings are ordered by ``(-created_on, pk)``. Search results are ordered by
+relevance instead, which is why they are paginated on ``(-score, -pk)``.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.http import Http404
+
+SALT = "portfolio.pagination"
+
+
+class Page:
+    """One page of a listing together with the cursors of its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def _dump(direction, key):
+    return signing.dumps([direction, key], salt=SALT)
+
+
+def _load(cursor):
+    """Return the direction and the key of a cursor, or (None, None) for no cursor"""
+    if not cursor:
+        return None, None
+    try:
+        direction, key = signing.loads(cursor, salt=SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise Http404("Invalid page cursor")
+    return direction, key
+
+
+def _keyset(queryset, cursor, per_page):
+    """Return the query of a page with one extra row, and the direction of the cursor"""
+    direction, key = _load(cursor)
+    if key is None:
+        return queryset.order_by("-created_on", "pk")[: per_page + 1], None
+
+    created_on, pk = datetime.fromisoformat(key[0]), key[1]
+    if direction == "next":
+        return (
+            queryset.filter(
+                Q(created_on__lt=created_on) | Q(created_on=created_on, pk__gt=pk)
+            ).order_by("-created_on", "pk")[: per_page + 1],
+            direction,
+        )
+    # walk backwards in reversed order, the page order is restored by _keyset_page
+    return (
+        queryset.filter(
+            Q(created_on__gt=created_on) | Q(created_on=created_on, pk__lt=pk)
+        ).order_by("created_on", "-pk")[: per_page + 1],
+        direction,
+    )
+
+
+def _keyset_page(rows, direction, per_page):
+    """Return the Page of the rows fetched by the query of _keyset"""
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction is None:
+        has_next, has_previous = more, False
+    elif direction == "next":
+        has_next, has_previous = more, True
+    else:
+        has_next, has_previous = True, more
+        rows = rows[::-1]
+
+    def row_key(row):
+        return [row.created_on.isoformat(), row.pk]
+
+    return Page(
+        rows,
+        next_cursor=_dump("next", row_key(rows[-1])) if rows and has_next else None,
+        previous_cursor=(
+            _dump("previous", row_key(rows[0])) if rows and has_previous else None
+        ),
+    )
+
+
+def paginate(queryset, cursor=None, per_page=None):
+    """Return a page of a queryset ordered by ``(-created_on, pk)``
+
+    Parameters
+    ----------
+    :param queryset:
+        the queryset to be paginated, with a ``created_on`` field
+    :param cursor:
+        the cursor of the requested page as found in the query string, if any
+    :param per_page:
+        the number of objects per page, defaults to ``settings.PAGE_SIZE``
+    :return:
+        the requested Page
+    """
+    per_page = per_page or settings.PAGE_SIZE
+    query, direction = _keyset(queryset, cursor, per_page)
+    return _keyset_page(list(query), direction, per_page)
+
+
+async def apaginate(queryset, cursor=None, per_page=None):
+    """Async version of paginate(), using the async ORM API"""
+    per_page = per_page or settings.PAGE_SIZE
+    query, direction = _keyset(queryset, cursor, per_page)
+    return _keyset_page([row async for row in query], direction, per_page)
+
+
+def _ranked_range(hits, cursor, per_page):
+    """Return the start and end index of the hits of a page of search results"""
+    direction, key = _load(cursor)
+    keys = [(-score, -pk) for pk, score in hits]  # ascending like the hits
+    if key is None:
+        start = 0
+    elif direction == "next":
+        start = bisect_right(keys, (-key[1], -key[0]))
+    else:
+        start = max(bisect_left(keys, (-key[1], -key[0])) - per_page, 0)
+    return start, start + per_page
+
+
+def _ranked_page(hits, start, end, objects):
+    """Return the Page of the hits from start to end, given the objects by pk"""
+    page_hits = hits[start:end]
+    rows = [objects[pk] for pk, _ in page_hits if pk in objects]
+    has_next = end < len(hits)
+    return Page(
+        rows,
+        next_cursor=_dump("next", list(page_hits[-1])) if has_next else None,
+        previous_cursor=_dump("previous", list(page_hits[0])) if start else None,
+    )
+
+
+def _allowed(queryset, hits):
+    """Return the query of the primary keys of the hits included in the queryset"""
+    return (
+        queryset.filter(pk__in=[pk for pk, _ in hits])
+        .prefetch_related(None)
+        .values_list("pk", flat=True)
+    )
+
+
+def paginate_ranked(queryset, hits, cursor=None, per_page=None):
+    """Return a page of search results ordered by ``(-score, -pk)``
+
+    Parameters
+    ----------
+    :param queryset:
+        the queryset the results are taken from
+    :param hits:
+        the (primary key, score) tuples of the results, best match first
+    :param cursor:
+        the cursor of the requested page as found in the query string, if any
+    :param per_page:
+        the number of objects per page, defaults to ``settings.PAGE_SIZE``
+    :return:
+        the requested Page
+    """
+    per_page = per_page or settings.PAGE_SIZE
+    if queryset.query.has_filters():  # drop the hits excluded by the queryset
+        allowed = set(_allowed(queryset, hits))
+        hits = [hit for hit in hits if hit[0] in allowed]
+
+    start, end = _ranked_range(hits, cursor, per_page)
+    objects = queryset.in_bulk([pk for pk, _ in hits[start:end]])
+    return _ranked_page(hits, start, end, objects)
+
+
+async def apaginate_ranked(queryset, hits, cursor=None, per_page=None):
+    """Async version of paginate_ranked(), using the async ORM API"""
+    per_page = per_page or settings.PAGE_SIZE
+    if queryset.query.has_filters():  # drop the hits excluded by the queryset
+        allowed = {pk async for pk in _allowed(queryset, hits)}
+        hits = [hit for hit in hits if hit[0] in allowed]
+
+    start, end = _ranked_range(hits, cursor, per_page)
+    objects = await queryset.ain_bulk([pk for pk, _ in hits[start:end]])
+    return _ranked_page(hits, start, end, objects)
+
+
+def paginate_hits(hits, cursor=None, per_page=None):
+    """Return a page of the merged search results of several models
+
+    The hits are paginated on ``(-score, label, -pk)`` like the ranked results of
+    a single model, without loading any object.
+
+    Parameters
+    ----------
+    :param hits:
+        the (model label, primary key, score) tuples of the results, ordered by
+        descending score, model label and descending primary key
+    :param cursor:
+        the cursor of the requested page as found in the query string, if any
+    :param per_page:
+        the number of hits per page, defaults to ``settings.PAGE_SIZE``
+    :return:
+        the requested Page, listing the hits of the page
+    """
+    per_page = per_page or settings.PAGE_SIZE
+    direction, key = _load(cursor)
+    keys = [(-score, label, -pk) for label, pk, score in hits]  # ascending
+    if key is None:
+        start = 0
+    else:
+        label, pk, score = key
+        if direction == "next":
+            start = bisect_right(keys, (-score, label, -pk))
+        else:
+            start = max(bisect_left(keys, (-score, label, -pk)) - per_page, 0)
+    end = start + per_page
+    page_hits = hits[start:end]
+    return Page(
+        page_hits,
+        next_cursor=_dump("next", list(page_hits[-1])) if end < len(hits) else None,
+        previous_cursor=(
+            _dump("previous", list(page_hits[0])) if start and page_hits else None
+        ),
+    )
@@ -0,0 +1,350 @@
+"""On-demand profiling of single requests
+
+With ``settings.PROFILING_ENABLED``, a request with ``?profile=1`` from a staff
+member, or with a token of ``manage.py profile_url --token`` for its path in
+``?profile_token=``, runs under two profilers:
+
+- ``cProfile``, deterministic, in the thread which handles the request
+- a sampler recording the call stacks of the threads working on the request
+  every ``PROFILING_SAMPLE_INTERVAL``, for the flame graph
+
+The results are stored in a directory per request in ``PROFILING_DIR``:
+``profile.pstats``, ``stacks.folded`` (one stack per line, e.g. for speedscope),
+``flamegraph.svg`` and ``queries.sql``, the SQL trace. The name of the directory
+is returned in the ``X-Profile`` header, ``?profile=flamegraph`` returns the
+flame graph instead of the page. Other requests are not affected, and with
+profiling disabled the middleware is removed from the stack entirely.
+
+Requests handled in the event loop are only profiled with
+``settings.PROFILING_ASYNC``: the profilers then measure the whole loop, including
+the other requests it serves meanwhile, which the flame graph title and the
+``X-Profile-Scope: event-loop`` header point out.
+"""
+
+import colorsys
+import contextlib
+import contextvars
+import cProfile
+import hashlib
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from html import escape
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.text import slugify
+
+SALT = "portfolio.profiling"
+FLAMEGRAPH_WIDTH = 1200
+FRAME_HEIGHT = 16
+
+_lock = threading.Lock()  # one profiled request at a time per process
+# the profile of the request being handled
+_current = contextvars.ContextVar("profiling_request", default=None)
+
+
+class _Sampler(threading.Thread):
+    """Count the call stacks of some threads at a regular interval"""
+
+    def __init__(self, interval):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.interval = interval
+        self.threads = {threading.get_ident()}
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                if ident in frames:
+                    self.stacks[_stack(frames[ident])] += 1
+
+
+def _stack(frame):
+    """Return the folded call stack of a frame, the outermost function first"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profile:
+    """The profilers and SQL trace of one request"""
+
+    def __init__(self, loop_wide=False):
+        self.profiler = cProfile.Profile()
+        self.sampler = _Sampler(settings.PROFILING_SAMPLE_INTERVAL)
+        self.queries = []  # (seconds, sql, params)
+        self.seconds = None
+        # whether everything running in the event loop is measured
+        self.loop_wide = loop_wide
+
+    def register_thread(self):
+        self.sampler.threads.add(threading.get_ident())
+
+    def save(self, path, directory=None):
+        """Write the results into a new directory in PROFILING_DIR
+
+        Parameters
+        ----------
+        :param path:
+            the path of the profiled request, part of the directory name
+        :param directory:
+            the parent directory, by default settings.PROFILING_DIR
+        :return:
+            the path of the new directory
+        """
+        name = (
+            f"{timezone.now():%Y%m%d-%H%M%S}-{slugify(path) or 'root'}-"
+            f"{uuid.uuid4().hex[:6]}"
+        )
+        target = os.path.join(directory or settings.PROFILING_DIR, name)
+        os.makedirs(target)
+        self.profiler.dump_stats(os.path.join(target, "profile.pstats"))
+        with open(os.path.join(target, "stacks.folded"), "w") as file:
+            for stack, count in sorted(self.sampler.stacks.items()):
+                file.write(f"{stack} {count}\n")
+        scope = ", whole event loop" if self.loop_wide else ""
+        with open(os.path.join(target, "flamegraph.svg"), "w") as file:
+            file.write(
+                flamegraph(self.sampler.stacks, f"{path} ({self.seconds:.3f} s{scope})")
+            )
+        with open(os.path.join(target, "queries.sql"), "w") as file:
+            file.write(self.sql_trace())
+        return target
+
+    def sql_trace(self):
+        """Return the queries with their duration as SQL comments"""
+        total = sum(seconds for seconds, _, _ in self.queries)
+        lines = [f"-- {len(self.queries)} queries in {total * 1000:.2f} ms"]
+        for seconds, sql, params in self.queries:
+            lines.append(f"\n-- {seconds * 1000:.2f} ms, parameters {params!r}")
+            lines.append(f"{sql};")
+        return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def profile(blocking=True, loop_wide=False):
+    """Profile the code of the block, yielding the Profile
+
+    Only one block is profiled at a time per process, as the interpreter supports
+    a single profiler per thread. Without blocking, e.g. in the event loop, the
+    block runs unprofiled with None if another one is being profiled. A block
+    running in the event loop is profiled ``loop_wide``, together with the other
+    coroutines of the loop.
+    """
+    if not _lock.acquire(blocking=blocking):
+        yield None
+        return
+    try:
+        result = Profile(loop_wide)
+        token = _current.set(result)
+        result.sampler.start()
+        start = time.perf_counter()
+        result.profiler.enable()
+        try:
+            yield result
+        finally:
+            result.profiler.disable()
+            result.seconds = time.perf_counter() - start
+            result.sampler.stopped.set()
+            result.sampler.join()
+            _current.reset(token)
+    finally:
+        _lock.release()
+
+
+def register_thread():
+    """Sample the current thread too, if it works on a profiled request"""
+    result = _current.get()
+    if result is not None:
+        result.register_thread()
+
+
+def _trace_query(execute, sql, params, many, context):
+    result = _current.get()
+    if result is None:
+        return execute(sql, params, many, context)
+    result.register_thread()  # e.g. a thread of sync_to_async
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        result.queries.append((time.perf_counter() - start, sql, params))
+
+
+def trace_queries(connection):
+    """Record the queries of profiled requests on a database connection"""
+    if _trace_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_trace_query)
+
+
+@receiver(connection_created)
+def install_query_tracer(sender, connection, **kwargs):
+    # every connection of the process may run the queries of a profiled request
+    if settings.PROFILING_ENABLED:
+        trace_queries(connection)
+
+
+def make_token(path):
+    """Return a token allowing to profile a path for PROFILING_TOKEN_MAX_AGE"""
+    return signing.TimestampSigner(salt=SALT).sign(path)
+
+
+def valid_token(token, path):
+    """Return whether a token of make_token() is valid for a path"""
+    try:
+        signed = signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:  # including expired tokens
+        return False
+    return signed == path
+
+
+def _color(name):
+    # a stable warm color per function, like the original flame graphs
+    hue = (
+        int(hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()[:4], 16)
+        / 0xFFFF
+    )
+    red, green, blue = colorsys.hls_to_rgb(0.02 + hue * 0.1, 0.6, 0.85)
+    return f"rgb({red * 255:.0f},{green * 255:.0f},{blue * 255:.0f})"
+
+
+def flamegraph(stacks, title=""):
+    """Render folded call stacks as an SVG flame graph
+
+    Parameters
+    ----------
+    :param stacks:
+        a mapping of folded stacks ("outer;inner") to their number of samples
+    :param title:
+        the heading of the graph
+    :return:
+        the SVG document, with the function names and samples as tooltips
+    """
+    root = {"children": {}, "value": 0}
+    for stack, count in stacks.items():
+        node = root
+        node["value"] += count
+        for name in stack.split(";"):
+            node = node["children"].setdefault(name, {"children": {}, "value": 0})
+            node["value"] += count
+
+    rects = []
+    depth = 0
+
+    def layout(node, x, level):
+        nonlocal depth
+        depth = max(depth, level)
+        for name, child in node["children"].items():
+            width = child["value"] / root["value"] * FLAMEGRAPH_WIDTH
+            if width >= 0.1:  # invisible otherwise
+                rects.append((name, child["value"], x, level, width))
+                layout(child, x, level + 1)
+            x += width
+
+    if root["value"]:
+        layout(root, 0.0, 0)
+    height = (depth + 3) * FRAME_HEIGHT
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{FLAMEGRAPH_WIDTH}" '
+        f'height="{height}" font-family="monospace" font-size="11">',
+        f'<text x="4" y="{FRAME_HEIGHT - 4}">{escape(title)}, '
+        f'{root["value"]} samples</text>',
+    ]
+    for name, value, x, level, width in rects:
+        y = height - (level + 1) * FRAME_HEIGHT  # the outermost frame at the bottom
+        label = escape(name)
+        parts.append(
+            f"<g><title>{label} ({value} samples, "
+            f'{value / root["value"]:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{width:.1f}" '
+            f'height="{FRAME_HEIGHT - 1}" fill="{_color(name)}"/>'
+        )
+        characters = int(width / 7)  # about 7 pixels per character
+        if characters >= 3:
+            text = name if len(name) <= characters else name[: characters - 2] + ".."
+            parts.append(
+                f'<text x="{x + 2:.1f}" y="{y + FRAME_HEIGHT - 4}">{escape(text)}</text>'
+            )
+        parts.append("</g>")
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+class ProfilingMiddleware:
+    """Profile the requests asking for it, see the docstring of the module"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = request.GET.get("profile")
+        if not mode or _lock.locked() or not self.allowed(request, request.user):
+            return self.get_response(request)
+        # the lock may have been taken in between, serve the request as usual then
+        with profile(blocking=False) as result:
+            response = self.get_response(request)
+        if result is None:
+            return response
+        return self.respond(request, response, result, mode)
+
+    async def __acall__(self, request):
+        mode = request.GET.get("profile")
+        # a request arriving while another one is profiled is served as usual, and
+        # so is every request unless the loop-wide profiles are asked for
+        if (
+            not mode
+            or not settings.PROFILING_ASYNC
+            or _lock.locked()
+            or not self.allowed(request, await request.auser())
+        ):
+            return await self.get_response(request)
+        # never wait for the lock in the event loop, the profiled request holding it
+        # needs the loop to finish; other coroutines may be profiled as well
+        with profile(blocking=False, loop_wide=True) as result:
+            response = await self.get_response(request)
+        if result is None:
+            return response
+        return self.respond(request, response, result, mode)
+
+    def allowed(self, request, user):
+        token = request.GET.get("profile_token")
+        if token:
+            return valid_token(token, request.path)
+        return user.is_active and user.is_staff
+
+    def respond(self, request, response, result, mode):
+        directory = result.save(request.path)
+        if mode == "flamegraph":
+            response.close()  # the page is replaced, release its resources
+            with open(os.path.join(directory, "flamegraph.svg")) as file:
+                response = HttpResponse(file.read(), content_type="image/svg+xml")
+        response["X-Profile"] = os.path.basename(directory)
+        if result.loop_wide:
+            response["X-Profile-Scope"] = "event-loop"
+        return response
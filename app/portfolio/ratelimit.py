@@ -0,0 +1,162 @@
+"""Token-bucket rate limits of the views doing expensive work, e.g. sending mail
+
+A bucket holds up to ``capacity`` tokens and regains one every ``interval``
+seconds. Every request takes a token and is rejected while the bucket is empty,
+so bursts up to the capacity pass while sustained traffic is limited to one
+request per interval. ``rate_limit("contact")`` limits a view by the buckets of
+``settings.RATE_LIMITS["contact"]``:
+
+- "ip", one bucket per client address
+- "global", one bucket shared by all clients, so that many addresses together
+  cannot saturate the workers and the mail relay either
+
+A rejected request gets a short 429 response with a Retry-After header before
+the view runs, i.e. before the form is validated. It takes no token of the
+global bucket, so that a single client cannot lock out everybody else.
+
+A bucket is stored as a single number in the ``RATE_LIMIT_CACHE``, the time at
+which it is full again, and expires then. Both buckets of a request are read and
+written with one round trip each. The cache has to be shared by the server
+processes for the limits to apply to all of them together, e.g. the database cache
+of the settings, Memcached or Redis. If it is not configured or fails, e.g. before
+its table has been created, a cache in the memory of the process takes over,
+limiting every process on its own. Two processes updating a bucket
+at the same time may both take its last token, so the limits may be exceeded by
+the number of concurrent requests, which is good enough for load shedding.
+
+The decisions are counted in ``portfolio.metrics`` and served by ``/metrics``.
+"""
+
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "ratelimit"
+REQUESTS = "django_ratelimit_requests_total"
+FALLBACKS = "django_ratelimit_cache_fallbacks_total"
+metrics.describe(REQUESTS, "Requests checked by the rate limits, by result")
+metrics.describe(FALLBACKS, "Checks of the rate limits in the process-local cache")
+
+# the buckets when the shared cache is not available
+_local = LocMemCache(PREFIX, {"OPTIONS": {"MAX_ENTRIES": 10000}})
+
+
+def _take(buckets, now, limits, states):
+    """Return the new states of the buckets, or the seconds until a token is back
+
+    Parameters
+    ----------
+    :param buckets:
+        the cache keys of the buckets, by the name of their limit
+    :param now:
+        the current time, in seconds since the epoch
+    :param limits:
+        the (capacity, interval) of the buckets, by the name of their limit
+    :param states:
+        the times at which the buckets are full again, by cache key, missing for
+        full buckets
+    :return:
+        (None, the states with a token taken from every bucket) if the request is
+        allowed, otherwise (the name of the rejecting limit, the seconds until it
+        has a token again)
+    """
+    taken = {}
+    for name, key in buckets.items():
+        capacity, interval = limits[name]
+        full_at = max(states.get(key, now), now) + interval
+        wait = full_at - now - capacity * interval  # the missing time of a token
+        if wait > 0:
+            return name, wait
+        taken[key] = full_at
+    return None, taken
+
+
+def _store(cache, states, now):
+    # the buckets expire once they are full, as if they were missing from the cache
+    cache.set_many(states, math.ceil(max(states.values()) - now))
+
+
+def check(scope, address):
+    """Take a token from the buckets of a client for a scope
+
+    Parameters
+    ----------
+    :param scope:
+        the key of the limits in ``settings.RATE_LIMITS``, e.g. "contact"
+    :param address:
+        the IP address of the client
+    :return:
+        0 if the request is allowed, otherwise the seconds until it would be
+    """
+    limits = settings.RATE_LIMITS[scope]
+    buckets = {"ip": f"{PREFIX}:{scope}:ip:{address}", "global": f"{PREFIX}:{scope}"}
+    buckets = {name: key for name, key in buckets.items() if name in limits}
+    now = time.time()  # shared by the processes, unlike time.monotonic()
+    try:
+        cache = caches[settings.RATE_LIMIT_CACHE]
+        states = cache.get_many(list(buckets.values()))
+    except Exception as error:  # e.g. the cache server is down, any client error
+        if not isinstance(error, InvalidCacheBackendError):  # not just unconfigured
+            logger.warning("Rate limit cache unavailable, using the local one")
+        metrics.increment(FALLBACKS, scope=scope)
+        cache, states = _local, _local.get_many(list(buckets.values()))
+
+    limit, result = _take(buckets, now, limits, states)
+    if limit is not None:
+        metrics.increment(REQUESTS, scope=scope, result=f"limited_{limit}")
+        return result
+    try:
+        _store(cache, result, now)
+    except Exception:  # failed in between, the request is not rejected for it
+        logger.warning("Rate limit cache unavailable, using the local one")
+        _store(_local, result, now)
+        metrics.increment(FALLBACKS, scope=scope)
+    metrics.increment(REQUESTS, scope=scope, result="allowed")
+    return 0
+
+
+def _limited(retry_after):
+    response = HttpResponse(
+        "Too many requests, please try again later.\n",
+        status=429,
+        content_type="text/plain; charset=utf-8",
+    )
+    response["Retry-After"] = str(math.ceil(retry_after))
+    return response
+
+
+def rate_limit(scope, methods=("POST",)):
+    """Reject the requests exceeding the limits of a scope with a 429 response
+
+    Parameters
+    ----------
+    :param scope:
+        the key of the limits in ``settings.RATE_LIMITS``
+    :param methods:
+        the HTTP methods which are limited, by default the form submissions
+    :return:
+        the decorator of a view
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def limited_view(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = check(scope, request.META.get("REMOTE_ADDR", ""))
+                if retry_after:
+                    return _limited(retry_after)
+            return view(request, *args, **kwargs)
+
+        return limited_view
+
+    return decorator
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -32,6 +33,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    "portfolio.apps.PortfolioConfig",
     "about.apps.AboutConfig",
     "projects.apps.ProjectsConfig",
     "blog.apps.BlogConfig",
@@ -43,14 +45,23 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    # apps with models are listed last, so that their content types do not clash
+    # with the primary keys of the content types in fixtures/data.json
+    "search.apps.SearchConfig",
+    "mailqueue.apps.MailqueueConfig",
+    "startup.apps.StartupConfig",
+    "related.apps.RelatedConfig",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "portfolio.middleware.StaticFilesMiddleware",
+    "portfolio.metrics.MetricsMiddleware",  # measures the views, not static files
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "portfolio.profiling.ProfilingMiddleware",  # needs the user, see the settings
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -59,7 +70,8 @@ ROOT_URLCONF = "portfolio.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # the Django backend, which times the rendering if TEMPLATE_TIMING is set
+        "BACKEND": "portfolio.templatetiming.TimedDjangoTemplates",
         "DIRS": [
             BASE_DIR / "templates/",
         ],
@@ -70,25 +82,42 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "portfolio.context_processors.fragment_cache",
+                "portfolio.context_processors.static_export",
             ],
         },
     },
 ]
 
+# Collect the render duration of every template, see portfolio/templatetiming.py
+TEMPLATE_TIMING = False
+
+# Whether the pages are rendered as plain files by portfolio.export, which leaves
+# out the links to the pages needing a server, e.g. the search
+STATIC_EXPORT = False
+
 WSGI_APPLICATION = "portfolio.wsgi.application"
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# the pooled backend reuses connections across requests and threads, instead of
+# connecting for every request, see portfolio/db/pool.py
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        "ENGINE": "portfolio.db.backends.mysql",
         "NAME": "djangodb",
         "USER": "root",
         "PASSWORD": "mypass",
         "HOST": "django_db",
         "PORT": "3306",
+        "OPTIONS": {
+            "pool": {
+                "size": 10,  # idle connections kept open per process
+                "max_idle": 300,  # seconds until an idle connection is closed
+            },
+        },
     }
 }
 
@@ -132,18 +161,110 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# collectstatic writes fingerprinted and compressed copies of the static files,
+# which are served from STATIC_ROOT by portfolio.middleware.StaticFilesMiddleware
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "portfolio.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+SERVE_MEDIA = DEBUG  # serve the uploaded files from Django
+
+# Widths of the resized copies generated for the images of posts and projects,
+# covering the 248px thumbnails and 400px detail images on high density screens
+IMAGE_DERIVATIVE_WIDTHS = [248, 400, 496, 800]
+IMAGE_DERIVATIVES_ASYNC = True  # generate the copies in a background thread
+
+# Renderer of the bodies of posts and projects, "plain" or "markdown" (requires the
+# Markdown and nh3 packages), run `manage.py render_bodies` after changing it
+BODY_MARKUP = "plain"
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# use a shared backend (e.g. Memcached or Redis) when running several workers
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # shared by the server processes through the database, see RATE_LIMIT_CACHE;
+    # the table is created by `manage.py startup`
+    "ratelimit": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "ratelimit_cache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},  # buckets of as many client addresses
+    },
+}
+
+# Seconds the rendered post and project pages are cached, evicted on changes
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds the rendered sidebar fragments are cached, evicted on changes of categories
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds between the checks of the search suggestions for changes by other
+# processes, and seconds browsers may cache the suggestions for a query
+AUTOCOMPLETE_CHECK_INTERVAL = 5
+AUTOCOMPLETE_CACHE_TIMEOUT = 60
+
+# Seconds the merged results of a site-wide search are cached per normalized query
+SEARCH_CACHE_TIMEOUT = 60
+
+# Token buckets of portfolio.ratelimit as (capacity, seconds to regain a token), per
+# client address ("ip") and for all clients together ("global")
+RATE_LIMITS = {
+    "contact": {"ip": (5, 60 * 10), "global": (60, 10)},
+}
+# The cache alias storing the buckets, shared by the server processes to limit them
+# together; a cache in the memory of each process is used if it is unavailable
+RATE_LIMIT_CACHE = "ratelimit"
+
+# Per-view metrics of portfolio.metrics, served under /metrics to these addresses
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+# Directory the server processes write their metrics to, so that /metrics sums
+# them up; None serves the metrics of the process answering the request
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 1.0  # seconds between the writes of a process
+
+# Profiling of requests with ?profile=1 by staff members or with a token of
+# `manage.py profile_url --token`, see portfolio.profiling
+PROFILING_ENABLED = DEBUG
+PROFILING_DIR = os.path.join(tempfile.gettempdir(), "portfolio-profiles")
+PROFILING_SAMPLE_INTERVAL = 0.001  # seconds between the samples of the call stacks
+PROFILING_TOKEN_MAX_AGE = 60 * 60  # seconds a token is valid
+# Profile requests handled in the event loop too, which measures the whole loop
+PROFILING_ASYNC = False
+
+# Number of posts or projects per listing page
+PAGE_SIZE = 10
+
+# Number of related posts listed on the page of a post, see related.similarity
+RELATED_POSTS_COUNT = 5
+
 # Contact form Email configuration
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DEFAULT_FROM_EMAIL = "contact@portfolio.com"
 NOTIFY_EMAIL = "contact@portfolio.com"
 
+# Contact form mail queue, delivered by `manage.py send_queued_mail --loop`
+MAIL_QUEUE_BATCH_SIZE = 50  # messages sent over one connection
+MAIL_QUEUE_POLL_INTERVAL = 5  # seconds between checks of an empty queue
+MAIL_QUEUE_MAX_ATTEMPTS = 5
+MAIL_QUEUE_RETRY_DELAY = 60  # seconds before the first retry, doubled after each
+MAIL_QUEUE_MAX_RETRY_DELAY = 60 * 60
+
 # Crispy forms template configuration
 CRISPY_TEMPLATE_PACK = "bootstrap4"
@@ -0,0 +1,48 @@
+"""
+Django settings for running the portfolio in production, e.g. in the staging
+containers. Select them with DJANGO_SETTINGS_MODULE=portfolio.settings_production.
+"""
+
+import os
+import tempfile
+
+from portfolio.settings import *  # noqa: F401, F403
+from portfolio.settings import SECRET_KEY, TEMPLATES
+
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY", SECRET_KEY)
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.environ.get("DJANGO_ALLOWED_HOSTS", "localhost").split(",")
+
+# the uvicorn workers sum up their metrics in files, scraped by e.g. Prometheus
+METRICS_DIR = os.path.join(tempfile.gettempdir(), "portfolio-metrics")
+METRICS_ALLOWED_IPS = os.environ.get(
+    "DJANGO_METRICS_ALLOWED_IPS", "127.0.0.1,::1"
+).split(",")
+
+# profiling of single requests by staff members or with a token, off by default
+PROFILING_ENABLED = os.environ.get("DJANGO_PROFILING_ENABLED") == "1"
+
+# the uploaded images are served by Django, there is no separate web server
+SERVE_MEDIA = True
+
+# parse every template once per process instead of checking it on each request
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        "APP_DIRS": False,  # replaced by the app_directories loader below
+        "OPTIONS": {
+            **TEMPLATES[0]["OPTIONS"],
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
+        },
+    },
+]
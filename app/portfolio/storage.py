@@ -0,0 +1,71 @@
+"""Fingerprinted and pre-compressed static files
+
+``collectstatic`` stores every static file under a name containing the hash of its
+content, so that it can be cached forever, and writes gzip and brotli compressed
+siblings of text files, which ``StaticFilesMiddleware`` serves without compressing
+them on every request.
+"""
+
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE = {".css", ".js", ".svg", ".html", ".txt", ".json", ".xml", ".ttf", ".otf"}
+
+
+def compress(filename):
+    """Write the gzip and brotli compressed siblings of a file
+
+    Siblings which are not smaller than the original are not written.
+
+    Parameters
+    ----------
+    :param filename:
+        the path of the file
+    :return:
+        the number of files written
+    """
+    with open(filename, "rb") as file:
+        content = file.read()
+    compressed = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed[".br"] = brotli.compress(content, quality=11)
+
+    written = 0
+    for extension, data in compressed.items():
+        if len(data) < len(content):
+            with open(filename + extension, "wb") as file:
+                file.write(data)
+            written += 1
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Storage of the collected static files with hashed and compressed copies"""
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:  # not collected yet, e.g. in development and tests
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                names.update((name, hashed_name))
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                compress(self.path(name))
@@ -0,0 +1,66 @@
+from django import template
+from django.utils.html import format_html
+from portfolio import images
+
+register = template.Library()
+
+
+def _srcset(candidates):
+    return ", ".join(f"{url} {width}w" for url, width in candidates)
+
+
+@register.simple_tag
+def responsive_image(instance, width, css_class="", loading="lazy"):
+    """Render the image of a post or project with its resized and WebP derivatives
+
+    Usage: ``{% responsive_image post 248 css_class="thirty" %}``
+
+    Parameters
+    ----------
+    :param instance:
+        the post or project whose image is rendered
+    :param width:
+        the displayed width of the image in CSS pixels
+    :param css_class:
+        the class of the img element
+    :param loading:
+        "lazy" to defer loading until the image is near the viewport, or "eager"
+    :return:
+        a picture element
+    """
+    alt = f"Image for {instance.title}"
+    if not instance.image_width:  # the derivatives have not been generated yet
+        return format_html(
+            '<img class="{}" src="{}" alt="{}" width="{}" loading="{}">',
+            css_class,
+            instance.image.url,
+            alt,
+            width,
+            loading,
+        )
+
+    original, webp = images.sources(instance)
+    height = round(instance.image_height * width / instance.image_width)
+    sizes = f"{width}px"
+    source = (
+        format_html(
+            '<source type="image/webp" srcset="{}" sizes="{}">', _srcset(webp), sizes
+        )
+        if webp
+        else ""
+    )
+    return format_html(
+        "<picture>{}"
+        '<img class="{}" src="{}" srcset="{}" sizes="{}" alt="{}" '
+        'width="{}" height="{}" loading="{}" decoding="async">'
+        "</picture>",
+        source,
+        css_class,
+        instance.image.url,
+        _srcset(original),
+        sizes,
+        alt,
+        width,
+        height,
+        loading,
+    )
@@ -0,0 +1,106 @@
+"""Render timing of the templates
+
+The template backend ``TimedDjangoTemplates`` measures how long the templates
+rendered by views take. When ``settings.TEMPLATE_TIMING`` is enabled, the time of
+every template is collected per process, also of the templates extended and
+included by the rendered one, and ``manage.py template_timings`` requests all
+pages and reports them. The time of a template includes the templates rendered
+within it, e.g. a base template includes the blocks filled in by the templates
+extending it. The time of the template rendered by a view is always added to the
+metrics of ``portfolio.metrics``.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.template import base
+from django.template.backends import django as backend
+from portfolio import metrics, profiling
+
+_timings = {}  # template name -> [renders, total seconds, maximum seconds]
+_lock = threading.Lock()
+
+
+def record(name, seconds):
+    """Add the duration of a rendering of a template to its timings"""
+    with _lock:
+        timing = _timings.setdefault(name, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+
+
+def timings():
+    """Return the timings of the templates rendered by this process
+
+    The result maps the template names, the highest total first, to dictionaries
+    with the number of "renders" and the "total", "mean" and "max" duration in
+    milliseconds.
+    """
+    with _lock:
+        items = [(name, *timing) for name, timing in _timings.items()]
+    return {
+        name: {
+            "renders": renders,
+            "total": total * 1000,
+            "mean": total * 1000 / renders,
+            "max": maximum * 1000,
+        }
+        for name, renders, total, maximum in sorted(items, key=lambda item: -item[2])
+    }
+
+
+def reset():
+    """Discard the timings collected so far"""
+    with _lock:
+        _timings.clear()
+
+
+def _instrument():
+    """Time the rendering of every template, like the test runner instruments it
+
+    Extended and included templates are rendered by the nodes of the template
+    rendered by the view, which call ``_render()`` of the compiled template without
+    passing through the backend.
+    """
+    render = base.Template._render
+    if getattr(render, "timed", False):
+        return
+
+    def _render(self, context):
+        if not settings.TEMPLATE_TIMING:
+            return render(self, context)
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            record(self.name or "<string>", time.perf_counter() - start)
+
+    _render.timed = True
+    base.Template._render = _render
+
+
+class Template(backend.Template):
+    def render(self, context=None, request=None):
+        profiling.register_thread()  # templates of async views render elsewhere
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            # the total of the request, the nested templates are part of it
+            metrics.record_template(time.perf_counter() - start)
+
+
+class TimedDjangoTemplates(backend.DjangoTemplates):
+    """The Django template backend, timing the rendering of templates"""
+
+    def __init__(self, params):
+        super().__init__(params)
+        _instrument()
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
@@ -0,0 +1,45 @@
+"""Test helpers shared by the apps of the portfolio"""
+
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class max_queries(ContextDecorator):
+    """Fail a test if the wrapped code executes more queries than its budget
+
+    Can be used as a context manager around a request or as a decorator of a whole
+    test method, e.g.::
+
+        with max_queries(3):
+            self.client.get(reverse("blog_index"))
+
+    Parameters
+    ----------
+    :param budget:
+        the maximum number of queries allowed
+    :param using:
+        the alias of the database whose queries are counted
+    """
+
+    def __init__(self, budget, using=DEFAULT_DB_ALIAS):
+        self.budget = budget
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self.context) > self.budget:
+            queries = "\n".join(
+                f"{number}. {query['sql']}"
+                for number, query in enumerate(self.context.captured_queries, 1)
+            )
+            raise AssertionError(
+                f"{len(self.context)} queries executed, the budget is {self.budget}:"
+                f"\n{queries}"
+            )
@@ -0,0 +1,948 @@
+import asyncio
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from blog.models import Category, Post
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from projects.models import Project
+from search import engine
+
+from . import (
+    benchmark,
+    content,
+    export,
+    images,
+    markup,
+    metrics,
+    profiling,
+    ratelimit,
+    templatetiming,
+)
+from .db import pool
+from .db.backends.sqlite3.base import DatabaseWrapper
+from .middleware import accepted_encodings
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False, IMAGE_DERIVATIVE_WIDTHS=[248, 496])
+class ImageDerivativeTests(TestCase):
+
+    def setUp(self):
+        # Store media files in a temporary directory with one 1000x500 image
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        buffer = io.BytesIO()
+        Image.new("RGB", (1000, 500), "orange").save(buffer, "PNG")
+        default_storage.save("post_images/wide.png", ContentFile(buffer.getvalue()))
+
+    def create_post(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                title="Image Post", body="Body", image="post_images/wide.png"
+            )
+
+    def test_derivatives_generated_on_save(self):
+        # Saving a post with an image writes resized and WebP copies
+        post = self.create_post()
+        for name in (
+            "derivatives/post_images/wide-248w.png",
+            "derivatives/post_images/wide-248w.webp",
+            "derivatives/post_images/wide-496w.png",
+            "derivatives/post_images/wide-496w.webp",
+            "derivatives/post_images/wide-1000w.webp",
+        ):
+            self.assertTrue(default_storage.exists(name), name)
+
+        # The dimensions of the original are stored on the post
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (1000, 500))
+
+        with default_storage.open("derivatives/post_images/wide-248w.png") as file:
+            self.assertEqual(Image.open(file).size, (248, 124))
+
+    def test_existing_derivatives_kept(self):
+        # Generating again only writes missing files
+        post = self.create_post()
+        post.refresh_from_db()
+        # Without decoding the image when all derivatives exist
+        with mock.patch.object(images.Image, "open") as image_open:
+            self.assertEqual(images.generate_derivatives(post), 0)
+        image_open.assert_not_called()
+        default_storage.delete("derivatives/post_images/wide-248w.webp")
+        self.assertEqual(images.generate_derivatives(post), 1)
+        self.assertEqual(images.generate_derivatives(post, force=True), 5)
+
+    def test_listing_renders_srcset(self):
+        # The listing offers all sizes, WebP first, with the dimensions of a thumbnail
+        self.create_post()
+        response = self.client.get(reverse("blog_index"))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, "wide-496w.webp 496w")
+        self.assertContains(response, 'width="248" height="124" loading="lazy"')
+
+    def test_listing_without_storage_lookups(self):
+        # The listing offers the recorded copies without asking the storage
+        post = self.create_post()
+        post.refresh_from_db()
+        self.assertEqual(len(post.image_derivatives), 5)
+        with mock.patch.object(FileSystemStorage, "exists") as exists:
+            response = self.client.get(reverse("blog_index"))
+        exists.assert_not_called()
+        self.assertContains(response, "wide-248w.png 248w")
+
+    def test_unrecorded_derivatives_not_offered(self):
+        # Copies of a width added to the settings are offered once generated
+        post = self.create_post()
+        with self.settings(IMAGE_DERIVATIVE_WIDTHS=[248, 496, 800]):
+            response = self.client.get(reverse("blog_index"))
+            self.assertNotContains(response, "wide-800w")
+            post.refresh_from_db()
+            self.assertEqual(images.generate_derivatives(post), 2)
+            response = self.client.get(reverse("blog_index"))
+            self.assertContains(response, "wide-800w.webp 800w")
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        # Export into a temporary directory, with one post in one category
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.post = Post.objects.create(title="Exported Post", body="Body")
+        self.post.categories.add(Category.objects.create(name="Tech"))
+
+    def read(self, *path):
+        with open(os.path.join(self.output, *path, "index.html")) as file:
+            return file.read()
+
+    def test_pages(self):
+        # Parametrized routes are expanded, form pages and the admin are skipped
+        pages = export.pages()
+        self.assertIn("/", pages)
+        self.assertIn(f"/blog/post/{self.post.pk}/", pages)
+        self.assertIn("/blog/category/tech/", pages)
+        self.assertNotIn("/about/contact/", pages)
+        self.assertFalse([page for page in pages if page.startswith("/admin/")])
+
+    def test_export(self):
+        # Pages, static and media files are written
+        stats = export.export(self.output)
+        self.assertEqual(stats["rendered"], len(export.pages()))
+        self.assertIn("Exported Post", self.read("blog", "post", str(self.post.pk)))
+        self.assertIn("Exported Post", self.read("blog", "category", "tech"))
+        self.assertTrue(
+            os.path.exists(os.path.join(self.output, "static", "styles.css"))
+        )
+
+    def test_no_search_link(self):
+        # The search is not exported, so the exported pages do not link it, even
+        # if the server has cached the page with the link
+        url = f"/blog/post/{self.post.pk}/"
+        self.assertContains(self.client.get(url), 'href="/search/"')
+        export.export(self.output)
+        self.assertNotIn(
+            'href="/search/"', self.read("blog", "post", str(self.post.pk))
+        )
+        self.assertNotIn('href="/search/"', self.read())
+        self.assertContains(self.client.get(url), 'href="/search/"')
+
+    @override_settings(PAGE_SIZE=1)
+    def test_listings_on_one_page(self):
+        # Listings are not paginated, since cursors cannot be served from files
+        Post.objects.create(title="Second Post", body="Body")
+        export.export(self.output)
+        self.assertIn("Exported Post", self.read("blog"))
+        self.assertIn("Second Post", self.read("blog"))
+
+    def test_incremental_export(self):
+        # Only the pages displaying a changed post are rendered again
+        export.export(self.output)
+        unchanged = export.export(self.output)
+        self.assertEqual(unchanged["copied"], 0)
+
+        self.post.title = "Edited Post"
+        self.post.save()
+        stats = export.export(self.output)
+        # the post, the blog index, the category page and the RSS and Atom feeds of
+        # both, besides the pages without validators, which are rendered every time
+        self.assertEqual(stats["rendered"] - unchanged["rendered"], 7)
+        self.assertIn("Edited Post", self.read("blog", "post", str(self.post.pk)))
+
+        # The page of a deleted post is removed
+        path = os.path.join(self.output, "blog", "post", str(self.post.pk))
+        self.post.delete()
+        self.assertEqual(export.export(self.output)["removed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(path, "index.html")))
+
+
+@override_settings(
+    STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"]
+)
+class StaticFilesTests(TestCase):
+
+    def setUp(self):
+        # Collect the static files into a temporary directory
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        static_root = override_settings(STATIC_ROOT=self.static_root)
+        static_root.enable()
+        self.addCleanup(static_root.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.url = static("styles.css")
+
+    def test_hashed_and_compressed(self):
+        # The stylesheet is fingerprinted and has compressed siblings
+        self.assertRegex(self.url, r"^/static/styles\.[0-9a-f]{12}\.css$")
+        for extension in ("", ".gz", ".br"):
+            path = os.path.join(self.static_root, self.url[8:] + extension)
+            self.assertTrue(os.path.exists(path), path)
+
+    def test_content_negotiation(self):
+        # The smallest accepted encoding is served, with the original content type
+        response = self.client.get(self.url, headers={"accept-encoding": "gzip, br"})
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+        response = self.client.get(
+            self.url, headers={"accept-encoding": "gzip, br;q=0"}
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn(b"font-family", b"".join(response.streaming_content))
+
+    def test_cache_control(self):
+        # Hashed files are immutable, the others have to be revalidated
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response["Cache-Control"], "public, max-age=31536000, immutable"
+        )
+
+        response = self.client.get("/static/styles.css")
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        response = self.client.get(
+            "/static/styles.css",
+            headers={"if-modified-since": response["Last-Modified"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_middleware(self):
+        # Under ASGI the files are served without a detour through a thread
+        response = await self.async_client.get(
+            self.url, headers={"accept-encoding": "gzip"}
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings("gzip;q=1.0, br;q=0, identity"), {"gzip", "identity"}
+        )
+
+
+class FakeConnection:
+    """Stand-in for a DB-API connection, recording whether it was closed"""
+
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def rollback(self):
+        if not self.healthy:
+            raise OSError("connection lost")
+
+
+def check(connection):
+    if not connection.healthy:
+        raise OSError("connection lost")
+
+
+class ConnectionPoolTests(TestCase):
+
+    def setUp(self):
+        self.pool = pool.ConnectionPool()
+
+    def test_reuse(self):
+        # The most recently released connection is handed out first
+        first, second = FakeConnection(), FakeConnection()
+        self.pool.release(first, FakeConnection.rollback)
+        self.pool.release(second, FakeConnection.rollback)
+        self.assertIs(self.pool.acquire(check), second)
+        self.assertIs(self.pool.acquire(check), first)
+        self.assertIsNone(self.pool.acquire(check))
+
+    def test_health_check(self):
+        # Broken connections are closed instead of being handed out
+        broken = FakeConnection()
+        self.pool.release(broken, FakeConnection.rollback)
+        broken.healthy = False
+        self.assertIsNone(self.pool.acquire(check))
+        self.assertTrue(broken.closed)
+
+    def test_failed_reset(self):
+        broken = FakeConnection(healthy=False)
+        self.pool.release(broken, FakeConnection.rollback)
+        self.assertTrue(broken.closed)
+        self.assertEqual(len(self.pool), 0)
+
+    def test_size(self):
+        # Connections beyond the size of the pool are closed
+        connections = [FakeConnection() for _ in range(3)]
+        for connection_ in connections:
+            self.pool.release(connection_, FakeConnection.rollback, size=2)
+        self.assertEqual(len(self.pool), 2)
+        self.assertTrue(connections[2].closed)
+
+    def test_max_idle(self):
+        # Connections idle for too long are closed
+        idle = FakeConnection()
+        with mock.patch("time.monotonic", return_value=1000):
+            self.pool.release(idle, FakeConnection.rollback)
+        with mock.patch("time.monotonic", return_value=1400):
+            self.assertIsNone(self.pool.acquire(check, max_idle=300))
+        self.assertTrue(idle.closed)
+
+
+class PooledBackendTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_dict = {
+            **connection.settings_dict,
+            "ENGINE": "portfolio.db.backends.sqlite3",
+            "NAME": os.path.join(directory, "pooled.sqlite3"),
+            "OPTIONS": {"pool": {"size": 2, "max_idle": 60}},
+        }
+        self.wrapper = DatabaseWrapper(settings_dict, alias="pooled")
+        self.addCleanup(pool.clear_pools)
+        self.addCleanup(self.wrapper.close)
+
+    def test_connection_reused(self):
+        # Closing returns the connection to the pool, connecting takes it again
+        self.wrapper.ensure_connection()
+        raw = self.wrapper.connection
+        self.wrapper.close()
+        self.wrapper.ensure_connection()
+        self.assertIs(self.wrapper.connection, raw)
+
+    def test_connection_reused_by_other_thread(self):
+        # Under ASGI, requests are handled by different threads
+        self.wrapper.ensure_connection()
+        raw = self.wrapper.connection
+        self.wrapper.close()
+        reused = []
+
+        def request():
+            other = DatabaseWrapper(self.wrapper.settings_dict, alias="pooled")
+            other.ensure_connection()
+            reused.append(other.connection is raw)
+            other.close()
+            reused.append(len(pool.get_pool(other.get_connection_params())))
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+        self.assertEqual(reused, [True, 1])
+
+    def test_closed_in_transaction(self):
+        # A connection closed within a transaction is not handed to others
+        self.wrapper.ensure_connection()
+        raw = self.wrapper.connection
+        self.wrapper.set_autocommit(False)
+        self.wrapper.in_atomic_block = True
+        self.wrapper.close()
+        self.wrapper.in_atomic_block = False
+        self.wrapper.connection = None
+        self.wrapper.ensure_connection()
+        self.assertIsNot(self.wrapper.connection, raw)
+
+    def test_without_pool(self):
+        # Without the pool option, connections are closed as usual
+        self.wrapper.settings_dict["OPTIONS"] = {}
+        self.wrapper.ensure_connection()
+        raw = self.wrapper.connection
+        self.wrapper.close()
+        self.wrapper.ensure_connection()
+        self.assertIsNot(self.wrapper.connection, raw)
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False, IMAGE_DERIVATIVE_WIDTHS=[248])
+class BenchmarkTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def test_generate_content(self):
+        # Posts are linked to categories, counted, indexed and share the images
+        Post.objects.all().delete()
+        Category.objects.all().delete()
+        benchmark.generate_content(
+            random.Random(0), 20, 5, categories=4, links=3, image_count=2
+        )
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertEqual(Post.categories.through.objects.count(), 60)
+        for category in Category.objects.all():
+            self.assertEqual(category.post_count, category.posts.count())
+        self.assertEqual(Post.objects.filter(image_width=1200).count(), 20)
+        self.assertTrue(
+            default_storage.exists("derivatives/post_images/benchmark-0-248w.jpg")
+        )
+        self.assertEqual(len(engine.rank(Post, "benchmark post")), 20)
+
+    def test_request_paths(self):
+        # Every route is requested, with paths sampled from its pages
+        Post.objects.create(title="First", body="Body")
+        Post.objects.create(title="Second", body="Body")
+        requests = benchmark.request_paths(
+            random.Random(0), 500, samples=1, extra=benchmark.search_paths(["a"])
+        )
+        routes = {route for route, _ in requests}
+        self.assertIn("/blog/post/<int:pk>/", routes)
+        self.assertIn("/blog/?query=<query>", routes)
+        self.assertIn("/contact/", routes)
+        posts = {path for route, path in requests if route == "/blog/post/<int:pk>/"}
+        self.assertEqual(len(posts), 1)
+
+    def test_report_and_regressions(self):
+        # Latencies and queries are summarized per route and compared
+        baseline = benchmark.report(
+            [("/", 10.0, 1), ("/", 20.0, 1), ("/blog/", 1.0, 4)]
+        )
+        self.assertEqual(baseline["/"]["requests"], 2)
+        self.assertEqual(baseline["/"]["p50"], 15.0)
+        self.assertEqual(baseline["/blog/"]["max_queries"], 4)
+        self.assertEqual(benchmark.regressions(baseline, baseline, 0.25), [])
+
+        slower = benchmark.report(
+            [("/", 100.0, 1), ("/", 200.0, 2), ("/blog/", 1.5, 4)]
+        )
+        messages = benchmark.regressions(slower, baseline, 0.25)
+        self.assertEqual(len(messages), 2)  # noise in /blog/ is tolerated
+        self.assertTrue(all(message.startswith("/:") for message in messages))
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False, IMAGE_DERIVATIVE_WIDTHS=[248])
+class BenchmarkCommandTests(TransactionTestCase):
+    """The commands request the pages in threads, which see committed rows only"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        # the database of the tests instead of a throwaway one of its own
+        creation = connection.creation
+        for patcher in [
+            mock.patch.object(
+                creation,
+                "create_test_db",
+                return_value=connection.settings_dict["NAME"],
+            ),
+            mock.patch.object(creation, "destroy_test_db"),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_benchmark_site(self):
+        # Every requested page of the generated site responds with 200
+        stdout = io.StringIO()
+        with override_settings(
+            MEDIA_ROOT=self.media_root, ALLOWED_HOSTS=[benchmark.HOST]
+        ):
+            call_command(
+                "benchmark_site",
+                posts=20,
+                projects=5,
+                categories=4,
+                images=1,
+                requests=100,
+                samples=2,
+                concurrency=2,
+                stdout=stdout,
+            )
+        output = stdout.getvalue()
+        self.assertIn("/blog/post/<int:pk>/", output)
+        self.assertNotIn("/metrics", output)
+        self.assertIn("requests/s", output)
+
+
+class ContentTests(TestCase):
+
+    def setUp(self):
+        self.news = Category.objects.create(name="News", slug="news")
+        self.notes = Category.objects.create(name="Notes", slug="notes")
+        self.post = Post.objects.create(title="Post", body="First post")
+        self.post.categories.add(self.news)
+        self.project = Project.objects.create(title="Project", body="A project")
+
+    def export(self):
+        file = io.StringIO()
+        content.export_content(file, batch_size=2)
+        return file.getvalue().splitlines()
+
+    def write(self, records):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "content.jsonl")
+        with open(path, "w") as file:
+            file.writelines(json.dumps(record) + "\n" for record in records)
+        return path
+
+    def test_round_trip(self):
+        # An empty database is filled with the same content, derived fields included
+        lines = self.export()
+        created_on = self.post.created_on
+        Post.objects.all().delete()
+        Project.objects.all().delete()
+        Category.objects.all().delete()
+
+        stats = content.import_content(lines, batch_size=2)
+        self.assertEqual(stats["blog.post"]["created"], 1)
+        post = Post.objects.get()
+        self.assertEqual(post.created_on, created_on)
+        self.assertEqual(post.body_html, "<p>First post</p>")
+        self.assertEqual(post.excerpt, "First post")
+        self.assertEqual(
+            [category.slug for category in post.categories.all()], ["news"]
+        )
+        self.assertEqual(Category.objects.get(slug="news").post_count, 1)
+        self.assertEqual(len(engine.rank(Project, "project")), 1)
+        self.assertEqual(self.export(), lines)
+
+    def test_import_is_idempotent(self):
+        # Importing a dump again neither writes nor marks anything as modified
+        lines = self.export()
+        last_modified = Post.objects.get().last_modified
+        # the lookups of the objects and the links in a savepoint per batch
+        with self.assertNumQueries(11):
+            stats = content.import_content(lines)
+        self.assertEqual([counts["unchanged"] for counts in stats.values()], [2, 1, 1])
+        self.assertEqual(Post.objects.get().last_modified, last_modified)
+
+    def test_upsert(self):
+        # Changed objects are updated in place, new ones are added
+        records = [json.loads(line) for line in self.export()]
+        records[2]["body"] = "Edited"
+        records[2]["categories"] = ["notes"]
+        records.append({**records[3], "title": "Another project"})
+        call_command("import_content", self.write(records), stdout=io.StringIO())
+        post = Post.objects.get()
+        self.assertEqual(post.pk, self.post.pk)
+        self.assertEqual(post.excerpt, "Edited")
+        self.assertGreater(post.last_modified, self.post.last_modified)
+        self.assertEqual(len(engine.rank(Post, "edited")), 1)
+        self.assertEqual(Category.objects.get(slug="news").post_count, 0)
+        self.assertEqual(Category.objects.get(slug="notes").post_count, 1)
+        self.assertEqual(Project.objects.count(), 2)
+
+    def test_created_without_returned_keys(self):
+        # Without the keys of a bulk insert, e.g. on MySQL, the new rows are read
+        # by their natural keys, and not mistaken for the rows of other writers
+        records = [json.loads(line) for line in self.export()]
+        records[2]["title"] = "New post"
+        lines = [json.dumps(record) for record in records]
+        bulk_create = Post.objects.bulk_create
+
+        def concurrent(*args, **kwargs):
+            Post.objects.create(title="Concurrent", body="Inserted in between")
+            return bulk_create(*args, **kwargs)
+
+        with (
+            mock.patch.object(
+                type(connection.features),
+                "can_return_rows_from_bulk_insert",
+                new_callable=mock.PropertyMock,
+                return_value=False,
+            ),
+            mock.patch.object(Post.objects, "bulk_create", side_effect=concurrent),
+        ):
+            content.import_content(lines)
+        post = Post.objects.get(title="New post")
+        self.assertEqual(post.created_on, self.post.created_on)
+        self.assertEqual(
+            [category.slug for category in post.categories.all()], ["news"]
+        )
+        self.assertFalse(Post.objects.get(title="Concurrent").categories.exists())
+
+    def test_related_posts_updated_since_start(self):
+        # The related posts of the imported posts are updated from the database
+        records = [json.loads(line) for line in self.export()]
+        records[2]["body"] = "Edited"
+        lines = [json.dumps(record) for record in records]
+        with mock.patch.object(content.similarity, "update_since") as update_since:
+            content.import_content(lines)
+        (since,) = update_since.call_args.args
+        self.assertEqual(
+            list(Post.objects.filter(last_modified__gte=since)), [self.post]
+        )
+        with mock.patch.object(content.similarity, "update_since") as update_since:
+            content.import_content(lines)  # nothing has changed
+        update_since.assert_not_called()
+
+    def test_unknown_category(self):
+        records = [json.loads(line) for line in self.export()]
+        records[2]["categories"] = ["missing"]
+        with self.assertRaisesMessage(CommandError, "unknown category 'missing'"):
+            call_command("import_content", self.write(records))
+
+
+class MarkupTests(TestCase):
+
+    def test_plain(self):
+        # Paragraphs and line breaks like the linebreaks filter, HTML escaped
+        self.assertEqual(
+            markup.render("One\nline\n\n<b>Two</b>"),
+            "<p>One<br>line</p>\n\n<p>&lt;b&gt;Two&lt;/b&gt;</p>",
+        )
+
+    @unittest.skipIf(markup.markdown is None, "Markdown and nh3 are not installed")
+    @override_settings(BODY_MARKUP="markdown")
+    def test_markdown_sanitized(self):
+        # Markdown is rendered, scripts and script links are removed
+        html = markup.render(
+            "# Title\n\n*text* <script>alert(1)</script> [link](javascript:alert(1))"
+        )
+        self.assertIn("<h1>Title</h1>", html)
+        self.assertIn("<em>text</em>", html)
+        self.assertNotIn("script", html)
+        self.assertNotIn("javascript", html)
+
+    def test_excerpt(self):
+        # The excerpt is the beginning of the text, without tags and entities
+        post = Post.objects.create(title="Post", body="<Intro>\n\n" + "word " * 50)
+        self.assertEqual(post.excerpt, "<Intro> " + "word " * 28 + "word…")
+        self.assertEqual(markup.excerpt("<p>" + "x" * 400 + "</p>"), "x" * 299 + "…")
+
+    @override_settings(BODY_MARKUP="textile")
+    def test_unknown_renderer(self):
+        with self.assertRaises(ImproperlyConfigured):
+            markup.render("text")
+
+    @unittest.skipIf(markup.markdown is None, "Markdown and nh3 are not installed")
+    def test_render_all(self):
+        # Only bodies rendered differently are updated and marked as modified
+        post = Post.objects.create(title="Post", body="*Body*")
+        other = Post.objects.create(title="Other", body="Body")
+        with override_settings(BODY_MARKUP="markdown"):
+            self.assertEqual(markup.render_all(Post), 1)
+            call_command("render_bodies", stdout=io.StringIO())
+        updated = Post.objects.get(pk=post.pk)
+        self.assertEqual(updated.body_html, "<p><em>Body</em></p>")
+        self.assertGreater(updated.last_modified, post.last_modified)
+        self.assertEqual(
+            Post.objects.get(pk=other.pk).last_modified, other.last_modified
+        )
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.post = Post.objects.create(title="Post", body="Body")
+
+    def test_views(self):
+        # Latency, queries, template time and size are recorded per URL name
+        response = self.client.get(reverse("blog_index"))
+        self.client.get(reverse("blog_index"))
+        self.client.get("/missing/")
+        totals = metrics.collect()
+        stats = totals["blog_index"]
+        self.assertEqual(sum(stats["latency"]), 2)
+        self.assertEqual(stats["statuses"], {"200": 2})
+        self.assertEqual(stats["size_sum"], 2 * len(response.content))
+        self.assertGreater(stats["queries"], 0)  # of the async view's threads
+        self.assertGreater(stats["template_seconds"], 0)
+        self.assertEqual(totals[metrics.UNRESOLVED]["statuses"], {"404": 1})
+
+    async def test_async(self):
+        await AsyncClient().get(reverse("blog_detail", kwargs={"pk": self.post.pk}))
+        stats = metrics.collect()["blog_detail"]
+        self.assertEqual(sum(stats["latency"]), 1)
+        self.assertGreater(stats["queries"], 0)
+
+    def test_endpoint(self):
+        self.client.get(reverse("blog_index"))
+        response = self.client.get("/metrics")
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        self.assertContains(
+            response,
+            'django_http_request_duration_seconds_bucket{view="blog_index",le="+Inf"} 1',
+        )
+        self.assertContains(response, 'django_db_queries_total{view="blog_index"}')
+        # Only internal addresses get the metrics
+        self.assertEqual(
+            self.client.get("/metrics", REMOTE_ADDR="192.0.2.1").status_code, 404
+        )
+
+    def test_processes(self):
+        # The totals written by other processes are added up
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(METRICS_DIR=directory):
+            metrics.record("blog_index", 200, 0.02, 2000, queries=3)
+            metrics.flush()
+            os.rename(
+                os.path.join(directory, f"{os.getpid()}.json"),
+                os.path.join(directory, "1.json"),
+            )
+            metrics.reset()  # as if the file had been written by another process
+            metrics.record("blog_index", 200, 0.5, 100, queries=2)
+            stats = metrics.collect()["blog_index"]
+            self.assertEqual(stats["queries"], 5)
+            self.assertEqual(stats["size_sum"], 2100)
+            self.assertEqual(sum(stats["latency"]), 2)
+
+            metrics.clear_files()
+            self.assertEqual(os.listdir(directory), [])
+
+
+@override_settings(RATE_LIMITS={"test": {"ip": (2, 10), "global": (3, 10)}})
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        caches["ratelimit"].clear()
+        ratelimit._local.clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        # also the clock of the expiry of the database cache, which must not
+        # expire the buckets right away
+        self.now = float(int(time.time()))
+        patcher = mock.patch.object(ratelimit.time, "time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_token_bucket(self):
+        # A burst up to the capacity passes, then a token comes back per interval
+        self.assertEqual(ratelimit.check("test", "192.0.2.1"), 0)
+        self.assertEqual(ratelimit.check("test", "192.0.2.1"), 0)
+        self.assertEqual(ratelimit.check("test", "192.0.2.1"), 10)
+        self.now += 4
+        self.assertEqual(ratelimit.check("test", "192.0.2.1"), 6)
+        self.now += 6
+        self.assertEqual(ratelimit.check("test", "192.0.2.1"), 0)
+
+        # The rejected requests took no token of the global bucket
+        self.assertEqual(ratelimit.check("test", "192.0.2.2"), 0)
+        self.assertEqual(ratelimit.check("test", "192.0.2.3"), 10)
+
+    def test_shared_cache(self):
+        # The buckets are kept in the database, where all processes see them
+        ratelimit.check("test", "192.0.2.1")
+        self.assertEqual(
+            caches["ratelimit"].get("ratelimit:test:ip:192.0.2.1"), self.now + 10
+        )
+        self.assertIsNone(ratelimit._local.get("ratelimit:test:ip:192.0.2.1"))
+
+    @override_settings(RATE_LIMIT_CACHE="missing")
+    def test_local_fallback(self):
+        # Without the shared cache, the buckets are kept by the process
+        for _ in range(2):
+            self.assertEqual(ratelimit.check("test", "192.0.2.1"), 0)
+        self.assertGreater(ratelimit.check("test", "192.0.2.1"), 0)
+        self.assertEqual(metrics.counters()[ratelimit.FALLBACKS], {'scope="test"': 3})
+
+    def test_counters(self):
+        # The decisions are served by /metrics
+        for _ in range(3):
+            ratelimit.check("test", "192.0.2.1")
+        response = self.client.get("/metrics")
+        self.assertContains(
+            response,
+            f'{ratelimit.REQUESTS}{{result="allowed",scope="test"}} 2',
+        )
+        self.assertContains(
+            response,
+            f'{ratelimit.REQUESTS}{{result="limited_ip",scope="test"}} 1',
+        )
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        profiles = override_settings(PROFILING_DIR=self.directory)
+        profiles.enable()
+        self.addCleanup(profiles.disable)
+        Post.objects.create(title="Post", body="Body")
+
+    def files(self, response):
+        directory = os.path.join(self.directory, response["X-Profile"])
+        return sorted(os.listdir(directory))
+
+    def test_staff(self):
+        # Staff members get the profile of a request, with the SQL trace
+        user = User.objects.create_user("staff", password="secret", is_staff=True)
+        self.client.force_login(user)
+        response = self.client.get(reverse("blog_index"), {"profile": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.files(response),
+            ["flamegraph.svg", "profile.pstats", "queries.sql", "stacks.folded"],
+        )
+        with open(
+            os.path.join(self.directory, response["X-Profile"], "queries.sql")
+        ) as file:
+            self.assertIn('FROM "blog_post"', file.read())
+
+        response = self.client.get(reverse("blog_index"), {"profile": "flamegraph"})
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertContains(response, "<svg")
+
+    def test_token(self):
+        # Without a staff account, a token of the path is needed
+        path = reverse("blog_index")
+        response = self.client.get(path, {"profile": 1})
+        self.assertNotIn("X-Profile", response)
+        token = profiling.make_token(path)
+        response = self.client.get(path, {"profile": 1, "profile_token": token})
+        self.assertIn("X-Profile", response)
+        other = self.client.get(
+            reverse("project_index"), {"profile": 1, "profile_token": token}
+        )
+        self.assertNotIn("X-Profile", other)
+
+    @override_settings(PROFILING_ASYNC=True)
+    async def test_concurrent(self):
+        # A request arriving while another one is profiled is served unprofiled,
+        # without waiting for the lock in the event loop
+        path = reverse("blog_index")
+        query = {"profile": 1, "profile_token": profiling.make_token(path)}
+        client = AsyncClient()
+        responses = await asyncio.gather(
+            client.get(path, query), client.get(path, query)
+        )
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        self.assertEqual(sum("X-Profile" in response for response in responses), 1)
+        self.assertFalse(profiling._lock.locked())
+        # The profile covers the whole event loop
+        profiled = [response for response in responses if "X-Profile" in response]
+        self.assertEqual(profiled[0]["X-Profile-Scope"], "event-loop")
+
+    async def test_async_disabled(self):
+        # Requests in the event loop are only profiled with PROFILING_ASYNC
+        path = reverse("blog_index")
+        query = {"profile": 1, "profile_token": profiling.make_token(path)}
+        response = await AsyncClient().get(path, query)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile", response)
+
+    def test_replaced_response_closed(self):
+        # The page replaced by the flame graph is closed
+        path = reverse("blog_index")
+        query = {"profile": "flamegraph", "profile_token": profiling.make_token(path)}
+        with mock.patch.object(HttpResponse, "close", autospec=True) as close:
+            response = self.client.get(path, query)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertTrue(
+            [call for call in close.call_args_list if call.args[0] is not response]
+        )
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        token = profiling.make_token(reverse("blog_index"))
+        response = self.client.get(
+            reverse("blog_index"), {"profile": 1, "profile_token": token}
+        )
+        self.assertNotIn("X-Profile", response)
+
+    def test_flamegraph(self):
+        # Stacks sharing callers are merged into one frame
+        svg = profiling.flamegraph({"main;view;query": 3, "main;view;render": 1})
+        self.assertIn("main (4 samples, 100.0%)", svg)
+        self.assertIn("query (3 samples, 75.0%)", svg)
+
+    def test_command(self):
+        output = io.StringIO()
+        call_command(
+            "profile_url", "/blog/", output=self.directory, limit=5, stdout=output
+        )
+        self.assertIn("200 in", output.getvalue())
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+        output = io.StringIO()
+        call_command("profile_url", "/blog/", token=True, stdout=output)
+        self.assertIn("/blog/?profile=1&profile_token=", output.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("profile_url", "/missing/")
+
+
+class TemplateTimingTests(TestCase):
+
+    def setUp(self):
+        templatetiming.reset()
+        self.addCleanup(templatetiming.reset)
+
+    def test_disabled(self):
+        # Nothing is recorded unless TEMPLATE_TIMING is set
+        self.client.get(reverse("blog_index"))
+        self.assertEqual(templatetiming.timings(), {})
+
+    @override_settings(TEMPLATE_TIMING=True)
+    def test_timings(self):
+        # Every rendering of a template is counted, the slowest template first
+        self.client.get(reverse("blog_index"))
+        self.client.get(reverse("blog_index"))
+        timings = templatetiming.timings()
+        self.assertEqual(timings["blog/index.html"]["renders"], 2)
+        # Including the extended and included templates
+        self.assertEqual(timings["base.html"]["renders"], 2)
+        self.assertEqual(timings["pagination.html"]["renders"], 2)
+        self.assertLessEqual(
+            timings["pagination.html"]["total"], timings["blog/index.html"]["total"]
+        )
+        totals = [timing["total"] for timing in timings.values()]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+
+    def test_command(self):
+        output = io.StringIO()
+        call_command("template_timings", repeat=1, stdout=output)
+        self.assertIn("blog/index.html", output.getvalue())
+        self.assertIn("about/index.html", output.getvalue())
+
+    def test_production_settings(self):
+        # The production profile parses the templates only once
+        from portfolio import settings_production
+
+        self.assertFalse(settings_production.DEBUG)
+        options = settings_production.TEMPLATES[0]["OPTIONS"]
+        self.assertEqual(
+            options["loaders"][0][0], "django.template.loaders.cached.Loader"
+        )
+        self.assertIn(
+            "portfolio.context_processors.fragment_cache", options["context_processors"]
+        )
@@ -16,17 +16,26 @@ Including another URLconf
 """
 
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+from django.views.static import serve
+from portfolio import metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("about/", include("about.urls")),
     path("projects/", include("projects.urls")),
     path("blog/", include("blog.urls")),
+    path("search/", include("search.urls")),
     path("", include("about.urls")),  # Redirect root to about or homepage
+    path("metrics", metrics.view, name="metrics"),  # for Prometheus, see settings
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.SERVE_MEDIA:  # static() only serves the files in DEBUG mode
+    urlpatterns += [
+        re_path(
+            rf"^{settings.MEDIA_URL.strip('/')}/(?P<path>.*)$",
+            serve,
+            {"document_root": settings.MEDIA_ROOT},
+        ),
+    ]
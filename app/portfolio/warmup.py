@@ -0,0 +1,88 @@
+"""Warm-up of a process before it serves its first request
+
+The URL patterns are compiled and the templates parsed lazily, so the first
+requests of a new worker pay for them. ``warm_process`` does this work up front;
+``portfolio.asgi`` and ``portfolio.wsgi`` call it when a worker imports the
+application. With the cached template loader of the production settings, the
+parsed templates are kept for the lifetime of the process.
+
+``warm_pages`` requests the most visited pages to fill the page and fragment
+caches, which only helps the servers if the cache is shared between processes.
+"""
+
+import os
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.template import engines
+from django.template.autoreload import get_template_directories
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLResolver, get_resolver, reverse
+
+# the pages requested by warm_pages
+WARM_URL_NAMES = ["index", "blog_index", "project_index"]
+
+
+def _compile(patterns):
+    count = 0
+    for pattern in patterns:
+        pattern.pattern.regex  # compiled on first access
+        count += 1
+        if isinstance(pattern, URLResolver):
+            count += _compile(pattern.url_patterns)
+    return count
+
+
+def warm_resolver():
+    """Compile the URL patterns and the reverse lookup, returning their number"""
+    resolver = get_resolver()
+    resolver.reverse_dict  # populated on first access
+    return _compile(resolver.url_patterns)
+
+
+def warm_templates():
+    """Parse the templates of the project and its third-party apps
+
+    The templates of Django itself, e.g. of the admin, are skipped. Returns the
+    number of parsed templates.
+    """
+    names = set()
+    for directory in get_template_directories():
+        for root, _, files in os.walk(directory):
+            for name in files:
+                names.add(os.path.relpath(os.path.join(root, name), directory))
+    for engine in engines.all():
+        for name in names:
+            engine.get_template(name)
+    return len(names)
+
+
+def warm_process():
+    """Compile the URL patterns and parse the templates, returning their numbers"""
+    return warm_resolver(), warm_templates()
+
+
+def shared_cache():
+    """Return whether the default cache is shared by the server processes"""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def warm_pages(host="localhost"):
+    """Request the pages of WARM_URL_NAMES to fill the caches
+
+    Parameters
+    ----------
+    :param host:
+        the host name the pages are requested with
+    :return:
+        a dictionary mapping the paths to the status codes of the responses
+    """
+    client = Client(SERVER_NAME=host)
+    statuses = {}
+    with override_settings(ALLOWED_HOSTS=[host]):
+        for name in WARM_URL_NAMES:
+            path = reverse(name)
+            statuses[path] = client.get(path).status_code
+    return statuses
@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class ProjectsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "projects"
+
+    def ready(self):
+        from search import engine, suggestions
+
+        # connect the signal receivers of the app
+        from . import signals  # noqa: F401
+
+        # index projects for the search form, title matches weigh more than body matches
+        engine.register(self.get_model("Project"), {"title": 3.0, "body": 1.0})
+        # suggest titles and terms while typing into the search forms
+        suggestions.register(
+            self.get_model("Project"),
+            "title",
+            "project_detail",
+            fields=["title", "body"],
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:40
+
+import html
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+def excerpt(body_html):
+    # portfolio.markup.excerpt at the time of this migration, frozen so that the
+    # migration does not depend on the current code
+    text = ' '.join(html.unescape(strip_tags(body_html)).split())
+    return Truncator(Truncator(text).words(30)).chars(300)
+
+
+def populate_excerpts(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    for project in Project.objects.only('pk', 'body_html').iterator():
+        Project.objects.filter(pk=project.pk).update(excerpt=excerpt(project.body_html))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_project_body_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.RunPython(populate_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_project_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-created_on', 'id'], name='project_created_on_id_idx'),
+        ),
+    ]
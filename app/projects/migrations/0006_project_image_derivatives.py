@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_project_created_on_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
@@ -1,12 +1,42 @@
 from django.db import models
 
+# the columns of a project rendered by the listings and search results, which never
+# display the body
+LISTING_FIELDS = [
+    "title",
+    "created_on",
+    "image",
+    "image_width",
+    "image_height",
+    "image_derivatives",
+    "excerpt",
+]
+
 
 class Project(models.Model):
     title = models.CharField(max_length=255)
     body = models.TextField()
+    # body rendered by portfolio.markup, updated whenever the object is saved
+    body_html = models.TextField(blank=True, editable=False)
+    # plain text preview of the body displayed in the listings
+    excerpt = models.CharField(max_length=300, blank=True, editable=False)
     created_on = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
     image = models.ImageField(upload_to="project_images/", null=True, blank=True)
+    # dimensions of the image, filled in when its derivatives are generated
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # storage names of the derivatives written for the image, so that rendering it
+    # does not ask the storage which exist
+    image_derivatives = models.JSONField(default=list, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # the order of the listings, so that keyset pages are range scans
+            models.Index(
+                fields=["-created_on", "id"], name="project_created_on_id_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from portfolio import images, markup, pagecache
+
+from .models import Project
+
+
+@receiver(pre_save, sender=Project)
+def render_project_body(sender, instance, **kwargs):
+    # render the body and its excerpt once instead of on every request, also for
+    # loaded fixtures
+    markup.render_body(instance)
+
+
+@receiver([post_save, post_delete], sender=Project)
+def evict_project_page(sender, instance, **kwargs):
+    # evict the cached page of a project when it is edited or deleted
+    pagecache.invalidate(Project, [instance.pk])
+
+
+@receiver(post_save, sender=Project)
+def generate_project_image_derivatives(sender, instance, raw=False, **kwargs):
+    # create the resized and WebP versions of an uploaded image in the background
+    if not raw:
+        images.schedule_derivatives(instance)
@@ -1,6 +1,10 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from portfolio import pagecache
+from portfolio.testing import max_queries
+from search import engine
 
 from .models import Project
 
@@ -86,6 +90,77 @@ class ProjectIndexViewTests(TestCase):
         # Check that no projects are returned for this query
         self.assertEqual(len(response.context["projects"]), 0)
 
+    def test_project_index_view_excerpts(self):
+        # The listing shows the stored excerpt without loading the bodies
+        response = self.client.get(reverse("project_index"))
+        self.assertContains(
+            response, "<p>This is the body of the first test project.</p>"
+        )
+        for project in response.context["projects"]:
+            self.assertTrue({"body", "body_html"} <= project.get_deferred_fields())
+
+
+@override_settings(PAGE_SIZE=2)
+class ProjectPaginationTests(TestCase):
+
+    def setUp(self):
+        # Create three projects, the newest one first in the listing
+        self.projects = [
+            Project.objects.create(title=f"Paged Project {i}", body="Paged body")
+            for i in range(3)
+        ][::-1]
+
+    def test_pages_follow_cursors(self):
+        # Follow the next cursor to the last page
+        url = reverse("project_index")
+        response = self.client.get(url)
+        self.assertEqual(response.context["projects"], self.projects[0:2])
+
+        response = self.client.get(
+            url, {"cursor": response.context["page"].next_cursor}
+        )
+        self.assertEqual(response.context["projects"], self.projects[2:3])
+        self.assertFalse(response.context["page"].has_next)
+        self.assertTrue(response.context["page"].has_previous)
+
+
+@override_settings(PAGE_SIZE=50)
+class ProjectQueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Generate 200 projects
+        projects = Project.objects.bulk_create(
+            [
+                Project(title=f"Generated Project {i}", body="Generated body")
+                for i in range(200)
+            ]
+        )
+        engine.index_objects(Project, projects)  # bulk_create does not update the index
+
+    def test_index_queries(self):
+        # The validators and a page of projects take a query each
+        with max_queries(2):
+            response = self.client.get(reverse("project_index"))
+        self.assertEqual(len(response.context["projects"]), 50)
+
+    def test_index_search_queries(self):
+        # Searching adds the index lookup but no query per result
+        with max_queries(3):
+            response = self.client.get(reverse("project_index"), {"query": "generated"})
+        self.assertEqual(len(response.context["projects"]), 50)
+
+    def test_detail_queries(self):
+        # A cache miss looks up last_modified and the project
+        cache.clear()
+        url = reverse("project_detail", kwargs={"pk": Project.objects.first().pk})
+        with max_queries(2):
+            self.client.get(url)
+
+        # A cache hit only looks up last_modified
+        with max_queries(1):
+            self.client.get(url)
+
 
 class ProjectDetailViewTests(TestCase):
     def setUp(self):
@@ -126,6 +201,70 @@ class ProjectDetailViewTests(TestCase):
         self.assertEqual(response.context["project"], self.project)
 
 
+class ProjectDetailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(title="Cached", body="Cached body")
+        self.url = reverse("project_detail", kwargs={"pk": self.project.pk})
+
+    def test_project_save_evicts(self):
+        # A cached page is rendered again after the project has been edited
+        self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url)["X-Cache"], "HIT")
+        self.project.body = "Edited body"
+        self.project.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, "Edited body")
+        self.assertEqual(pagecache.stats(Project), {"hits": 1, "misses": 2})
+
+
+class ProjectConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(title="Project", body="Body")
+
+    def test_detail_not_modified(self):
+        # A request with the ETag of the page gets a 304 until the project changes
+        url = reverse("project_detail", kwargs={"pk": self.project.pk})
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertTemplateNotUsed(response, "projects/detail.html")
+
+        self.project.save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_index_not_modified(self):
+        url = reverse("project_index")
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, headers={"if-modified-since": last_modified})
+        self.assertEqual(response.status_code, 304)
+
+
+class ProjectAsyncViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(title="Async Project", body="Body")
+
+    async def test_async_requests(self):
+        # Listing, search and detail page are served with the async ORM
+        for url in (
+            reverse("project_index"),
+            reverse("project_index") + "?query=async",
+            reverse("project_detail", kwargs={"pk": self.project.pk}),
+        ):
+            response = await self.async_client.get(url)
+            self.assertContains(response, "Async Project")
+
+    async def test_async_missing_project(self):
+        url = reverse("project_detail", kwargs={"pk": self.project.pk + 1})
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+
 class ProjectModelTests(TestCase):
 
     def setUp(self):
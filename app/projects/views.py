@@ -1,10 +1,15 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
-from projects.models import Project
+from portfolio.conditional import condition_on_object, condition_on_queryset
+from portfolio.pagecache import cache_detail_page
+from portfolio.pagination import apaginate, apaginate_ranked
+from projects.models import LISTING_FIELDS, Project
+from search.engine import rank
+from search.forms import SearchForm
 
-from .forms import SearchForm
 
-
-def project_index(request):
+@condition_on_queryset(lambda request: Project.objects.all())
+async def project_index(request):
     """The index view of the 'projects'-page, displaying a list of projects
 
     Parameters
@@ -14,27 +19,29 @@ def project_index(request):
     :return:
         the rendered content
     """
-    projects = Project.objects.all().order_by(
-        "-created_on"
-    )  # retrieve all project objects
+    # retrieve all project objects, without the bodies
+    projects = Project.objects.only(*LISTING_FIELDS)
     form = SearchForm(request.GET)  # create a SearchForm object
-
-    if form.is_valid():  # update the context if a valid form has been submitted
-        query = form.cleaned_data["query"]
-        if query:
-            # Filter projects based on the query in title and body
-            projects = projects.filter(title__icontains=query) | projects.filter(
-                body__icontains=query
-            )
+    cursor = request.GET.get("cursor")  # position of the requested page
+    query = form.cleaned_data["query"] if form.is_valid() else ""
+    if query:
+        # Rank the projects matching the query in title and body via the search index
+        hits = await sync_to_async(rank)(Project, query)
+        page = await apaginate_ranked(projects, hits, cursor)
+    else:
+        page = await apaginate(projects, cursor)  # newest projects first
 
     context = {
         "form": form,
-        "projects": projects,
+        "projects": page.object_list,
+        "page": page,
     }
     return render(request, "projects/index.html", context)
 
 
-def project_detail(request, pk):
+@condition_on_object(Project)
+@cache_detail_page(Project)
+async def project_detail(request, pk):
     """The detail view, displaying the details of a specific project
 
     Parameters
@@ -46,7 +53,7 @@ def project_detail(request, pk):
     :return:
         the rendered content
     """
-    project = Project.objects.get(pk=pk)  # get specific project
+    project = await Project.objects.aget(pk=pk)  # get specific project
     context = {  # update the context
         "project": project,
     }
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class RelatedConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "related"
+    verbose_name = "related posts"
+
+    def ready(self):
+        # connect the signal receivers of the app
+        from . import signals  # noqa: F401
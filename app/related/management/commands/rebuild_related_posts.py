@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from related import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the related posts of all posts from scratch, e.g. after restoring a "
+        "database dump or changing the weights of the similarity"
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        corpus = similarity.Corpus()
+        loaded = time.perf_counter()
+        changed = similarity.rebuild(corpus)
+        self.stdout.write(
+            f"Loaded {len(corpus.pks)} posts and {corpus.width} terms in "
+            f"{loaded - start:.2f} s, computed their related posts in "
+            f"{time.perf_counter() - loaded:.2f} s "
+            f"({'NumPy' if similarity.np is not None else 'Python'}), "
+            f"{len(changed)} posts have other related posts than before"
+        )
@@ -0,0 +1,20 @@
+from blog.models import Post
+from django.db import models
+
+
+class Neighbour(models.Model):
+    """One of the posts most similar to a post, computed by related.similarity"""
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="neighbours")
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()  # 0 for the most similar post
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # also the index of the lookup of the neighbours of a post in order
+            models.UniqueConstraint(fields=["post", "rank"], name="unique_post_rank")
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} -> {self.related_id}"
@@ -0,0 +1,103 @@
+import threading
+
+from blog.models import Category, Post
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+from portfolio import pagecache
+
+from . import similarity
+from .models import Neighbour
+
+# posts whose neighbours are updated once the transaction of the thread commits
+_pending = threading.local()
+
+
+def schedule(pks):
+    """Update the neighbours of posts and the posts around them after commit
+
+    All posts changed by a transaction, e.g. when loading a fixture, are updated
+    together by the first callback; a rolled back transaction leaves its posts to
+    the next one.
+    """
+    _pending.__dict__.setdefault("pks", set()).update(pks)
+    transaction.on_commit(_update)
+
+
+def _update():
+    pks = _pending.__dict__.pop("pks", None)
+    if pks:
+        similarity.update(pks)
+
+
+def listing_changed(pk):
+    """Mark the posts listing a post as one of their neighbours as modified"""
+    pks = list(Neighbour.objects.filter(related=pk).values_list("post", flat=True))
+    # bump last_modified, which the validators of conditional requests are based on
+    Post.objects.filter(pk__in=pks).update(last_modified=timezone.now())
+    pagecache.invalidate(Post, pks)
+
+
+@receiver(post_init, sender=Post)
+def remember_title(sender, instance, **kwargs):
+    # the title as loaded, so that a rename is noticed without reading it again
+    instance._stored_title = instance.__dict__.get("title")
+
+
+@receiver(pre_save, sender=Post)
+def remember_retitled(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (
+        update_fields is not None and "title" not in update_fields
+    ):
+        return  # a new post, or the title is not saved
+    stored = instance.__dict__.get("_stored_title")
+    if instance._state.adding or stored is None:
+        # e.g. loaded from a fixture or with a deferred title, read it once
+        stored = Post.objects.filter(pk=instance.pk).values_list("title").first()
+        stored = stored and stored[0]
+    instance._retitled = stored is not None and stored != instance.title
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, update_fields=None, **kwargs):
+    # the posts listing a retitled post display its title, even if they keep it as
+    # a neighbour
+    if instance.__dict__.pop("_retitled", False):
+        listing_changed(instance.pk)
+    instance._stored_title = instance.__dict__.get("title")
+    # the title and body are indexed, which the similarities are computed from
+    if update_fields is None or {"title", "body"} & set(update_fields):
+        schedule([instance.pk])
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    # the posts listing a deleted post need another neighbour, their rows are
+    # deleted along with it
+    schedule([instance.pk])
+    schedule(Neighbour.objects.filter(related=instance).values_list("post", flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # the rows of the join table are deleted without sending m2m_changed
+    schedule(instance.posts.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Post.categories.through)
+def posts_recategorized(sender, instance, action, reverse, pk_set, **kwargs):
+    # the category overlap is part of the similarity
+    if not reverse:  # the categories of a post were changed
+        if action in ("post_add", "post_remove", "post_clear"):
+            schedule([instance.pk])
+    elif action in ("post_add", "post_remove"):  # the posts of a category were changed
+        schedule(pk_set)
+    elif action == "pre_clear":  # the posts are unknown once they have been cleared
+        schedule(instance.posts.values_list("pk", flat=True))
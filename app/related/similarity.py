@@ -0,0 +1,418 @@
+"""Related posts by the similarity of their texts and categories
+
+The similarity of two posts is the cosine similarity of the TF-IDF vectors of
+their titles and bodies, blended with the overlap of their categories (the
+Jaccard index) by ``CATEGORY_WEIGHT``. The vectors are derived from the term
+frequencies in the search index, weighted like the fields of the search, so the
+bodies are not read nor tokenized again. They are restricted to the ``MAX_TERMS``
+terms of most TF-IDF weight in all posts, leaving out the terms of a single post,
+which relate nothing, and the terms of more than ``MAX_DOCUMENT_SHARE`` of the
+posts, which relate almost everything.
+
+The ``RELATED_POSTS_COUNT`` most similar posts of every post are stored as
+``Neighbour`` rows, which the detail page reads with one indexed query:
+
+- ``rebuild()`` computes the neighbours of all posts
+- ``update(pks)``, called by the signal receivers once posts have changed, only
+  computes the neighbours of these posts and of the posts which may gain or lose
+  them as a neighbour, and only loads the vectors of the posts sharing one of
+  their distinctive terms or a category with them
+
+With NumPy, the similarities of a block of posts to all others are computed with
+one matrix product of dense vectors, 4 KiB per post; without it, with sparse dot
+products in Python, which is fast enough for a few hundred posts.
+"""
+
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from blog.models import Post
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from portfolio import pagecache
+from search import engine
+from search.models import IndexEntry
+
+from .models import Neighbour
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the similarities are computed in Python
+    np = None
+
+CATEGORY_WEIGHT = 0.25  # share of the category overlap in the similarity
+MAX_TERMS = 1024  # dimensions of the vectors
+# terms found in more posts are like stopwords, relating almost everything
+MAX_DOCUMENT_SHARE = 0.5
+# the terms of most weight of a changed post, whose posts update() compares it to
+DISTINCTIVE_TERMS = 32
+# the latest posts of each category of a changed post update() compares it to
+CATEGORY_CANDIDATES = 256
+BLOCK_SIZE = 64  # posts whose similarities are computed at once
+BATCH_SIZE = 1000
+# rounding errors may leave a tiny similarity between unrelated posts
+MIN_SCORE = 1e-6
+# above this share of changed posts, update() recomputes all neighbours at once
+REBUILD_SHARE = 0.25
+
+
+class Corpus:
+    """The TF-IDF vectors and the categories of some posts
+
+    The terms and their inverse document frequencies are those of all posts,
+    counted by the database, while the vectors are only loaded for the posts
+    passed to ``load()``, by default all of them. The loaded posts are numbered by
+    their position in ``pks``, the vectors are normalized mappings of the
+    positions of their terms to their weights.
+    """
+
+    def __init__(self, pks=None):
+        self.weights = engine.fields(Post)
+        self.entries = IndexEntry.objects.filter(
+            content_type=ContentType.objects.get_for_model(Post),
+            field__in=self.weights,
+        )
+        self.count = Post.objects.count()
+        documents = (
+            self.entries.values("term")
+            .annotate(
+                documents=Count("object_id", distinct=True), frequency=Sum("frequency")
+            )
+            .filter(documents__gt=1, documents__lte=self.count * MAX_DOCUMENT_SHARE)
+            .values_list("term", "documents", "frequency")
+        )
+        # smoothed inverse document frequency, as in scikit-learn
+        idf, mass = {}, {}
+        for term, count, frequency in documents.iterator(chunk_size=BATCH_SIZE):
+            idf[term] = math.log((1 + self.count) / (1 + count)) + 1
+            mass[term] = frequency * idf[term]  # the TF-IDF weight in all posts
+        self.terms = heapq.nsmallest(
+            MAX_TERMS, mass, key=lambda term: (-mass[term], term)
+        )
+        self.idf = {term: idf[term] for term in self.terms}
+        self.width = len(self.terms)
+        self.columns = {term: column for column, term in enumerate(self.terms)}
+
+        self.pks, self.positions, self.vectors, self.categories = [], {}, [], []
+        self.load(pks)
+
+    def load(self, pks=None):
+        """Load the vectors and the categories of some posts, by default all of them
+
+        Parameters
+        ----------
+        :param pks:
+            the primary keys of the posts, loaded ones and deleted ones are skipped
+        """
+        if pks is None:
+            pks = Post.objects.order_by("pk").values_list("pk", flat=True)
+        pks = [pk for pk in pks if pk not in self.positions]
+        for start in range(0, len(pks), BATCH_SIZE):
+            end = start + BATCH_SIZE
+            self._load(pks[start:end])
+
+    def _load(self, pks):
+        pks = list(Post.objects.filter(pk__in=pks).values_list("pk", flat=True))
+        rows = {pk: row for row, pk in enumerate(self.pks + pks)}
+        frequencies = defaultdict(Counter)  # row -> weighted frequency per term
+        entries = self.entries.filter(object_id__in=pks).values_list(
+            "object_id", "field", "term", "frequency"
+        )
+        for pk, field, term, frequency in entries.iterator(chunk_size=BATCH_SIZE):
+            if term in self.columns:
+                frequencies[rows[pk]][term] += self.weights[field] * frequency
+        categories = defaultdict(set)
+        links = Post.categories.through.objects.filter(post__in=pks).values_list(
+            "post_id", "category_id"
+        )
+        for pk, category in links.iterator(chunk_size=BATCH_SIZE):
+            categories[pk].add(category)
+
+        for pk in pks:
+            row = rows[pk]
+            vector = {
+                self.columns[term]: (1 + math.log(frequency)) * self.idf[term]
+                for term, frequency in frequencies[row].items()
+            }
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+            self.vectors.append(
+                {column: weight / norm for column, weight in vector.items()}
+            )
+            self.categories.append(categories[pk])
+        self.pks.extend(pks)
+        self.positions = rows
+
+    def around(self, rows):
+        """Return the primary keys of the posts which may be similar to some posts
+
+        These are the posts sharing one of the DISTINCTIVE_TERMS of a post, and
+        the CATEGORY_CANDIDATES latest posts of each of its categories, so that
+        their number does not grow with the corpus. Posts only sharing terms of
+        little weight are left to ``rebuild()``.
+        """
+        terms = set()
+        for row in rows:
+            vector = self.vectors[row]
+            columns = heapq.nlargest(DISTINCTIVE_TERMS, vector, key=vector.get)
+            terms.update(self.terms[column] for column in columns)
+        pks = set(
+            self.entries.filter(term__in=terms)
+            .values_list("object_id", flat=True)
+            .distinct()
+        )
+        links = Post.categories.through.objects.order_by("-post_id")
+        for category in set().union(*(self.categories[row] for row in rows)):
+            members = links.filter(category=category).values_list("post_id")
+            pks.update(pk for pk, in members[:CATEGORY_CANDIDATES])
+        return pks
+
+    def similarities(self, rows, thresholds=None):
+        """Yield the most similar posts of some posts
+
+        Parameters
+        ----------
+        :param rows:
+            the positions of the posts
+        :param thresholds:
+            a similarity per position, the posts more similar than their threshold
+            are yielded as well
+        :return:
+            an iterator of (row, {other row: similarity}) tuples, with at least the
+            RELATED_POSTS_COUNT most similar posts
+        """
+        if np is not None:
+            yield from self._matrix_similarities(rows, thresholds)
+            return
+        postings = defaultdict(list)  # column -> [(row, weight)]
+        for row, vector in enumerate(self.vectors):
+            for column, weight in vector.items():
+                postings[column].append((row, weight))
+        members = defaultdict(list)  # category -> rows
+        for row, categories in enumerate(self.categories):
+            for category in categories:
+                members[category].append(row)
+
+        for row in rows:
+            cosines = defaultdict(float)
+            for column, weight in self.vectors[row].items():
+                for other, other_weight in postings[column]:
+                    cosines[other] += weight * other_weight
+            overlaps = Counter()
+            for category in self.categories[row]:
+                overlaps.update(members[category])
+            scores = {}
+            for other in cosines.keys() | overlaps.keys():
+                overlap = overlaps[other]
+                union = len(self.categories[row]) + len(self.categories[other])
+                jaccard = overlap / (union - overlap) if overlap else 0.0
+                score = (1 - CATEGORY_WEIGHT) * cosines[
+                    other
+                ] + CATEGORY_WEIGHT * jaccard
+                if score > MIN_SCORE and other != row:
+                    scores[other] = score
+            best = heapq.nlargest(
+                settings.RELATED_POSTS_COUNT,
+                scores,
+                key=lambda other: (scores[other], -self.pks[other]),
+            )
+            yield row, {
+                other: score
+                for other, score in scores.items()
+                if other in best or (thresholds and score > thresholds[other])
+            }
+
+    def _matrix_similarities(self, rows, thresholds):
+        count = len(self.pks)
+        vectors = np.zeros((count, self.width), dtype=np.float32)
+        for row, vector in enumerate(self.vectors):
+            vectors[row, list(vector)] = list(vector.values())
+        categories = sorted(set().union(*self.categories))
+        columns = {category: column for column, category in enumerate(categories)}
+        memberships = np.zeros((count, len(categories)), dtype=np.float32)
+        for row, row_categories in enumerate(self.categories):
+            memberships[row, [columns[category] for category in row_categories]] = 1
+        sizes = memberships.sum(axis=1)
+        if thresholds is not None:
+            thresholds = np.asarray(thresholds, dtype=np.float32)
+        best = min(settings.RELATED_POSTS_COUNT, count)
+
+        rows = list(rows)
+        for start in range(0, len(rows), BLOCK_SIZE):
+            end = start + BLOCK_SIZE
+            block = rows[start:end]
+            scores = vectors[block] @ vectors.T
+            overlaps = memberships[block] @ memberships.T
+            unions = sizes[block][:, np.newaxis] + sizes - overlaps
+            jaccard = np.divide(
+                overlaps, unions, out=np.zeros_like(overlaps), where=unions > 0
+            )
+            scores = (1 - CATEGORY_WEIGHT) * scores + CATEGORY_WEIGHT * jaccard
+            lines = np.arange(len(block))[:, np.newaxis]
+            scores[lines[:, 0], block] = 0  # the post itself
+            if thresholds is None:
+                keep = np.zeros(scores.shape, dtype=bool)
+            else:
+                keep = scores > thresholds
+            if best:  # the columns of the best scores of every line
+                keep[lines, np.argpartition(scores, -best, axis=1)[:, -best:]] = True
+            keep &= scores > MIN_SCORE
+            for row, row_scores, row_keep in zip(block, scores, keep):
+                others = np.flatnonzero(row_keep)
+                yield row, dict(zip(others.tolist(), row_scores[others].tolist()))
+
+    def neighbours(self, scores):
+        """Return the primary keys and similarities of the most similar posts"""
+        best = heapq.nlargest(
+            settings.RELATED_POSTS_COUNT,
+            scores.items(),
+            key=lambda item: (item[1], -self.pks[item[0]]),  # the older post on ties
+        )
+        return [(self.pks[other], score) for other, score in best]
+
+
+def _stored(pks=None):
+    """Return the stored neighbours as {post pk: [(related pk, score)]}
+
+    Parameters
+    ----------
+    :param pks:
+        the primary keys of the posts whose neighbours are read, by default all
+    """
+    neighbours = defaultdict(list)
+    rows = Neighbour.objects.order_by("post", "rank").values_list(
+        "post", "related", "score"
+    )
+    if pks is None:
+        batches = [rows]
+    else:
+        pks = list(pks)
+        batches = []
+        for start in range(0, len(pks), BATCH_SIZE):
+            end = start + BATCH_SIZE
+            batches.append(rows.filter(post__in=pks[start:end]))
+    for batch in batches:
+        for post, related, score in batch.iterator(chunk_size=BATCH_SIZE):
+            neighbours[post].append((related, score))
+    return neighbours
+
+
+def _write(changed, modified):
+    """Replace the neighbours of a batch of posts in a transaction"""
+    with transaction.atomic():
+        Neighbour.objects.filter(post__in=list(changed)).delete()
+        Neighbour.objects.bulk_create(
+            Neighbour(post_id=pk, related_id=related, rank=rank, score=score)
+            for pk, neighbours in changed.items()
+            for rank, (related, score) in enumerate(neighbours)
+        )
+        Post.objects.filter(pk__in=modified).update(last_modified=timezone.now())
+    pagecache.invalidate(Post, modified)
+
+
+def _save(corpus, rows, stored):
+    """Store the neighbours of some posts where they have changed
+
+    Posts which display other neighbours than before are marked as modified, so
+    that their cached pages and the validators of conditional requests are
+    renewed. The neighbours are written in batches, each in a transaction of its
+    own. Returns the primary keys of the modified posts.
+    """
+    changed, modified, written = {}, [], []
+    for row, scores in corpus.similarities(rows):
+        pk = corpus.pks[row]
+        neighbours = corpus.neighbours(scores)
+        before = stored.get(pk, [])
+        if [related for related, _ in neighbours] != [related for related, _ in before]:
+            modified.append(pk)
+        elif all(
+            math.isclose(score, score_before, abs_tol=1e-4)
+            for (_, score), (_, score_before) in zip(neighbours, before)
+        ):
+            continue
+        changed[pk] = neighbours  # the scores are compared by update()
+        if len(changed) == BATCH_SIZE:
+            _write(changed, modified)
+            written += modified
+            changed, modified = {}, []
+    _write(changed, modified)
+    return written + modified
+
+
+def rebuild(corpus=None):
+    """Compute the neighbours of all posts
+
+    Parameters
+    ----------
+    :param corpus:
+        the Corpus of all posts, loaded if not given
+    :return:
+        the primary keys of the posts whose neighbours have changed
+    """
+    corpus = corpus or Corpus()
+    Neighbour.objects.exclude(post__in=corpus.pks).delete()  # posts added in between
+    return _save(corpus, range(len(corpus.pks)), _stored())
+
+
+def update_since(since):
+    """Compute the neighbours of the posts modified since a time, see update()
+
+    Parameters
+    ----------
+    :param since:
+        the time before the posts were changed, e.g. the start of an import
+    :return:
+        the primary keys of the posts whose neighbours have changed
+    """
+    changed = Post.objects.filter(last_modified__gte=since)
+    if changed.count() > Post.objects.count() * REBUILD_SHARE:
+        return rebuild()  # without reading the primary keys of all changed posts
+    return update(changed.values_list("pk", flat=True))
+
+
+def update(pks):
+    """Compute the neighbours of changed posts and of the posts affected by them
+
+    A post is affected if one of the changed posts was one of its neighbours, or
+    is now more similar to it than its least similar neighbour. Only the vectors
+    of these posts and of the posts around them, see ``Corpus.around()``, are
+    loaded.
+
+    Parameters
+    ----------
+    :param pks:
+        the primary keys of posts which have been saved, deleted, or whose
+        categories or neighbours have changed
+    :return:
+        the primary keys of the posts whose neighbours have changed
+    """
+    pks = set(pks)
+    corpus = Corpus(pks)
+    changed = [corpus.positions[pk] for pk in pks if pk in corpus.positions]
+    if len(changed) > corpus.count * REBUILD_SHARE:
+        return rebuild()
+
+    listing = Neighbour.objects.filter(related__in=list(pks)).values_list("post")
+    corpus.load(corpus.around(changed) | {pk for pk, in listing})
+    stored = _stored(corpus.pks)
+    affected = set(changed)
+    for pk, neighbours in stored.items():
+        if pks & {related for related, _ in neighbours}:
+            affected.add(corpus.positions[pk])
+    # the similarity a post has to exceed to become a neighbour of another one
+    thresholds = []
+    for pk in corpus.pks:
+        neighbours = stored.get(pk, [])
+        full = len(neighbours) >= settings.RELATED_POSTS_COUNT
+        thresholds.append(neighbours[-1][1] if full else 0.0)
+    for row, scores in corpus.similarities(changed, thresholds):
+        affected.update(
+            other for other, score in scores.items() if score > thresholds[other]
+        )
+    affected = sorted(affected)
+    # the posts which may be similar to the affected ones, to rank all of them
+    corpus.load(corpus.around(affected))
+    return _save(corpus, affected, stored)
@@ -0,0 +1,160 @@
+from unittest import mock
+
+from blog.models import Category, Post
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import similarity
+from .models import Neighbour
+
+
+class SimilarityTests(TestCase):
+
+    def setUp(self):
+        self.baking = Category.objects.create(name="Baking")
+        self.web = Category.objects.create(name="Web")
+        self.django = self.create(
+            "Django views", "Class based views in Django", self.web
+        )
+        self.templates = self.create("Django templates", "Templates render views")
+        self.bread = self.create("Sourdough bread", "Baking bread with a starter")
+        self.starter = self.create(
+            "Sourdough starter", "Feeding the starter", self.baking
+        )
+        self.cake = self.create("Cake", "Baking with sugar", self.baking)
+
+    def create(self, title, body, *categories):
+        post = Post.objects.create(title=title, body=body)
+        post.categories.set(categories)
+        return post
+
+    def related(self, post):
+        return list(
+            Neighbour.objects.filter(post=post)
+            .order_by("rank")
+            .values_list("related__title", flat=True)
+        )
+
+    def test_rebuild(self):
+        # Posts sharing terms are related, shared categories add to the similarity
+        changed = similarity.rebuild()
+        self.assertEqual(len(changed), 5)
+        self.assertEqual(self.related(self.django), ["Django templates"])
+        self.assertEqual(self.related(self.starter), ["Sourdough bread", "Cake"])
+        self.assertEqual(
+            self.related(self.cake), ["Sourdough bread", "Sourdough starter"]
+        )
+        # nothing has changed, nothing is written
+        self.assertEqual(similarity.rebuild(), [])
+
+    def test_without_numpy(self):
+        # The similarities computed in Python are the same as with NumPy
+        similarity.rebuild()
+        expected = list(Neighbour.objects.values_list("post", "related", "rank"))
+        Neighbour.objects.all().delete()
+        with mock.patch.object(similarity, "np", None):
+            similarity.rebuild()
+        self.assertEqual(
+            list(Neighbour.objects.values_list("post", "related", "rank")), expected
+        )
+
+    def test_updated_on_commit(self):
+        # Changed posts and the posts around them are updated after commit
+        similarity.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            cake = self.create("Sourdough cake", "A cake with starter", self.baking)
+        self.assertEqual(
+            self.related(cake), ["Cake", "Sourdough starter", "Sourdough bread"]
+        )
+        self.assertIn("Sourdough cake", self.related(self.bread))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.starter.delete()
+        self.assertNotIn("Sourdough starter", self.related(cake))
+        self.assertEqual(self.related(self.cake)[0], "Sourdough cake")
+
+    def test_marks_posts_modified(self):
+        # Posts listing other related posts than before are marked as modified
+        similarity.rebuild()
+        last_modified = Post.objects.get(pk=self.django.pk).last_modified
+        self.templates.title = "Bread rolls"
+        self.templates.body = "Baking bread"
+        self.templates.save()  # TestCase does not run the commit callbacks
+        self.assertIn(self.django.pk, similarity.update([self.templates.pk]))
+        self.assertEqual(self.related(self.django), [])
+        self.assertIn("Bread rolls", self.related(self.bread))
+        self.assertGreater(
+            Post.objects.get(pk=self.django.pk).last_modified, last_modified
+        )
+
+    def test_update_loads_posts_around(self):
+        # Only the posts sharing a term or a category with the changed posts and
+        # the posts affected by them are loaded
+        similarity.rebuild()
+        with mock.patch.object(similarity, "_save", wraps=similarity._save) as save:
+            similarity.update([self.django.pk])
+        corpus = save.call_args.args[0]
+        self.assertEqual(set(corpus.pks), {self.django.pk, self.templates.pk})
+        self.assertEqual(corpus.count, 5)
+        self.assertEqual(self.related(self.django), ["Django templates"])
+
+    def test_vocabulary(self):
+        # Terms of a single post and of most posts are left out, like stopwords
+        for post in Post.objects.all():
+            post.body += " and the"
+            post.save()
+        corpus = similarity.Corpus()
+        self.assertIn("sourdough", corpus.terms)
+        self.assertNotIn("the", corpus.terms)
+        self.assertNotIn("sugar", corpus.terms)
+
+    def test_around_distinctive_terms(self):
+        # Only the posts sharing the terms of most weight are compared
+        corpus = similarity.Corpus()
+        row = corpus.positions[self.bread.pk]
+        self.assertEqual(
+            corpus.around([row]),
+            {self.bread.pk, self.starter.pk, self.cake.pk},
+        )
+        with mock.patch.object(similarity, "DISTINCTIVE_TERMS", 1):
+            self.assertEqual(corpus.around([row]), {self.bread.pk, self.starter.pk})
+
+    def test_retitled_neighbour(self):
+        # The cached pages listing a retitled post are renewed, even if the post
+        # is still one of their neighbours
+        similarity.rebuild()
+        cache.clear()
+        url = reverse("blog_detail", args=[self.django.pk])
+        self.assertContains(self.client.get(url), "Django templates")
+        last_modified = Post.objects.get(pk=self.django.pk).last_modified
+        with self.captureOnCommitCallbacks(execute=True):
+            self.templates.title = "Django template views"
+            self.templates.save()
+        self.assertEqual(self.related(self.django), ["Django template views"])
+        self.assertContains(self.client.get(url), "Django template views")
+        self.assertGreater(
+            Post.objects.get(pk=self.django.pk).last_modified, last_modified
+        )
+        # the title as loaded is compared, without reading it again
+        post = Post.objects.get(pk=self.templates.pk)
+        post.body = "Templates render class based views"
+        with CaptureQueriesContext(connection) as queries:
+            post.save()
+        reads = [query["sql"] for query in queries if query["sql"].startswith("SELECT")]
+        self.assertFalse([sql for sql in reads if 'FROM "blog_post"' in sql])
+        # saving the same title again changes nothing
+        last_modified = Post.objects.get(pk=self.django.pk).last_modified
+        self.templates.save()
+        self.assertEqual(
+            Post.objects.get(pk=self.django.pk).last_modified, last_modified
+        )
+
+    def test_detail_page(self):
+        similarity.rebuild()
+        cache.clear()
+        response = self.client.get(reverse("blog_detail", args=[self.django.pk]))
+        self.assertEqual(response.context["related_posts"], [self.templates])
+        self.assertContains(response, "Related Posts")
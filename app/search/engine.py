@@ -0,0 +1,231 @@
+"""Inverted index over the text fields of registered models
+
+A model is registered together with the fields to index and a weight per field,
+e.g. ``register(Post, {"title": 3.0, "body": 1.0})``. From then on the index is
+updated incrementally through the ``post_save`` and ``post_delete`` signals of
+the model and can be queried with ``rank`` and ``search``.
+"""
+
+import math
+import re
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import IndexEntry
+
+TOKEN_RE = re.compile(r"\w+")
+MAX_TERM_LENGTH = IndexEntry._meta.get_field("term").max_length
+BATCH_SIZE = 1000
+
+_registry = {}  # maps registered models to their {field: weight} configuration
+
+
+def tokenize(text):
+    """Split a text into lower-cased terms
+
+    Parameters
+    ----------
+    :param text:
+        the text to be split
+    :return:
+        the list of terms in the order they appear in the text
+    """
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower())]
+
+
+def register(model, fields):
+    """Add a model to the search index and keep it updated on save and delete
+
+    Parameters
+    ----------
+    :param model:
+        the model class to be indexed
+    :param fields:
+        a mapping of the names of the text fields to index to their weight
+    """
+    _registry[model] = dict(fields)
+    uid = f"search_index_{model._meta.label_lower}"
+    post_save.connect(_on_save, sender=model, dispatch_uid=uid)
+    post_delete.connect(_on_delete, sender=model, dispatch_uid=uid)
+
+
+def registered_models():
+    return list(_registry)
+
+
+def fields(model):
+    """Return the {field: weight} configuration of a registered model"""
+    return dict(_registry[model])
+
+
+def _entries(instance, content_type):
+    """Yield the (unsaved) index entries of a single object"""
+    for field in _registry[type(instance)]:
+        positions = defaultdict(list)
+        for position, term in enumerate(tokenize(getattr(instance, field) or "")):
+            positions[term].append(position)
+        for term, term_positions in positions.items():
+            yield IndexEntry(
+                term=term,
+                content_type=content_type,
+                object_id=instance.pk,
+                field=field,
+                frequency=len(term_positions),
+                positions=",".join(map(str, term_positions)),
+            )
+
+
+def index_objects(model, objects, replace=True):
+    """(Re-)index several objects of the same model with batched inserts
+
+    Parameters
+    ----------
+    :param model:
+        the registered model the objects belong to
+    :param objects:
+        an iterable of saved model instances
+    :param replace:
+        whether existing entries of the objects have to be removed first
+    :return:
+        the number of indexed objects
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    count = 0
+    batch = []
+    with transaction.atomic():
+        for instance in objects:
+            if replace:
+                IndexEntry.objects.filter(
+                    content_type=content_type, object_id=instance.pk
+                ).delete()
+            batch.extend(_entries(instance, content_type))
+            if len(batch) >= BATCH_SIZE:
+                IndexEntry.objects.bulk_create(batch)
+                batch = []
+            count += 1
+        IndexEntry.objects.bulk_create(batch)
+    return count
+
+
+def index_object(instance):
+    index_objects(type(instance), [instance])
+
+
+def remove_object(instance):
+    content_type = ContentType.objects.get_for_model(type(instance))
+    IndexEntry.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+
+
+def rebuild(model):
+    """Drop and rebuild the index of a registered model
+
+    Parameters
+    ----------
+    :param model:
+        the registered model to be reindexed
+    :return:
+        the number of indexed objects
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    with transaction.atomic():
+        IndexEntry.objects.filter(content_type=content_type).delete()
+        objects = model.objects.only("pk", *_registry[model]).iterator(
+            chunk_size=BATCH_SIZE
+        )
+        return index_objects(model, objects, replace=False)
+
+
+def _phrase_count(postings, terms):
+    """Count the occurrences of terms as a consecutive phrase within one field"""
+    if any(term not in postings for term in terms):
+        return 0
+    positions = [set(map(int, postings[term].split(","))) for term in terms]
+    return sum(
+        all(start + offset in positions[offset] for offset in range(1, len(terms)))
+        for start in positions[0]
+    )
+
+
+def rank(model, query):
+    """Look up the objects of a model matching a query, best match first
+
+    All terms of the query have to appear as a phrase in one of the indexed fields.
+    Each matching field adds its weight, damped logarithmically by the number of
+    matches, to the score of an object. Ties are broken by the newest object first.
+
+    Parameters
+    ----------
+    :param model:
+        the registered model to be searched
+    :param query:
+        the search query entered by the user
+    :return:
+        a list of (primary key, score) tuples
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    weights = _registry[model]
+    phrase = len(terms) > 1
+
+    entries = IndexEntry.objects.filter(
+        content_type=ContentType.objects.get_for_model(model), field__in=weights
+    )
+    if phrase:
+        # only fetch the postings of objects containing every term of the phrase,
+        # so that a frequent term does not pull in its whole posting list
+        for term in set(terms):
+            entries = entries.filter(
+                object_id__in=entries.filter(term=term).values("object_id")
+            )
+    entries = entries.filter(term__in=set(terms)).values_list(
+        "object_id", "field", "term", "positions" if phrase else "frequency"
+    )
+
+    scores = defaultdict(float)
+    if phrase:
+        postings = defaultdict(dict)  # (object_id, field) -> {term: positions}
+        for object_id, field, term, positions in entries:
+            postings[object_id, field][term] = positions
+        matches = (
+            (object_id, field, _phrase_count(field_postings, terms))
+            for (object_id, field), field_postings in postings.items()
+        )
+    else:
+        matches = ((object_id, field, count) for object_id, field, _, count in entries)
+
+    for object_id, field, count in matches:
+        if count:
+            scores[object_id] += weights[field] * (1 + math.log(count))
+
+    return sorted(scores.items(), key=lambda hit: (-hit[1], -hit[0]))
+
+
+def search(queryset, query):
+    """Narrow a queryset down to the objects matching a query, best match first
+
+    Parameters
+    ----------
+    :param queryset:
+        a queryset of a registered model
+    :param query:
+        the search query entered by the user
+    :return:
+        a list of the matching objects ordered by relevance
+    """
+    hits = rank(queryset.model, query)
+    objects = queryset.in_bulk([pk for pk, _ in hits])
+    return [objects[pk] for pk, _ in hits if pk in objects]
+
+
+def _on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(_registry[sender]):
+        return  # none of the indexed fields has changed
+    index_object(instance)
+
+
+def _on_delete(sender, instance, **kwargs):
+    remove_object(instance)
@@ -0,0 +1,18 @@
+from django import forms
+from django.urls import reverse_lazy
+
+
+class SearchForm(forms.Form):  # define a form with a character field for searching
+    query = forms.CharField(
+        label="Search",
+        max_length=100,
+        required=False,
+        # filled with suggestions while typing by static/autocomplete.js
+        widget=forms.TextInput(
+            attrs={
+                "list": "search-suggestions",
+                "autocomplete": "off",
+                "data-autocomplete": reverse_lazy("search_autocomplete"),
+            }
+        ),
+    )
@@ -0,0 +1,53 @@
+import statistics
+import time
+
+from search import suggestions
+from search.management.commands import benchmark_search
+
+
+class Command(benchmark_search.Command):
+    help = (
+        "Measure the time to build the prefix index of the search suggestions and "
+        "the latency of its lookups on a synthetic corpus of posts, generated in a "
+        "throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(posts=20_000, queries=10_000)
+
+    def measure(self, bodies, count):
+        """Time lookups of prefixes of the words and phrases of the bodies"""
+        index = suggestions.index
+        index.clear()
+        start = time.perf_counter()
+        index.refresh()
+        self.stdout.write(
+            f"Built the index of {len(index)} objects and {index.term_count()} terms "
+            f"in {time.perf_counter() - start:.2f} s"
+        )
+
+        queries = []
+        for _ in range(count):
+            words = self.random.choice(bodies).split()
+            start = self.random.randrange(len(words) - 1)
+            end = start + self.random.choice([1, 2])  # words and phrases
+            phrase = words[start:end]
+            # the last word is cut off as if it was still being typed
+            phrase[-1] = phrase[-1][: self.random.randint(2, len(phrase[-1]))]
+            queries.append(" ".join(phrase))
+
+        for label, repeated in (("first lookup", False), ("repeated lookup", True)):
+            samples = []
+            for query in queries:
+                if not repeated:
+                    index._completions.clear()  # nothing memoized
+                start = time.perf_counter()
+                index.suggest(query)
+                samples.append((time.perf_counter() - start) * 1_000_000)
+            cuts = statistics.quantiles(samples, n=100)
+            self.stdout.write(
+                f"{label:>15}: mean {statistics.mean(samples):.1f} us, "
+                f"p50 {cuts[49]:.1f} us, p95 {cuts[94]:.1f} us, "
+                f"p99 {cuts[98]:.1f} us over {len(samples)} queries"
+            )
@@ -0,0 +1,107 @@
+import random
+import statistics
+import time
+
+from blog.models import Post
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from search import engine
+
+SYLLABLES = "da ta sci en ce ma chi ne lear ning de vo".split()
+
+
+def percentiles(samples):
+    """Return the mean, p50 and p95 of a list of durations in milliseconds"""
+    cuts = statistics.quantiles(samples, n=100)
+    return statistics.mean(samples), cuts[49], cuts[94]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the search latency of the inverted index against icontains scans "
+        "on a synthetic corpus of posts, generated in a throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100_000)
+        parser.add_argument("--words", type=int, default=30, help="words per body")
+        parser.add_argument("--vocabulary", type=int, default=5_000)
+        parser.add_argument("--queries", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            bodies = self.generate(options)
+            self.measure(bodies, options["queries"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def generate(self, options):
+        """Bulk insert and index the synthetic corpus, returning the post bodies"""
+        vocabulary = sorted(
+            {
+                "".join(self.random.choices(SYLLABLES, k=self.random.randint(2, 4)))
+                for _ in range(options["vocabulary"])
+            }
+        )
+        # word frequencies follow Zipf's law like natural language does
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+
+        start = time.perf_counter()
+        bodies = []
+        for offset in range(0, options["posts"], engine.BATCH_SIZE):
+            size = min(engine.BATCH_SIZE, options["posts"] - offset)
+            posts = [
+                Post(
+                    title=" ".join(self.random.choices(vocabulary, weights, k=6)),
+                    body=" ".join(
+                        self.random.choices(vocabulary, weights, k=options["words"])
+                    ),
+                )
+                for _ in range(size)
+            ]
+            posts = Post.objects.bulk_create(posts)  # does not send post_save
+            engine.index_objects(Post, posts, replace=False)
+            bodies.extend(post.body for post in posts)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Generated and indexed {len(bodies)} posts in {elapsed:.1f} s "
+            f"({len(bodies) / elapsed:.0f} posts/s)"
+        )
+        return bodies
+
+    def measure(self, bodies, count):
+        """Time the same single-term and phrase queries with both strategies"""
+        queries = []
+        for _ in range(count):
+            words = self.random.choice(bodies).split()
+            start = self.random.randrange(len(words) - 1)
+            end = start + self.random.choice([1, 2])  # single terms and phrases
+            queries.append(" ".join(words[start:end]))
+
+        index_times, scan_times = [], []
+        for query in queries:
+            start = time.perf_counter()
+            engine.rank(Post, query)
+            index_times.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            list(
+                Post.objects.filter(
+                    Q(title__icontains=query) | Q(body__icontains=query)
+                ).values_list("pk", flat=True)
+            )
+            scan_times.append((time.perf_counter() - start) * 1000)
+
+        for label, samples in (
+            ("inverted index", index_times),
+            ("icontains", scan_times),
+        ):
+            mean, p50, p95 = percentiles(samples)
+            self.stdout.write(
+                f"{label:>15}: mean {mean:.2f} ms, p50 {p50:.2f} ms, p95 {p95:.2f} ms "
+                f"over {len(samples)} queries"
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from search import engine
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index of all registered models from scratch"
+
+    def handle(self, *args, **options):
+        for model in engine.registered_models():
+            count = engine.rebuild(model)
+            self.stdout.write(f"Indexed {count} {model._meta.verbose_name_plural}")
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('field', models.CharField(max_length=30)),
+                ('frequency', models.PositiveIntegerField()),
+                ('positions', models.TextField()),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name_plural': 'index entries',
+                'indexes': [models.Index(fields=['content_type', 'term', 'object_id'], name='search_inde_content_aa554e_idx'), models.Index(fields=['content_type', 'object_id'], name='search_inde_content_d1688f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class IndexEntry(models.Model):
+    """One posting of the inverted index: a term occurring in a field of an object"""
+
+    term = models.CharField(max_length=64)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    field = models.CharField(max_length=30)
+    frequency = models.PositiveIntegerField()
+    positions = models.TextField()  # comma separated token positions within the field
+
+    class Meta:
+        verbose_name_plural = "index entries"
+        indexes = [
+            models.Index(fields=["content_type", "term", "object_id"]),  # term lookups
+            models.Index(fields=["content_type", "object_id"]),  # reindexing
+        ]
+
+    def __str__(self):
+        return self.term
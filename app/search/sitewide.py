@@ -0,0 +1,71 @@
+"""Site-wide search over the objects of all registered models together
+
+Every model is ranked by the search engine in a thread of its own, with its own
+database connection, so the lookups run concurrently. Their hits are merged into
+one list ordered by score. The merged hits are cached per normalized query, the
+terms the engine searches for, for ``SEARCH_CACHE_TIMEOUT`` seconds: paging
+through the results or searching "Django!" after "django" ranks nothing again.
+"""
+
+import asyncio
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .engine import rank, registered_models, tokenize
+
+CACHE_PREFIX = "search"
+
+
+def normalize(query):
+    """Return the terms of a query as searched for by the engine, space separated"""
+    return " ".join(tokenize(query))
+
+
+def _rank(model, query):
+    try:
+        return [(model._meta.label, pk, score) for pk, score in rank(model, query)]
+    finally:
+        connections.close_all()  # connections are per thread, pooled when closed
+
+
+async def arank_all(query, models=None):
+    """Look up the objects of several registered models matching a query
+
+    Parameters
+    ----------
+    :param query:
+        the search query entered by the user
+    :param models:
+        the registered models to be searched, by default all of them
+    :return:
+        a list of (model label, primary key, score) tuples, ordered by descending
+        score, then by model label and newest object first
+    """
+    normalized = normalize(query)
+    if not normalized:
+        return []
+    models = sorted(models or registered_models(), key=lambda model: model._meta.label)
+    labels = ",".join(model._meta.label for model in models)
+    digest = hashlib.md5(
+        f"{labels}:{normalized}".encode(), usedforsecurity=False
+    ).hexdigest()
+    key = f"{CACHE_PREFIX}:{digest}"
+    hits = await cache.aget(key)
+    if hits is None:
+        # not thread sensitive, so that every model is ranked in another thread
+        ranked = await asyncio.gather(
+            *(
+                sync_to_async(_rank, thread_sensitive=False)(model, normalized)
+                for model in models
+            )
+        )
+        hits = sorted(
+            (hit for model_hits in ranked for hit in model_hits),
+            key=lambda hit: (-hit[2], hit[0], -hit[1]),
+        )
+        await cache.aset(key, hits, settings.SEARCH_CACHE_TIMEOUT)
+    return hits
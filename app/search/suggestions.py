@@ -0,0 +1,323 @@
+"""Prefix index for the search-as-you-type suggestions of the search forms
+
+A model is registered with the field holding its title, the URL pattern of its
+page and the fields whose terms are suggested, e.g.
+``register(Post, "title", "blog_detail", fields=["title", "body"])``. The index
+is kept in the memory of the process, in sorted lists which are searched by
+bisection, so that a lookup runs no query and takes microseconds:
+
+- the normalized titles, and the titles without their first words, so that a
+  prefix matches at the start of any word of a title
+- the terms of the registered fields with the number of objects containing them,
+  the most frequent completions of the last word of a query are suggested
+
+The index is built on the first lookup of a process and updated incrementally:
+by the ``post_save`` and ``post_delete`` signals once the transaction has been
+committed, and by ``refresh()`` for the changes of other processes, e.g. another
+worker or ``manage.py import_content``. ``refresh()`` compares the number of
+objects and their latest ``last_modified`` with one cheap query per model at
+most once per ``AUTOCOMPLETE_CHECK_INTERVAL``, and only loads the objects which
+have changed since.
+"""
+
+import bisect
+import heapq
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+
+from .engine import tokenize
+
+LIMIT = 8  # suggestions of each kind
+MIN_LENGTH = 2  # characters of a query before anything is suggested
+BATCH_SIZE = 1000
+COMPLETIONS_SIZE = 1000  # memoized prefixes, the least recently used are dropped
+LAST = chr(sys.maxunicode)  # sorts after every completion of a prefix
+
+# how the objects of a registered model are suggested
+_Spec = namedtuple("_Spec", "title url_name url_field fields")
+# the suggestion of one object and the keys it is indexed under
+_Entry = namedtuple("_Entry", "type title url words terms")
+
+
+def _key(words):
+    return " ".join(words)
+
+
+class PrefixIndex:
+    """Sorted lists of the titles and terms of the registered models"""
+
+    def __init__(self):
+        self.models = {}  # model -> _Spec
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Drop the index, which is built again by the next refresh()"""
+        with self._lock:
+            self._entries = {}  # (model label, pk) -> _Entry
+            self._starts = []  # sorted (normalized title, ident)
+            self._words = []  # sorted (normalized title from its 2nd word on, ident)
+            self._documents = {}  # term -> number of objects containing it
+            self._terms = []  # sorted terms
+            # memoized most frequent terms per prefix, least recently used first
+            self._completions = OrderedDict()
+            self._checked = None  # time.monotonic() of the last refresh
+            self._states = {}  # model -> count and latest last_modified
+
+    def register(self, model, title, url_name, url_field="pk", fields=None):
+        """Suggest the objects of a model and the terms of some of their fields
+
+        Parameters
+        ----------
+        :param model:
+            the model class to be suggested
+        :param title:
+            the name of the field displayed as the suggestion, e.g. "title"
+        :param url_name:
+            the name of the URL pattern of the page of an object
+        :param url_field:
+            the field passed as the only keyword argument of the URL pattern
+        :param fields:
+            the names of the fields whose terms are suggested, by default the title
+        """
+        self.models[model] = _Spec(title, url_name, url_field, tuple(fields or [title]))
+        uid = f"search_suggestions_{model._meta.label_lower}"
+        post_save.connect(self._on_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(self._on_delete, sender=model, dispatch_uid=uid)
+
+    def _entry(self, instance):
+        """Return the _Entry of an object"""
+        spec = self.models[type(instance)]
+        title = getattr(instance, spec.title) or ""
+        terms = set()
+        for field in spec.fields:
+            terms.update(tokenize(getattr(instance, field) or ""))
+        return _Entry(
+            type=instance._meta.model_name,
+            title=title,
+            url=reverse(
+                spec.url_name,
+                kwargs={spec.url_field: getattr(instance, spec.url_field)},
+            ),
+            words=tuple(tokenize(title)),
+            # the same terms are shared by all objects instead of being copied
+            terms=tuple(sorted(map(sys.intern, terms))),
+        )
+
+    def _put(self, ident, entry, bulk=False):
+        """Replace the entry of an object, in bulk without sorting the lists yet"""
+        previous = self._entries.get(ident)
+        if previous == entry:
+            return
+        if previous is not None:
+            self._remove(ident, bulk)
+        if entry is None:
+            return
+        self._entries[ident] = entry
+        for term in entry.terms:
+            count = self._documents.get(term, 0)
+            self._documents[term] = count + 1
+            if not count and not bulk:
+                bisect.insort(self._terms, term)
+        if not bulk:
+            for later, item in self._title_keys(ident, entry):
+                bisect.insort(self._words if later else self._starts, item)
+        self._completions.clear()
+
+    def _remove(self, ident, bulk=False):
+        entry = self._entries.pop(ident)
+        for term in entry.terms:
+            count = self._documents.pop(term) - 1
+            if count:
+                self._documents[term] = count
+            elif not bulk:
+                del self._terms[bisect.bisect_left(self._terms, term)]
+        if not bulk:
+            for later, item in self._title_keys(ident, entry):
+                items = self._words if later else self._starts
+                del items[bisect.bisect_left(items, item)]
+        self._completions.clear()
+
+    @staticmethod
+    def _title_keys(ident, entry):
+        """Yield (from a later word, (key, ident)) for the title lists"""
+        for start in range(len(entry.words)):
+            yield start > 0, (_key(entry.words[start:]), ident)
+
+    def _sort(self):
+        """Build the sorted lists again after bulk updates"""
+        self._terms = sorted(self._documents)
+        starts, words = [], []
+        for ident, entry in self._entries.items():
+            for later, item in self._title_keys(ident, entry):
+                (words if later else starts).append(item)
+        self._starts = sorted(starts)
+        self._words = sorted(words)
+        self._completions.clear()
+
+    def stale(self):
+        """Return whether refresh() has to look for changes before a lookup"""
+        checked = self._checked
+        return (
+            checked is None
+            or time.monotonic() - checked >= settings.AUTOCOMPLETE_CHECK_INTERVAL
+        )
+
+    def refresh(self, force=False):
+        """Load the objects which have changed since the last refresh
+
+        Parameters
+        ----------
+        :param force:
+            whether to look for changes even if the index is not stale
+        :return:
+            the number of objects loaded from the database
+        """
+        with self._refresh_lock:  # concurrent requests wait for the first one
+            if not force and not self.stale():
+                return 0
+            # the first time, the lists are sorted once all objects are loaded
+            bulk = self._checked is None
+            loaded = sum(self._refresh_model(model, bulk) for model in self.models)
+            if bulk:
+                with self._lock:
+                    self._sort()
+            self._checked = time.monotonic()
+            return loaded
+
+    def _refresh_model(self, model, bulk):
+        spec = self.models[model]
+        label = model._meta.label
+        columns = {"pk", spec.title, spec.url_field, *spec.fields}
+        objects = model.objects.only(*columns).order_by()
+        dated = any(field.name == "last_modified" for field in model._meta.fields)
+        if dated:
+            # read first, so that changes committed while loading are seen next time
+            state = model.objects.aggregate(
+                count=Count("pk"), latest=Max("last_modified")
+            )
+            previous = self._states.get(model)
+            if previous == state:
+                return 0
+            if previous and previous["latest"]:
+                # ties are loaded again, as the clocks of the writers may differ
+                objects = objects.filter(last_modified__gte=previous["latest"])
+        else:
+            state = None  # all rows are compared, e.g. the few categories
+
+        with self._lock:
+            known = {pk for (model_label, pk) in self._entries if model_label == label}
+        seen = set()
+        loaded = 0
+        for instance in objects.iterator(chunk_size=BATCH_SIZE):
+            entry = self._entry(instance)
+            with self._lock:
+                self._put((label, instance.pk), entry, bulk)
+            seen.add(instance.pk)
+            loaded += 1
+        if dated and len(known | seen) != state["count"]:
+            # some objects have been deleted, compare the primary keys
+            seen = set(model.objects.values_list("pk", flat=True))
+        elif dated:
+            seen = known | seen
+        with self._lock:
+            for pk in known - seen:
+                self._put((label, pk), None, bulk)
+        if dated:
+            self._states[model] = state
+        return loaded
+
+    def _on_save(self, sender, instance, update_fields=None, **kwargs):
+        spec = self.models[sender]
+        columns = {spec.title, spec.url_field, *spec.fields}
+        if update_fields is not None and not columns & set(update_fields):
+            return  # none of the suggested fields has changed
+        # the values of the saved object, not of the object once committed
+        ident, entry = (sender._meta.label, instance.pk), self._entry(instance)
+        transaction.on_commit(lambda: self._update(ident, entry))
+
+    def _on_delete(self, sender, instance, **kwargs):
+        ident = (sender._meta.label, instance.pk)
+        transaction.on_commit(lambda: self._update(ident, None))
+
+    def _update(self, ident, entry):
+        if self._checked is not None:  # otherwise loaded by the first refresh
+            with self._lock:
+                self._put(ident, entry)
+
+    def _completions_of(self, prefix):
+        """Return the most frequent terms starting with a prefix"""
+        completions = self._completions.get(prefix)
+        if completions is not None:
+            self._completions.move_to_end(prefix)
+        else:
+            start = bisect.bisect_left(self._terms, prefix)
+            end = bisect.bisect_left(self._terms, prefix + LAST, start)
+            completions = heapq.nlargest(
+                LIMIT,
+                self._terms[start:end],
+                key=lambda term: (self._documents[term], term),
+            )
+            self._completions[prefix] = completions
+            if len(self._completions) > COMPLETIONS_SIZE:
+                self._completions.popitem(last=False)
+        return completions
+
+    def _titles(self, items, key, found):
+        position = bisect.bisect_left(items, (key,))
+        while len(found) < LIMIT and position < len(items):
+            normalized, ident = items[position]
+            if not normalized.startswith(key):
+                break
+            found.setdefault(ident, None)
+            position += 1
+
+    def suggest(self, query):
+        """Look up the suggestions for what has been typed into a search form
+
+        Parameters
+        ----------
+        :param query:
+            the query, its last word may be incomplete
+        :return:
+            a dictionary with the "titles" starting with the query, or with the query
+            from a later word of the title on, as dictionaries with the "type",
+            "title" and "url" of the object, and the completed "terms", most
+            frequent first
+        """
+        words = tokenize(query)
+        if len(_key(words)) < MIN_LENGTH:
+            return {"titles": [], "terms": []}
+        key = _key(words)
+        found = {}  # ordered set of the ids of the matching objects
+        with self._lock:
+            self._titles(self._starts, key, found)  # matches of the first word first
+            self._titles(self._words, key, found)
+            titles = [self._entries[ident] for ident in found]
+            completions = self._completions_of(words[-1])
+        return {
+            "titles": [
+                {"type": entry.type, "title": entry.title, "url": entry.url}
+                for entry in titles
+            ],
+            "terms": [_key([*words[:-1], term]) for term in completions],
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def term_count(self):
+        return len(self._documents)
+
+
+index = PrefixIndex()  # the index of the process
+register = index.register
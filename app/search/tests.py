@@ -0,0 +1,231 @@
+from unittest import mock
+
+from blog.models import Category, Post
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from projects.models import Project
+
+from . import engine, sitewide, suggestions
+from .models import IndexEntry
+
+
+class TokenizeTests(TestCase):
+
+    def test_tokenize(self):
+        # Terms are lower-cased and split on anything that is not a word character
+        self.assertEqual(
+            engine.tokenize("Data-Science, DevOps & ML!"),
+            ["data", "science", "devops", "ml"],
+        )
+
+
+class IndexUpdateTests(TestCase):
+
+    def test_index_updated_on_save(self):
+        # Saving a post indexes its title and body
+        post = Post.objects.create(title="Django", body="Web framework")
+        self.assertEqual(
+            [p.pk for p in engine.search(Post.objects.all(), "web")], [post.pk]
+        )
+
+        # Changing the body replaces the old entries
+        post.body = "Python framework"
+        post.save()
+        self.assertEqual(engine.search(Post.objects.all(), "web"), [])
+        self.assertEqual(engine.search(Post.objects.all(), "python"), [post])
+
+    def test_index_updated_on_delete(self):
+        # Deleting a post removes its entries from the index
+        post = Post.objects.create(title="Django", body="Web framework")
+        post.delete()
+        self.assertFalse(IndexEntry.objects.exists())
+
+    def test_rebuild(self):
+        # Rebuilding restores entries that were removed behind the index's back
+        project = Project.objects.create(title="Chat bot", body="Trained on spaces")
+        IndexEntry.objects.all().delete()
+        self.assertEqual(engine.rebuild(Project), 1)
+        self.assertEqual(engine.search(Project.objects.all(), "bot"), [project])
+
+
+class RankTests(TestCase):
+
+    def setUp(self):
+        self.body_hit = Post.objects.create(title="Notes", body="About data science")
+        self.title_hit = Post.objects.create(title="Data science", body="Notes")
+        self.scattered = Post.objects.create(title="Science", body="Data")
+
+    def test_title_hits_rank_first(self):
+        # A match in the title weighs more than a match in the body
+        results = engine.search(Post.objects.all(), "data science")
+        self.assertEqual(results, [self.title_hit, self.body_hit])
+
+    def test_phrase_must_be_consecutive(self):
+        # Terms spread over different fields do not match a phrase
+        results = engine.search(Post.objects.all(), "science data")
+        self.assertEqual(results, [])
+
+    def test_search_respects_queryset(self):
+        # Objects excluded from the queryset are not returned
+        queryset = Post.objects.exclude(pk=self.title_hit.pk)
+        self.assertEqual(engine.search(queryset, "data science"), [self.body_hit])
+
+
+class SuggestionTests(TestCase):
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            title="Data science notes", body="Python and pandas"
+        )
+        Post.objects.create(title="Testing", body="Python with pytest")
+        self.project = Project.objects.create(title="Chat bot", body="Python")
+        Category.objects.create(name="News")
+        self.index = suggestions.index
+        self.index.clear()
+        self.addCleanup(self.index.clear)
+        self.index.refresh()
+
+    def titles(self, query):
+        return [title["title"] for title in self.index.suggest(query)["titles"]]
+
+    def test_titles(self):
+        # Titles match from any of their words, matches of the first word first
+        self.assertEqual(
+            self.index.suggest("dat")["titles"],
+            [
+                {
+                    "type": "post",
+                    "title": "Data science notes",
+                    "url": reverse("blog_detail", args=[self.post.pk]),
+                }
+            ],
+        )
+        self.assertEqual(self.titles("Science no"), ["Data science notes"])
+        self.assertEqual(self.titles("bo"), ["Chat bot"])
+        self.assertEqual(self.titles("new"), ["News"])
+        self.assertEqual(self.titles("science data"), [])
+
+    def test_terms(self):
+        # The last word is completed with the terms of most objects first
+        self.assertEqual(self.index.suggest("py")["terms"], ["python", "pytest"])
+        self.assertEqual(self.index.suggest("Notes, PA")["terms"], ["notes pandas"])
+        self.assertEqual(self.index.suggest("p"), {"titles": [], "terms": []})
+
+    def test_completions_bounded(self):
+        # Only the most recently completed prefixes are memoized
+        with mock.patch.object(suggestions, "COMPLETIONS_SIZE", 2):
+            for query in ["py", "pa", "py", "no"]:
+                self.index.suggest(query)
+        self.assertEqual(list(self.index._completions), ["py", "no"])
+        self.assertEqual(self.index.suggest("py")["terms"], ["python", "pytest"])
+
+    def test_updated_on_commit(self):
+        # Saved and deleted objects are updated once their transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = "Big data"
+            self.post.save()
+        self.assertEqual(self.titles("dat"), ["Big data"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+        self.assertEqual(self.titles("chat"), [])
+        self.assertEqual(self.index.suggest("pyt")["terms"], ["python", "pytest"])
+
+    def test_refresh(self):
+        # Changes of other processes are loaded by the next refresh, e.g. these
+        # whose commit callbacks are discarded by TestCase
+        Post.objects.filter(pk=self.post.pk).update(title="Big data")
+        self.post.refresh_from_db()
+        self.post.save()  # updates last_modified
+        Project.objects.create(title="Chatter")
+        Project.objects.filter(pk=self.project.pk).delete()
+        Category.objects.update(name="Updates", last_modified=timezone.now())
+        self.assertEqual(self.titles("chat"), ["Chat bot"])
+
+        self.assertEqual(self.index.refresh(), 0)  # not stale yet
+        # the changed post, project and category, and the previously latest post
+        self.assertEqual(self.index.refresh(force=True), 4)
+        self.assertEqual(self.titles("chat"), ["Chatter"])
+        self.assertEqual(self.titles("dat"), ["Big data"])
+        self.assertEqual(self.titles("upd"), ["Updates"])
+        self.assertEqual(len(self.index), 4)
+
+    def test_view(self):
+        # The suggestions are cacheable and revalidated by their ETag
+        url = reverse("search_autocomplete")
+        response = self.client.get(url, {"q": "chat"})
+        self.assertEqual(
+            response.json(),
+            {
+                "titles": [
+                    {
+                        "type": "project",
+                        "title": "Chat bot",
+                        "url": reverse("project_detail", args=[self.project.pk]),
+                    }
+                ],
+                "terms": ["chat"],
+            },
+        )
+        self.assertIn("max-age=60", response["Cache-Control"])
+        response = self.client.get(
+            url, {"q": "chat"}, headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class SiteWideSearchTests(TransactionTestCase):
+    # the models are ranked in other threads, which only see committed rows
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(title="Django tips", body="Web apps")
+        self.project = Project.objects.create(title="Portfolio", body="A Django site")
+        self.other = Post.objects.create(title="Gardening", body="Tomatoes")
+
+    def test_normalize(self):
+        # Queries searching the same terms share their cached results
+        self.assertEqual(sitewide.normalize("  Django-Tips! "), "django tips")
+
+    def test_results_merged_by_score(self):
+        # Posts and projects are listed together, the title match first
+        response = self.client.get(reverse("search"), {"query": "django"})
+        self.assertEqual(
+            [result["object"] for result in response.context["results"]],
+            [self.post, self.project],
+        )
+        self.assertEqual(
+            [result["type"] for result in response.context["results"]],
+            ["post", "project"],
+        )
+        self.assertContains(response, reverse("project_detail", args=[self.project.pk]))
+
+    def test_results_cached(self):
+        # The merged hits are cached under the normalized query
+        self.client.get(reverse("search"), {"query": "Django"})
+        Project.objects.filter(pk=self.project.pk).delete()
+        with self.assertNumQueries(2):  # no ranking, one query per type of result
+            response = self.client.get(reverse("search"), {"query": "django!"})
+        self.assertEqual(
+            [result["object"] for result in response.context["results"]], [self.post]
+        )
+
+    def test_pagination(self):
+        # The pages follow each other across the types of results
+        with self.settings(PAGE_SIZE=1):
+            first = self.client.get(reverse("search"), {"query": "django"})
+            cursor = first.context["page"].next_cursor
+            second = self.client.get(
+                reverse("search"), {"query": "django", "cursor": cursor}
+            )
+        self.assertEqual(first.context["results"][0]["object"], self.post)
+        self.assertEqual(second.context["results"][0]["object"], self.project)
+        self.assertFalse(second.context["page"].has_next)
+        self.assertTrue(second.context["page"].has_previous)
+
+    def test_empty_query(self):
+        # Without a query, nothing is searched
+        response = self.client.get(reverse("search"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["results"], [])
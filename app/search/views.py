@@ -0,0 +1,87 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from blog.models import LISTING_FIELDS as POST_FIELDS
+from django.apps import apps
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from portfolio.pagination import paginate_hits
+from projects.models import LISTING_FIELDS as PROJECT_FIELDS
+
+from . import sitewide, suggestions
+from .forms import SearchForm
+
+MAX_QUERY_LENGTH = 100  # as the query field of the search forms
+# the URL pattern of the page and the columns rendered of each type of result
+RESULTS = {
+    "blog.Post": ("blog_detail", POST_FIELDS),
+    "projects.Project": ("project_detail", PROJECT_FIELDS),
+}
+
+
+async def search(request):
+    """The page of the results of a search of all posts and projects
+
+    Parameters
+    ----------
+    :param request:
+        the incoming HTML request, with the query in ?query=
+    :return:
+        the rendered content, listing the best matches of any type first
+    """
+    form = SearchForm(request.GET)
+    cursor = request.GET.get("cursor")  # position of the requested page
+    query = form.cleaned_data["query"] if form.is_valid() else ""
+    # the hits of every model are ranked concurrently, then cached for a while
+    models = [apps.get_model(label) for label in RESULTS]
+    hits = await sitewide.arank_all(query, models) if query else []
+    page = paginate_hits(hits, cursor)
+
+    # load the objects of the page with one query per type
+    pks = {}
+    for label, pk, _ in page.object_list:
+        pks.setdefault(label, []).append(pk)
+    objects = {}
+    for label, model_pks in pks.items():
+        model = apps.get_model(label)
+        found = await model.objects.only(*RESULTS[label][1]).ain_bulk(model_pks)
+        objects.update(((label, pk), instance) for pk, instance in found.items())
+
+    results = [
+        {
+            "type": objects[label, pk]._meta.verbose_name,
+            "object": objects[label, pk],
+            "url_name": RESULTS[label][0],
+        }
+        for label, pk, _ in page.object_list
+        if (label, pk) in objects  # not deleted since the search has been cached
+    ]
+    context = {"form": form, "query": query, "results": results, "page": page}
+    return render(request, "search/results.html", context)
+
+
+async def autocomplete(request):
+    """Return the suggestions for a partial query as JSON
+
+    Parameters
+    ----------
+    :param request:
+        the incoming HTML request, with the typed text in ?q=
+    :return:
+        the "titles" and "terms" of suggestions.PrefixIndex.suggest(), cacheable
+        by the browser for AUTOCOMPLETE_CACHE_TIMEOUT and revalidated by ETag
+    """
+    index = suggestions.index
+    if index.stale():  # at most once per AUTOCOMPLETE_CHECK_INTERVAL
+        await sync_to_async(index.refresh)()
+    query = request.GET.get("q", "")[:MAX_QUERY_LENGTH]
+    response = JsonResponse(index.suggest(query))
+    etag = quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest())
+    response["ETag"] = etag
+    patch_cache_control(
+        response, public=True, max_age=settings.AUTOCOMPLETE_CACHE_TIMEOUT
+    )
+    return get_conditional_response(request, etag=etag, response=response)
@@ -0,0 +1,92 @@
+"""The steps of the startup command which depend on the state of the database
+
+Migrations are only applied and the tables of the database caches only created
+when some are missing, and fixtures are only loaded when their content differs
+from the last load, which is remembered by a checksum in the LoadedFixture table.
+The checks take a few queries, so that a container restarting against a set up
+database is ready almost immediately.
+"""
+
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from portfolio import content
+
+from .models import LoadedFixture
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def pending_migrations(database=DEFAULT_DB_ALIAS):
+    """Return the names of the migrations which are not applied yet
+
+    Parameters
+    ----------
+    :param database:
+        the alias of the database
+    :return:
+        a list of "app_label.migration_name" strings, in the order of application
+    """
+    executor = MigrationExecutor(connections[database])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return [f"{migration.app_label}.{migration.name}" for migration, _ in plan]
+
+
+def missing_cache_tables(database=DEFAULT_DB_ALIAS):
+    """Return the names of the tables of the database caches which do not exist yet
+
+    Parameters
+    ----------
+    :param database:
+        the alias of the database
+    :return:
+        a sorted list of table names, created by ``manage.py createcachetable``
+    """
+    tables = {
+        options["LOCATION"]
+        for options in settings.CACHES.values()
+        if options["BACKEND"] == "django.core.cache.backends.db.DatabaseCache"
+    }
+    return sorted(tables - set(connections[database].introspection.table_names()))
+
+
+def checksum(path):
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_fixture(path, force=False):
+    """Load a fixture unless the same content has been loaded before
+
+    JSON Lines dumps of portfolio.content are imported with import_content, all
+    other files with loaddata.
+
+    Parameters
+    ----------
+    :param path:
+        the path of the fixture file
+    :param force:
+        whether to load the fixture even if it has not changed
+    :return:
+        whether the fixture has been loaded
+    """
+    path = os.path.normpath(path)
+    digest = checksum(path)
+    if not force and LoadedFixture.objects.filter(path=path, checksum=digest).exists():
+        return False
+    with transaction.atomic():  # the checksum is only stored for a complete load
+        if path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as file:
+                content.import_content(file)
+        else:
+            call_command("loaddata", path, verbosity=0)
+        LoadedFixture.objects.update_or_create(path=path, defaults={"checksum": digest})
+    return True
@@ -0,0 +1,103 @@
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from portfolio import metrics, warmup
+from startup import boot
+
+
+class Command(BaseCommand):
+    help = (
+        "Prepare the database and caches before the server starts: apply missing "
+        "migrations, create the tables of the database caches, load changed "
+        "fixtures, warm up and clear the metrics of the previous servers, with the "
+        "time of each step"
+    )
+    requires_system_checks = []  # run and timed as the first step
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "fixtures", nargs="*", help="fixtures to load when they have changed"
+        )
+        parser.add_argument(
+            "--force-fixtures",
+            action="store_true",
+            help="load the fixtures even if they have not changed",
+        )
+        parser.add_argument(
+            "--host",
+            default="localhost",
+            help="the host name the warmed pages are requested with",
+        )
+
+    def handle(self, *args, **options):
+        self.timings = []
+        self.step("checks", self.check_system)
+        self.step("migrations", self.migrate)
+        self.step("cache tables", self.create_cache_tables)
+        self.step(
+            "fixtures",
+            lambda: self.load_fixtures(options["fixtures"], options["force_fixtures"]),
+        )
+        self.step("warm-up", lambda: self.warm_up(options["host"]))
+        self.step("metrics", self.clear_metrics)
+
+        width = max(len(name) for name, _ in self.timings)
+        for name, seconds in self.timings:
+            self.stdout.write(f"{name:<{width}} {seconds * 1000:8.1f} ms")
+        total = sum(seconds for _, seconds in self.timings)
+        self.stdout.write(f"{'total':<{width}} {total * 1000:8.1f} ms")
+
+    def step(self, name, function):
+        start = time.perf_counter()
+        message = function()
+        self.timings.append((name, time.perf_counter() - start))
+        self.stdout.write(f"{name}: {message}")
+
+    def check_system(self):
+        self.check(databases=["default"])
+        return "no issues"
+
+    def migrate(self):
+        pending = boot.pending_migrations()
+        if not pending:
+            return "up to date"
+        call_command("migrate", interactive=False, verbosity=0)
+        return f"applied {len(pending)} migrations"
+
+    def create_cache_tables(self):
+        missing = boot.missing_cache_tables()
+        if not missing:
+            return "up to date"
+        call_command("createcachetable", verbosity=0)
+        return f"created {', '.join(missing)}"
+
+    def load_fixtures(self, fixtures, force):
+        loaded = []
+        for path in fixtures:
+            try:
+                if boot.load_fixture(path, force):
+                    loaded.append(path)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot load {path}: {error}")
+        if not fixtures:
+            return "none given"
+        return f"loaded {', '.join(loaded)}" if loaded else "unchanged"
+
+    def clear_metrics(self):
+        # neither the previous servers nor the warm-up requests are counted
+        metrics.clear_files()
+        metrics.reset()
+        return "cleared" if settings.METRICS_DIR else "kept in the server processes"
+
+    def warm_up(self, host):
+        patterns, templates = warmup.warm_process()
+        message = f"{patterns} URL patterns, {templates} templates"
+        if not warmup.shared_cache():
+            return f"{message}, pages skipped as the cache is local to this process"
+        statuses = warmup.warm_pages(host)
+        failed = [path for path, status in statuses.items() if status >= 400]
+        if failed:
+            raise CommandError(f"Warming up failed for {', '.join(failed)}")
+        return f"{message}, {len(statuses)} pages"
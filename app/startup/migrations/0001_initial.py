@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoadedFixture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('checksum', models.CharField(max_length=64)),
+                ('loaded_on', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
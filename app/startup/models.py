@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class LoadedFixture(models.Model):
+    """A fixture loaded by the startup command, with the checksum of its content"""
+
+    path = models.CharField(max_length=255, unique=True)
+    checksum = models.CharField(max_length=64)  # SHA-256, hex encoded
+    loaded_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.path
@@ -0,0 +1,95 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from blog.models import Category
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from portfolio import warmup
+
+from . import boot
+from .models import LoadedFixture
+
+
+class StartupTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_fixture(self, name, records):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as file:
+            json.dump(records, file)
+        return path
+
+    def startup(self, *args):
+        stdout = io.StringIO()
+        call_command("startup", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_migrations_up_to_date(self):
+        self.assertEqual(boot.pending_migrations(), [])
+        output = self.startup()
+        self.assertIn("migrations: up to date", output)
+        self.assertIn("cache tables: up to date", output)
+        self.assertIn("fixtures: none given", output)
+        self.assertIn("total", output)
+
+    def test_cache_tables_created(self):
+        # The tables of the database caches are created once they are missing
+        cache = {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "startup_test_cache",
+        }
+        with override_settings(CACHES={**settings.CACHES, "startup": cache}):
+            self.assertEqual(boot.missing_cache_tables(), ["startup_test_cache"])
+            self.assertIn("cache tables: created startup_test_cache", self.startup())
+            self.assertEqual(boot.missing_cache_tables(), [])
+
+    def test_fixture_loaded_when_changed(self):
+        # A fixture is only loaded again once its content has changed
+        record = {"model": "blog.category", "pk": 100, "fields": {"slug": "news"}}
+        path = self.write_fixture("categories.json", [record])
+        self.assertIn(f"loaded {path}", self.startup(path))
+        self.assertEqual(LoadedFixture.objects.get().checksum, boot.checksum(path))
+
+        Category.objects.filter(pk=100).update(name="Edited")
+        self.assertIn("fixtures: unchanged", self.startup(path))
+        self.assertEqual(Category.objects.get(pk=100).name, "Edited")
+
+        record["fields"]["name"] = "News"
+        self.write_fixture("categories.json", [record])
+        self.startup(path)
+        self.assertEqual(Category.objects.get(pk=100).name, "News")
+        self.assertEqual(LoadedFixture.objects.count(), 1)
+
+    def test_jsonl_fixture(self):
+        # Content dumps are loaded with import_content
+        path = os.path.join(self.directory, "content.jsonl")
+        with open(path, "w") as file:
+            file.write('{"model": "blog.category", "slug": "news", "name": "News"}\n')
+        self.assertTrue(boot.load_fixture(path))
+        self.assertFalse(boot.load_fixture(path))
+        self.assertEqual(Category.objects.get(slug="news").name, "News")
+
+    def test_missing_fixture(self):
+        with self.assertRaisesMessage(CommandError, "Cannot load"):
+            self.startup(os.path.join(self.directory, "missing.json"))
+        self.assertFalse(LoadedFixture.objects.exists())
+
+    def test_warm_up(self):
+        # The pages are only requested when the cache is shared by the servers
+        self.assertIn("pages skipped", self.startup())
+        cache = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": self.directory,
+            }
+        }
+        with override_settings(CACHES=cache):
+            self.assertTrue(warmup.shared_cache())
+            self.assertIn("3 pages", self.startup())
@@ -0,0 +1,23 @@
+// Search-as-you-type: fills the datalist of a search form with the titles and
+// terms suggested by /search/autocomplete/ for the text typed so far
+document.querySelectorAll("input[data-autocomplete]").forEach((input) => {
+    const list = document.getElementById(input.getAttribute("list"));
+    let timer;
+    input.addEventListener("input", () => {
+        clearTimeout(timer);
+        // wait for a pause in typing instead of requesting every keystroke
+        timer = setTimeout(async () => {
+            const query = encodeURIComponent(input.value);
+            const response = await fetch(`${input.dataset.autocomplete}?q=${query}`);
+            if (!response.ok) {
+                return;
+            }
+            const suggestions = await response.json();
+            const values = new Set([
+                ...suggestions.titles.map((title) => title.title),
+                ...suggestions.terms,
+            ]);
+            list.replaceChildren(...Array.from(values, (value) => new Option(value)));
+        }, 150);
+    });
+});